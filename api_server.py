@@ -0,0 +1,553 @@
+# MÓDULO: api_server.py
+# PROPÓSITO: API HTTP/JSON (sem interface) para automatizar o inventário
+
+# DESCRIÇÃO:
+    # Expõe o NetworkInventory e o storage.py por HTTP, para scripts e outras
+    # ferramentas (o main.py e o app_web.py precisam de uma pessoa):
+    #   - Servidor http.server da biblioteca padrão com um pool fixo de threads
+    #     (ThreadPoolExecutor): cada ligação é atendida por uma thread do pool
+    #   - HTTP/1.1 com keep-alive: o cliente reutiliza a mesma ligação TCP para
+    #     muitos pedidos (todas as respostas têm Content-Length);
+    #     ligações paradas mais de 30 s (APIHandler.timeout) são fechadas
+    #   - Pedidos condicionais: as respostas GET levam ETag = "<geração>-<inv.version>";
+    #     com If-None-Match igual, a resposta é 304 sem calcular nada. Nas escritas,
+    #     If-Match diferente da versão atual dá 412 (alteração concorrente)
+    #   - Endpoints em lote para operações em massa (criar/remover/consultar muitos
+    #     dispositivos e ingerir muitos registos de tráfego num só pedido)
+    # O inventário não é thread-safe: todos os acessos passam por um lock; a leitura
+    # do pedido, o JSON e o envio da resposta ficam fora dele (as exportações são
+    # geradas com o lock para um ficheiro temporário e enviadas depois de o largar).
+
+# ROTAS:
+    # GET    /status                       versão, nº de dispositivos
+    # GET    /devices?type=&status=&order=&limit=&cursor=   página (inv.page)
+    # GET    /devices/<nome>
+    # POST   /devices                      cria (formato to_dict)
+    # PUT    /devices/<nome>               substitui (mantém ligações e tráfego; o nome não muda)
+    # DELETE /devices/<nome>
+    # POST   /devices/batch                {"devices": [...]}  tudo ou nada
+    # POST   /devices/lookup               {"names": [...]}
+    # POST   /devices/delete               {"names": [...]}
+    # GET    /search?ipv4= | mac= | network= | user=
+    # GET    /traffic/top?n=10&by=endpoint|user
+    # POST   /traffic                      {"records": [[nome ou MAC, up, down], ...], "ts": opcional}
+    # POST   /policies/apply               {"kind": "cumulative"|"window", "limit_mb", "window_minutes", "suspend_minutes"}
+    # GET    /export/<json|ndjson|csv|txt|excel>
+    # POST   /save    |    POST /reload
+
+# EXECUÇÃO:
+    # python api_server.py [--file inventario.json] [--host 127.0.0.1] [--port 8080] [--threads 16]
+    # curl -i localhost:8080/devices/R1
+    # Medição do débito: python -m benchmarks.bench_api
+
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from devices import Endpoint
+from exports import FORMATS, STREAMS
+from ingest_daemon import resolve_records
+from inventory import NetworkInventory
+from policies import CumulativeLimitPolicy, WindowLimitPolicy
+from storage import device_from_dict, load_from_json, save_to_json
+
+MAX_BODY = 64 * 1024 * 1024
+MAX_PAGE = 1000
+# Exportações até este tamanho ficam em memória; acima passam para um ficheiro temporário
+EXPORT_SPOOL = 8 * 1024 * 1024
+
+
+class APIError(Exception):
+    # Erro com código HTTP (404, 409, 412, ...); os ValueError do inventário dão 400.
+    # detail: conteúdo a devolver em "error" em vez da mensagem (ex: lista de erros do lote)
+    def __init__(self, status: int, message: str, detail=None):
+        super().__init__(message)
+        self.status = status
+        self.detail = message if detail is None else detail
+
+
+class InventoryAPI:
+    def __init__(self, inventory, path: str = None):
+        self.inventory = inventory
+        self.path = path
+        self.lock = threading.RLock()
+        # Incrementada quando o inventário é trocado (reload): as versões recomeçam
+        self.generation = 0
+
+    def etag(self) -> str:
+        return f'"{self.generation}-{self.inventory.version}"'
+
+    # ------------------------------------------------------------------
+    # Leituras
+    # ------------------------------------------------------------------
+
+    def status(self, query) -> dict:
+        inv = self.inventory
+        return {"devices": len(inv.devices), "version": inv.version,
+                "topology_version": inv.topology_version, "generation": self.generation}
+
+    def list_devices(self, query) -> dict:
+        device_type = _param(query, "type").upper()
+        status = _param(query, "status").upper()
+        predicate = None
+        if device_type or status:
+            def predicate(d):
+                return (not device_type or d.device_type == device_type) and (not status or d.status == status)
+        limit = min(_int_param(query, "limit", 100), MAX_PAGE)
+        items, cursor = self.inventory.page(limit, _param(query, "cursor") or None,
+                                            _param(query, "order") or "insertion", predicate)
+        return {"items": [d.to_dict() for d in items], "next_cursor": cursor}
+
+    def get_device(self, name: str) -> dict:
+        return self._device(name).to_dict()
+
+    def lookup(self, body) -> dict:
+        devices = self.inventory.devices
+        names = _list(body, "names")
+        return {"items": [devices[n].to_dict() for n in names if n in devices],
+                "missing": [n for n in names if n not in devices]}
+
+    def search(self, query) -> dict:
+        inv = self.inventory
+        if "ipv4" in query:
+            found = [inv.find_by_ipv4(_param(query, "ipv4"))]
+        elif "mac" in query:
+            found = [inv.find_by_mac(_param(query, "mac"))]
+        elif "network" in query:
+            found = inv.find_by_ipv4_network(_param(query, "network"))
+        elif "user" in query:
+            found = inv.find_by_user(_param(query, "user"))
+        else:
+            raise ValueError("Indique ipv4, mac, network ou user.")
+        return {"items": [d.to_dict() for d in found if d is not None]}
+
+    def top(self, query) -> dict:
+        n = _int_param(query, "n", 10)
+        by = _param(query, "by") or "endpoint"
+        if by == "user":
+            rows = [{"user_id": u, "up_mb": up, "down_mb": down} for u, up, down in self.inventory.top_users(n)]
+        elif by == "endpoint":
+            rows = [{"name": ep.name, "user_id": ep.user_id, "up_mb": ep.traffic_up_mb,
+                     "down_mb": ep.traffic_down_mb, "status": ep.status}
+                    for ep in self.inventory.top_consumers(n)]
+        else:
+            raise ValueError("by tem de ser 'endpoint' ou 'user'.")
+        return {"items": rows}
+
+    # ------------------------------------------------------------------
+    # Escritas
+    # ------------------------------------------------------------------
+
+    def create(self, body) -> dict:
+        obj = _build(body)
+        self.inventory.add_device(obj)
+        return obj.to_dict()
+
+    def replace(self, name: str, body) -> dict:
+
+        # MÉTODO: replace()
+
+        # O QUE FAZ:
+        #     - Substitui o dispositivo "name" pelo do corpo (como a edição do app_web.py:
+        #       mantém as ligações e, nos endpoints, o tráfego acumulado)
+        #     - Não muda o nome: as ligações dos outros dispositivos continuariam a
+        #       apontar para o nome antigo (para mudar o nome: DELETE + POST e religar)
+        #     - Se o novo dispositivo for rejeitado, repõe o antigo
+
+        old = self._device(name)
+        if isinstance(body, dict) and body.get("name", name) != name:
+            raise APIError(409, "Não é possível mudar o nome de um dispositivo com PUT "
+                                "(as ligações dos outros dispositivos apontam para o nome atual).")
+        body = dict(body, name=name) if isinstance(body, dict) else body
+        obj = _build(body)
+        if hasattr(old, "connected_devices") and hasattr(obj, "connected_devices"):
+            obj.connected_devices = old.connected_devices
+        if hasattr(old, "connected_endpoints") and hasattr(obj, "connected_endpoints"):
+            obj.connected_endpoints = old.connected_endpoints
+        if isinstance(old, Endpoint) and isinstance(obj, Endpoint):
+            obj.traffic_up_mb = old.traffic_up_mb
+            obj.traffic_down_mb = old.traffic_down_mb
+
+        inv = self.inventory
+        inv.remove_device(name)
+        try:
+            inv.add_device(obj)
+        except ValueError:
+            inv.add_device(old)
+            raise
+        return obj.to_dict()
+
+    def delete(self, name: str) -> dict:
+        self._device(name)
+        self.inventory.remove_device(name)
+        return {"removed": name}
+
+    def create_batch(self, body) -> dict:
+
+        # MÉTODO: create_batch()
+
+        # O QUE FAZ:
+        #     1. Cria e adiciona cada dispositivo da lista, juntando os erros [(índice, mensagem)]
+        #     2. Se houver algum erro, remove os que já tinham entrado (tudo ou nada)
+        #        e devolve 400 com todos os erros de uma vez
+
+        inv = self.inventory
+        added = []
+        errors = []
+        for i, item in enumerate(_list(body, "devices")):
+            try:
+                obj = _build(item)
+                inv.add_device(obj)
+            except (ValueError, TypeError, KeyError, APIError) as e:
+                errors.append([i, str(e)])
+                continue
+            added.append(obj.name)
+        if errors:
+            for name in reversed(added):
+                inv.remove_device(name)
+            raise APIError(400, f"{len(errors)} dispositivos inválidos: nada foi adicionado.", errors)
+        return {"added": len(added)}
+
+    def delete_batch(self, body) -> dict:
+        removed, missing = [], []
+        for name in _list(body, "names"):
+            (removed if self.inventory.remove_device(name) else missing).append(name)
+        return {"removed": removed, "missing": missing}
+
+    def ingest(self, body) -> dict:
+        # Registos (nome ou MAC, up, down): resolvidos como no ingest_daemon.py e
+        # aplicados de uma vez (políticas avaliadas uma vez por endpoint)
+        items = []
+        for rec in _list(body, "records"):
+            if not isinstance(rec, (list, tuple)) or len(rec) != 3:
+                raise ValueError("Cada registo tem de ser [nome ou MAC, up, down].")
+            key, up, down = str(rec[0]).strip(), float(rec[1]), float(rec[2])
+            # json.loads aceita NaN/Infinity, que passariam o "< 0" e estragariam os totais
+            if not (math.isfinite(up) and math.isfinite(down)):
+                raise ValueError("O tráfego tem de ser um número finito.")
+            if up < 0 or down < 0:
+                raise ValueError("O tráfego não pode ser negativo.")
+            items.append((key, up, down))
+        ts = body.get("ts")
+        if ts is not None:
+            ts = float(ts)
+            if not math.isfinite(ts):
+                raise ValueError("ts tem de ser um número finito.")
+        records, unresolved = resolve_records(self.inventory, items)
+        result = self.inventory.ingest_traffic(records, ts)
+        return {"applied": result["applied"], "unknown": unresolved + len(result["unknown"]),
+                "suspended": [ep.name for ep in result["suspended"]]}
+
+    def apply_policy(self, body) -> dict:
+        if not isinstance(body, dict):
+            raise ValueError("O corpo tem de ser um objeto JSON.")
+        kind = body.get("kind", "cumulative")
+        if kind == "cumulative":
+            policy = CumulativeLimitPolicy(float(body["limit_mb"]), int(body["suspend_minutes"]))
+        elif kind == "window":
+            policy = WindowLimitPolicy(float(body["limit_mb"]), int(body["window_minutes"]),
+                                       int(body["suspend_minutes"]))
+        else:
+            raise ValueError("kind tem de ser 'cumulative' ou 'window'.")
+        return {"policy": policy.describe(),
+                "suspended": [ep.name for ep in self.inventory.apply_policy(policy)]}
+
+    def save(self, body) -> dict:
+        if not self.path:
+            raise APIError(409, "O servidor não tem ficheiro associado.")
+        save_to_json(self.inventory, self.path)
+        return {"saved": self.path, "devices": len(self.inventory.devices)}
+
+    def reload(self, body) -> dict:
+        if not self.path:
+            raise APIError(409, "O servidor não tem ficheiro associado.")
+        self.inventory = load_from_json(self.path)
+        self.generation += 1
+        return self.status(None)
+
+    def _device(self, name: str):
+        d = self.inventory.devices.get(name)
+        if d is None:
+            raise APIError(404, f"Dispositivo '{name}' não encontrado.")
+        return d
+
+
+def _param(query: dict, key: str) -> str:
+    return query.get(key, [""])[0].strip()
+
+
+def _int_param(query: dict, key: str, default: int) -> int:
+    raw = _param(query, key)
+    try:
+        value = int(raw) if raw else default
+    except ValueError:
+        raise ValueError(f"{key} tem de ser um inteiro.") from None
+    if value <= 0:
+        raise ValueError(f"{key} tem de ser > 0.")
+    return value
+
+
+def _list(body, key: str) -> list:
+    items = body.get(key) if isinstance(body, dict) else None
+    if not isinstance(items, list):
+        raise ValueError(f"O corpo tem de ter a lista '{key}'.")
+    return items
+
+
+def _build(item):
+    # Dispositivo a partir do formato to_dict (storage.device_from_dict)
+    if not isinstance(item, dict):
+        raise ValueError("Cada dispositivo tem de ser um objeto JSON.")
+    if not str(item.get("name", "")).strip():
+        raise ValueError("Nome vazio.")
+    obj = device_from_dict(item)
+    if obj is None:
+        raise ValueError("Tipo desconhecido (ROUTER, SWITCH, AP ou ENDPOINT).")
+    return obj
+
+
+# Rotas: (método, caminho) -> (nome do método da API, tem parâmetro no caminho, é escrita)
+ROUTES = {
+    ("GET", "/status"): ("status", False, False),
+    ("GET", "/devices"): ("list_devices", False, False),
+    ("GET", "/devices/"): ("get_device", True, False),
+    ("GET", "/search"): ("search", False, False),
+    ("GET", "/traffic/top"): ("top", False, False),
+    ("POST", "/devices"): ("create", False, True),
+    ("POST", "/devices/batch"): ("create_batch", False, True),
+    ("POST", "/devices/lookup"): ("lookup", False, False),
+    ("POST", "/devices/delete"): ("delete_batch", False, True),
+    ("PUT", "/devices/"): ("replace", True, True),
+    ("DELETE", "/devices/"): ("delete", True, True),
+    ("POST", "/traffic"): ("ingest", False, True),
+    ("POST", "/policies/apply"): ("apply_policy", False, True),
+    ("POST", "/save"): ("save", False, False),
+    ("POST", "/reload"): ("reload", False, True),
+}
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1: a ligação fica aberta entre pedidos (keep-alive)
+    protocol_version = "HTTP/1.1"
+    server_version = "InventarioAPI/1.0"
+    # Ligações paradas são fechadas ao fim de N segundos (libertam a thread do pool)
+    timeout = 30
+    # TCP_NODELAY: cabeçalhos e corpo vão em escritas separadas; sem isto, com keep-alive,
+    # o algoritmo de Nagle + ACK atrasado do cliente acrescenta ~40 ms a cada resposta
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _dispatch(self, method: str):
+
+        # MÉTODO: _dispatch()
+
+        # O QUE FAZ:
+        #     1. Lê o corpo (se houver) antes de responder, para a ligação continuar utilizável
+        #     2. Encontra a rota (caminho exato ou prefixo /devices/<nome>)
+        #     3. GET: se o If-None-Match corresponder à versão atual responde 304 logo
+        #     4. Escritas: se o If-Match não corresponder responde 412
+        #     5. Chama a API dentro do lock e envia o JSON (fora do lock)
+
+        api = self.server.api
+        try:
+            body = self._read_body()
+            url = urlsplit(self.path)
+            path = url.path.rstrip("/") or "/"
+            query = parse_qs(url.query)
+
+            if method == "GET" and path.startswith("/export/"):
+                self._export(path[len("/export/"):])
+                return
+
+            route = ROUTES.get((method, path))
+            arg = None
+            if route is None and path.startswith("/devices/"):
+                route = ROUTES.get((method, "/devices/"))
+                arg = unquote(path[len("/devices/"):])
+            if route is None:
+                raise APIError(404, f"Rota desconhecida: {method} {url.path}")
+            name, has_arg, is_write = route
+
+            with api.lock:
+                tag = api.etag()
+                if method == "GET" and _matches(self.headers.get("If-None-Match"), tag):
+                    self._send(304, None, tag)
+                    return
+                if is_write and self.headers.get("If-Match") and not _matches(self.headers["If-Match"], tag):
+                    raise APIError(412, "O inventário mudou (If-Match não corresponde).")
+                handler = getattr(api, name)
+                if has_arg:
+                    result = handler(arg, body) if method == "PUT" else handler(arg)
+                else:
+                    result = handler(query if method == "GET" else body)
+                tag = api.etag()
+        except APIError as e:
+            self._error(e.status, e.detail)
+            return
+        except (ValueError, TypeError, KeyError) as e:
+            self._error(400, str(e))
+            return
+
+        self._send(201 if method == "POST" and name in ("create", "create_batch") else 200, result, tag)
+
+    def _read_body(self):
+        # Sem um Content-Length válido não se sabe onde acaba o corpo: fecha a ligação
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            raise APIError(400, "Content-Length inválido.")
+        if length > MAX_BODY:
+            self.close_connection = True
+            raise APIError(413, "Corpo demasiado grande.")
+        if not length:
+            return {}
+        raw = self.rfile.read(length)
+        try:
+            return json.loads(raw)
+        except ValueError:
+            raise ValueError("Corpo não é JSON válido.") from None
+
+    def _send(self, status: int, payload, tag: str = None):
+        data = b"" if payload is None else json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        if tag:
+            self.send_header("ETag", tag)
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def _error(self, status: int, detail):
+        self._send(status, {"error": detail})
+
+    def _export(self, fmt: str):
+
+        # MÉTODO: _export()
+
+        # O QUE FAZ:
+        #     1. Com o lock: gera a exportação (exports.py) bloco a bloco para um ficheiro
+        #        temporário (em memória até EXPORT_SPOOL bytes, depois em disco); é uma
+        #        fotografia coerente do inventário, que não muda a meio
+        #     2. Sem o lock: envia o ficheiro com Content-Length; um cliente lento só
+        #        atrasa a sua própria ligação, não os pedidos que precisam do inventário
+
+        api = self.server.api
+        if fmt not in FORMATS:
+            self._error(404, f"Formato de exportação inválido: {fmt}")
+            return
+        mime = FORMATS[fmt][2]
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL) as snapshot:
+            with api.lock:
+                tag = api.etag()
+                fresh = _matches(self.headers.get("If-None-Match"), tag)
+                if not fresh and fmt in STREAMS:
+                    for chunk in STREAMS[fmt](api.inventory):
+                        snapshot.write(chunk)
+                elif not fresh:
+                    # Excel: o openpyxl escreve o ficheiro completo de uma vez
+                    snapshot.write(FORMATS[fmt][3](api.inventory))
+
+            if fresh:
+                self._send(304, None, tag)
+                return
+            self.send_response(200)
+            self.send_header("ETag", tag)
+            self.send_header("Content-Type", mime)
+            self.send_header("Content-Length", str(snapshot.tell()))
+            self.end_headers()
+            snapshot.seek(0)
+            shutil.copyfileobj(snapshot, self.wfile)
+
+
+def _matches(header: str, tag: str) -> bool:
+    # If-None-Match / If-Match: lista de ETags separadas por vírgulas, ou "*"
+    if not header:
+        return False
+    return any(t.strip() in ("*", tag, "W/" + tag) for t in header.split(","))
+
+
+class PooledHTTPServer(HTTPServer):
+    # HTTPServer em que cada ligação aceite é entregue a um pool fixo de threads (em vez
+    # de uma thread nova por ligação, como o ThreadingHTTPServer). Com keep-alive, uma
+    # ligação ocupa uma thread enquanto estiver aberta: "threads" é o nº máximo de
+    # clientes atendidos ao mesmo tempo (os seguintes esperam até uma ligação fechar)
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address, api, threads: int = 16, verbose: bool = False):
+        if threads <= 0:
+            raise ValueError("threads tem de ser > 0.")
+        super().__init__(address, APIHandler)
+        self.api = api
+        self.verbose = verbose
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="api")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP/JSON do inventário de rede.")
+    parser.add_argument("--file", default="inventario.json", help="ficheiro JSON do inventário")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--threads", type=int, default=16, help="ligações atendidas em simultâneo")
+    parser.add_argument("--verbose", action="store_true", help="regista cada pedido")
+    args = parser.parse_args()
+
+    inv = load_from_json(args.file) if os.path.exists(args.file) else NetworkInventory()
+    api = InventoryAPI(inv, args.file)
+    server = PooledHTTPServer((args.host, args.port), api, args.threads, args.verbose)
+    print(f"API em http://{args.host}:{server.server_port} ({len(inv.devices)} dispositivos). Ctrl+C para terminar.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with api.lock:
+            save_to_json(api.inventory, args.file)
+        print("Inventário gravado.")
+
+
+if __name__ == "__main__":
+    main()
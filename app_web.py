@@ -1,25 +1,160 @@
 import streamlit as st
 import json
 import os
+import threading
 import pandas as pd 
-from io import BytesIO 
 from inventory import NetworkInventory
-from devices import Router, Switch, AccessPoint, Endpoint
-from storage import save_to_json, load_from_json
+from devices import Router, Switch, AccessPoint, Endpoint, PORT_CLASSES
+from storage import save_to_json, load_from_json, inventory_from_dicts
+from policies import CumulativeLimitPolicy, WindowLimitPolicy, RuleEnginePolicy, PolicyRule
+from exports import FORMATS
+from traffic_stats import summarize
+from bulk_import import BulkImporter
+from perf import PerfRecorder, deactivate as perf_deactivate
 
 # ==================================================
 # CONFIGURAÇÃO DA PÁGINA E ESTADO
 # ==================================================
 st.set_page_config(page_title="Network Manager Pro", layout="wide")
 
-if 'inv' not in st.session_state:
-    if os.path.exists("inventario.json"):
-        try: st.session_state.inv = load_from_json("inventario.json")
-        except: st.session_state.inv = NetworkInventory()
-    else:
-        st.session_state.inv = NetworkInventory()
-
-inv = st.session_state.inv
+FILE_DB = "inventario.json"
+
+# Listas de escolha e botões por rerun são limitados: com muitos dispositivos,
+# desenhar um selectbox com todos os nomes custa mais do que o resto da página
+LIMITE_ESCOLHA = 50
+LIMITE_LIGACOES = 20
+TIPOS_EQUIPAMENTO = ("ROUTER", "SWITCH", "AP")
+
+# HUD de desempenho (opcional, barra lateral): mede cada secção da página e as
+# chamadas aos métodos do NetworkInventory em cada rerun (perf.py). Cada sessão tem
+# o seu medidor, com histórico das suas últimas runs e percentis: as chamadas feitas
+# pelas outras sessões (outras threads) não entram nele. A instrumentação da classe
+# é partilhada e só é retirada quando nenhuma sessão tiver o HUD ligado.
+if "perf_recorder" not in st.session_state:
+    st.session_state.perf_recorder = PerfRecorder(history=200)
+medidor = st.session_state.perf_recorder
+hud_ativo = st.session_state.get("perf_hud", False)
+if hud_ativo:
+    medidor.instrument(NetworkInventory)
+    medidor.start_run()
+else:
+    # Uma run desta thread interrompida (ex: st.rerun) não fica a receber chamadas
+    perf_deactivate()
+
+def marcar(secao):
+    """Fecha a secção anterior do HUD e começa a medir a seguinte."""
+    if hud_ativo:
+        medidor.mark(secao)
+
+def alternar_hud():
+    """Callback do checkbox: ao desligar o HUD larga a instrumentação desta sessão."""
+    if not st.session_state.perf_hud:
+        st.session_state.perf_recorder.uninstrument()
+
+# O inventário é lido uma vez por processo do servidor e partilhado por todas as
+# sessões (st.cache_resource): uma sessão nova não volta a ler o JSON. Só é relido
+# quando o ficheiro muda no disco (mtime), ex: gravado pelo ingest_daemon.py, e
+# nunca por cima de alterações ainda não gravadas.
+# Cada sessão guarda apenas estado da interface (formulários, páginas, caches).
+# O NetworkInventory não é thread-safe e cada sessão corre na sua thread: qualquer
+# alteração e qualquer passagem completa pelo inventário (páginas, pesquisas,
+# exportações, totais) fazem-se com o lock partilhado (RLock: pode ser retomado
+# dentro da mesma thread, ex: definir_inventario dentro de um bloco já bloqueado).
+@st.cache_resource
+def inventario_partilhado():
+    return {"inv": None, "base": None, "mtime": None, "versao_gravada": None,
+            "geracao": 0, "motivo": None, "lock": threading.RLock()}
+
+def bloqueio():
+    """Lock partilhado por todas as sessões para aceder ao inventário."""
+    return inventario_partilhado()["lock"]
+
+def _mtime_ficheiro():
+    try:
+        return os.stat(FILE_DB).st_mtime_ns
+    except OSError:
+        return None
+
+def _ler_ficheiro(atual=None):
+    """Lê o FILE_DB; as políticas permanentes do inventário atual passam para o novo."""
+    mtime = _mtime_ficheiro()
+    novo = load_from_json(FILE_DB) if mtime is not None else NetworkInventory()
+    if atual is not None:
+        for pol in atual.standing_policies:
+            novo.register_policy(pol)
+    return novo, mtime
+
+def definir_inventario(novo_inv, motivo, base=None, gravado=False, mtime=None):
+    """Troca o inventário partilhado (todas as sessões passam a ver o novo).
+
+    gravado=True quando o novo inventário é igual ao ficheiro (acabado de ler):
+    só então deixa de ter alterações por gravar.
+    """
+    partilhado = inventario_partilhado()
+    with partilhado["lock"]:
+        partilhado["inv"] = novo_inv
+        # Hashes dos dispositivos no momento da leitura: base comum para fusões de backups
+        partilhado["base"] = base if base is not None else novo_inv.fingerprints()
+        partilhado["mtime"] = mtime if gravado else _mtime_ficheiro()
+        partilhado["versao_gravada"] = novo_inv.version if gravado else None
+        partilhado["geracao"] += 1
+        partilhado["motivo"] = motivo
+        # Exportações e gráficos gerados para o inventário anterior deixam de servir
+        partilhado.pop("exports", None)
+        partilhado.pop("charts", None)
+
+def marcar_gravado(inv_gravado):
+    """Depois de gravar o FILE_DB: o ficheiro passa a corresponder ao inventário em memória."""
+    partilhado = inventario_partilhado()
+    with partilhado["lock"]:
+        partilhado["mtime"] = _mtime_ficheiro()
+        partilhado["versao_gravada"] = inv_gravado.version
+
+def obter_inventario():
+    """Devolve (inventário partilhado, aviso) relendo o ficheiro só se o mtime mudou.
+
+    aviso é None ou (nível, mensagem): erro de leitura (o ficheiro volta a ser lido
+    no rerun seguinte) ou ficheiro alterado com alterações por gravar em memória
+    (nesse caso o inventário em memória mantém-se até o utilizador escolher).
+    """
+    partilhado = inventario_partilhado()
+    mtime = _mtime_ficheiro()
+    if partilhado["inv"] is not None and mtime == partilhado["mtime"]:
+        return partilhado["inv"], None
+    with partilhado["lock"]:
+        # Outra sessão pode ter recarregado enquanto esperávamos pelo lock
+        atual = partilhado["inv"]
+        if atual is not None and mtime == partilhado["mtime"]:
+            return atual, None
+        if atual is not None and mtime is None:
+            # Ficheiro apagado: o inventário em memória continua a ser o único
+            partilhado["mtime"] = None
+            partilhado["versao_gravada"] = None
+            return atual, ("warning", f"{FILE_DB} já não existe: use «Guardar no Servidor» para o recriar.")
+        if atual is not None and atual.version != partilhado["versao_gravada"]:
+            return atual, ("warning", f"{FILE_DB} mudou no disco, mas há alterações por gravar. "
+                                      "«Recarregar do Ficheiro» descarta-as; «Guardar no Servidor» substitui o ficheiro.")
+        try:
+            novo, mtime = _ler_ficheiro(atual)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if atual is None:
+                # Sem inventário anterior: começa vazio (o ficheiro volta a ser lido a seguir)
+                partilhado["inv"] = NetworkInventory()
+                partilhado["base"] = {}
+                partilhado["versao_gravada"] = partilhado["inv"].version
+            return partilhado["inv"], ("error", f"Erro ao ler {FILE_DB}: {e}")
+        motivo = None if atual is None else f"Inventário relido de {FILE_DB} (alterado no disco)."
+        definir_inventario(novo, motivo, gravado=True, mtime=mtime)
+        return novo, None
+
+marcar("Carregar inventário")
+inv, aviso_inv = obter_inventario()
+
+# Outra sessão (ou o disco) trocou o inventário desde o último rerun desta sessão
+_partilhado = inventario_partilhado()
+if st.session_state.get("inv_geracao", _partilhado["geracao"]) != _partilhado["geracao"] and _partilhado["motivo"]:
+    st.toast(_partilhado["motivo"])
+st.session_state.inv_geracao = _partilhado["geracao"]
 
 if 'editing_device' not in st.session_state:
     st.session_state.editing_device = None
@@ -89,123 +224,118 @@ def click_cancelar():
 # SIDEBAR: GESTÃO DE DADOS
 # ==================================================
 with st.sidebar:
+    marcar("Barra lateral: servidor")
     st.title("Gestão de Dados")
+    aviso_area = st.empty()
+    if aviso_inv is not None:
+        getattr(aviso_area, aviso_inv[0])(aviso_inv[1])
     
     # --- BOTÕES DE SERVIDOR (MANTER IGUAL) ---
     if st.button("Guardar no Servidor", key="btn_save_srv"):
-        save_to_json(inv, "inventario.json")
+        with bloqueio():
+            save_to_json(inv, FILE_DB)
+            # O ficheiro gravado é o próprio inventário em memória: não é preciso relê-lo
+            marcar_gravado(inv)
+        aviso_area.empty()
         st.success("Dados guardados.")
     
     if st.button("Recarregar do Ficheiro", key="btn_reload_srv"):
-        st.session_state.inv = load_from_json("inventario.json")
-        st.session_state.editing_device = None
-        limpar_form()
-        st.rerun()
+        try:
+            with bloqueio():
+                novo_inv, mtime_lido = _ler_ficheiro(inv)
+                definir_inventario(novo_inv, f"Inventário recarregado de {FILE_DB}.", gravado=True, mtime=mtime_lido)
+            st.session_state.editing_device = None
+            limpar_form()
+            st.rerun()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            st.error(f"Erro ao ler {FILE_DB}: {e}")
     
     st.divider()
+    marcar("Barra lateral: exportar")
     st.subheader("Exportar Dados")
 
-    # Prepara os dados uma única vez
-    lista_dicts = [d.to_dict() for d in inv.list_devices()]
-    
-    if not lista_dicts:
+    if len(inv) == 0:
         st.warning("Inventário vazio.")
     else:
-        # Cria um DataFrame do Pandas (Tabela inteligente)
-        df = pd.DataFrame(lista_dicts)
-
-        # 1. DOWNLOAD JSON (O que já tinha)
-        st.download_button(
-            label="📄 Download JSON", 
-            data=json.dumps(lista_dicts, indent=2, ensure_ascii=False), 
-            file_name="inventario.json", 
-            mime="application/json",
-            key="btn_json"
-        )
-
-        # 2. DOWNLOAD CSV
-        # Converte a tabela para CSV
-        csv_data = df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📊 Download CSV",
-            data=csv_data,
-            file_name="inventario.csv",
-            mime="text/csv",
-            key="btn_csv"
-        )
-
-        # 3. DOWNLOAD EXCEL (Requer openpyxl)
-        # O Excel é binário, precisa de um buffer (BytesIO)
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Dispositivos')
-        
-        st.download_button(
-            label="📗 Download Excel",
-            data=buffer.getvalue(),
-            file_name="inventario.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="btn_excel"
-        )
-
-        # 4. DOWNLOAD TXT (Relatório legível)
-        # Cria um texto formatado linha a linha
-        txt_lines = []
-        for d in inv.list_devices():
-            txt_lines.append(f"--- {d.name} ---")
-            txt_lines.append(str(d))
-            txt_lines.append(f"Obs: {d.observations}\n")
-        
-        st.download_button(
-            label="📝 Download TXT",
-            data="\n".join(txt_lines),
-            file_name="inventario.txt",
-            mime="text/plain",
-            key="btn_txt"
-        )
+        # Cada formato só é gerado quando pedido e fica guardado até o inventário
+        # mudar (chave: geração do inventário partilhado + inv.version; id() pode
+        # repetir-se depois de uma troca), por isso os reruns não o refazem.
+        # Como o inventário, a cache é partilhada por todas as sessões
+        cache_exp = inventario_partilhado().setdefault("exports", {})
+        versao = (inventario_partilhado()["geracao"], inv.version)
+        for fmt, (rotulo, ficheiro, mime, gerar) in FORMATS.items():
+            pronto = cache_exp.get(fmt)
+            if pronto is not None and pronto[0] == versao:
+                st.download_button(label=f"{rotulo} (Download)", data=pronto[1], file_name=ficheiro,
+                                   mime=mime, key=f"btn_dl_{fmt}")
+            elif st.button(f"{rotulo} (Gerar)", key=f"btn_gen_{fmt}"):
+                with bloqueio():
+                    cache_exp[fmt] = (versao, gerar(inv))
+                st.rerun()
 
     st.divider()
+    marcar("Barra lateral: upload")
     st.subheader("Upload Local")
     # ... (MANTENHA O RESTO DO CÓDIGO DE UPLOAD IGUAL) ...
     uploaded_file = st.file_uploader("Carregar backup JSON", type=["json"], key="uploader_json")
 
     if uploaded_file is not None:
+        # Fundir aplica só as diferenças (preserva alterações feitas entretanto nesta sessão)
+        modo_restauro = st.radio("Modo de restauro", ["Fundir alterações", "Substituir tudo"], key="restore_mode")
         if st.button("Restaurar Backup", use_container_width=True, key="btn_restore_upload"):
             try:
                 data = json.load(uploaded_file)
-                temp_inv = NetworkInventory()
-                for item in data:
-                    t = item.get("type")
-                    mod = item.get("model", "")
-                    ser_int = item.get("serial_interface", False)
-                    obs = item.get("observations", "")
-
-                    if t == "ROUTER":
-                        obj = Router(item["name"], item.get("ipv4", ""), "", item["mac_address"], mod, ser_int, obs)
-                        obj.connected_devices = list(item.get("connected_devices", []))
-                    elif t == "SWITCH":
-                        obj = Switch(item["name"], "", item["mac_address"], int(item["ports"]), 
-                                     item.get("eth_ports", 0), item.get("fast_eth_ports", 0), item.get("giga_eth_ports", 0),
-                                     mod, ser_int, obs)
-                        obj.connected_devices = list(item.get("connected_devices", []))
-                    elif t == "AP":
-                        obj = AccessPoint(item["name"], item["ssid"], mod, ser_int, obs)
-                        obj.connected_endpoints = list(item.get("connected_endpoints", []))
-                    elif t == "ENDPOINT":
-                        obj = Endpoint(item["name"], item["user_id"], item.get("ipv4", ""), "", item["mac_address"], mod, ser_int, obs)
-                        obj.traffic_up_mb = float(item.get("traffic_up_mb", 0.0))
-                        obj.traffic_down_mb = float(item.get("traffic_down_mb", 0.0))
-                    
-                    obj.status = item.get("status", "ACTIVE")
-                    temp_inv.add_device(obj)
-
-                st.session_state.inv = temp_inv
+                temp_inv = inventory_from_dicts(data)
+
+                if modo_restauro == "Substituir tudo":
+                    # As políticas permanentes continuam ativas, como em _ler_ficheiro
+                    with bloqueio():
+                        atual = inventario_partilhado()["inv"]
+                        for pol in (atual.standing_policies if atual is not None else ()):
+                            temp_inv.register_policy(pol)
+                        definir_inventario(temp_inv, "Inventário substituído por um backup.")
+                    st.success("Backup restaurado!")
+                else:
+                    # Fusão a três vias contra o estado lido do servidor (base comum)
+                    with bloqueio():
+                        rel = inv.merge(temp_inv, base=inventario_partilhado()["base"])
+                    st.success(f"Fusão concluída: {len(rel['added'])} adicionados, "
+                               f"{len(rel['modified'])} modificados, {len(rel['removed'])} removidos.")
+                    for nome_c, motivo in rel["conflicts"]:
+                        st.warning(f"Conflito em {nome_c}: {motivo}")
+
+                # A base mantém-se (estado local lido do servidor): é o antepassado comum
+                # para fusões seguintes; "Substituir tudo" já a trocou em definir_inventario
                 st.session_state.editing_device = None
                 limpar_form()
-                st.success("Backup restaurado!")
-                st.rerun()
+                if modo_restauro == "Substituir tudo":
+                    st.rerun()
             except Exception as e: st.error(f"Erro no Upload: {e}")
-                
+
+    st.divider()
+    marcar("Barra lateral: importação")
+    st.subheader("Importação em Massa")
+    # Folha CSV/Excel com as colunas da exportação: validada por inteiro antes de
+    # importar (tudo ou nada), com o relatório de todos os erros de uma vez
+    folha = st.file_uploader("Carregar folha CSV/Excel", type=["csv", "xlsx"], key="uploader_bulk")
+    if folha is not None and st.button("Importar Dispositivos", use_container_width=True, key="btn_bulk_import"):
+        try:
+            with bloqueio():
+                res = BulkImporter(inv).import_file(folha, folha.name)
+            st.session_state.bulk_errors = res["errors"]
+            if res["errors"]:
+                st.error(f"{len(res['errors'])} erros em {res['rows']} linhas: nada foi importado.")
+            else:
+                st.success(f"{res['added']} dispositivos importados.")
+        except Exception as e: st.error(f"Erro na importação: {e}")
+
+    if st.session_state.get("bulk_errors"):
+        erros_df = pd.DataFrame(st.session_state.bulk_errors, columns=["Linha", "Coluna", "Erro"])
+        st.dataframe(erros_df, use_container_width=True, hide_index=True, height=200)
+        st.download_button("Relatório de erros (CSV)", erros_df.to_csv(index=False).encode("utf-8"),
+                           file_name="erros_importacao.csv", mime="text/csv", key="btn_bulk_report")
+
+marcar("Cabeçalho")
 st.title("Sistema de Gestão de Rede")
 
 # ==================================================
@@ -215,6 +345,7 @@ tab_gestao, tab_consultas, tab_trafego, tab_ligacoes = st.tabs(["Gestão", "Cons
 
 # --- 1. TAB GESTÃO ---
 with tab_gestao:
+    marcar("Gestão: formulário")
     col_add, col_list = st.columns([1, 2])
     is_editing = st.session_state.editing_device is not None
     dev_edit = st.session_state.editing_device
@@ -239,17 +370,18 @@ with tab_gestao:
 
         # Função interna de guardar/atualizar
         def process_update(new_obj):
-            if is_editing:
-                # Mantém conexões antigas
-                if hasattr(dev_edit, "connected_devices"): new_obj.connected_devices = dev_edit.connected_devices
-                if hasattr(dev_edit, "connected_endpoints"): new_obj.connected_endpoints = dev_edit.connected_endpoints
-                # Mantém tráfego se for Endpoint
-                if isinstance(new_obj, Endpoint):
-                    new_obj.traffic_up_mb = dev_edit.traffic_up_mb
-                    new_obj.traffic_down_mb = dev_edit.traffic_down_mb
-                inv.remove_device(dev_edit.name)
-            
-            inv.add_device(new_obj)
+            with bloqueio():
+                if is_editing:
+                    # Mantém conexões antigas
+                    if hasattr(dev_edit, "connected_devices"): new_obj.connected_devices = dev_edit.connected_devices
+                    if hasattr(dev_edit, "connected_endpoints"): new_obj.connected_endpoints = dev_edit.connected_endpoints
+                    # Mantém tráfego se for Endpoint
+                    if isinstance(new_obj, Endpoint):
+                        new_obj.traffic_up_mb = dev_edit.traffic_up_mb
+                        new_obj.traffic_down_mb = dev_edit.traffic_down_mb
+                    inv.remove_device(dev_edit.name)
+
+                inv.add_device(new_obj)
             st.session_state.editing_device = None
             limpar_form() # Limpa o form para o próximo uso
             st.rerun()
@@ -295,45 +427,85 @@ with tab_gestao:
         if is_editing:
             st.button("Cancelar", key="btn_cancel_edit", on_click=click_cancelar)
 
+    marcar("Gestão: lista")
     with col_list:
         st.subheader("Lista do Inventário")
-        for d in inv.list_devices():
-            with st.expander(f"{d.name} ({d.device_type})"):
-                
-                # Info Técnica + MAC
-                mac_val = getattr(d, 'mac_address', '-')
-                st.write(f"**MAC:** {mac_val} | **Modelo:** {d.model} | **Serial:** {'Sim' if d.serial_interface else 'Não'}")
-                
-                # Observações
-                st.info(f"**Obs.:** {d.observations if d.observations else 'Sem observações.'}")
-                
-                # Raw info (opcional)
-                st.text(str(d))
-                
-                c1, c2 = st.columns(2)
-                
-                # === BOTÃO EDITAR CORRIGIDO COM CALLBACK ===
-                # O argumento 'on_click' garante que o estado é atualizado ANTES
-                # de o Streamlit tentar desenhar o formulário novamente.
-                c1.button("Editar Dispositivo", 
-                          key=f"ed_{d.name}", 
-                          on_click=click_editar, 
-                          args=(d,)
-                )
-                # ===========================================
-                
-                if c2.button("Eliminar Dispositivo", key=f"el_{d.name}"):
-                    inv.remove_device(d.name)
-                    st.rerun()
-        
+
+        # Só a página atual é desenhada (tabela + ações), por isso o tempo de cada
+        # rerun não cresce com o inventário. Filtro e ordenação são feitos no servidor
+        # por inv.page(); a navegação usa cursores (pilha das páginas anteriores).
+        f1, f2, f3, f4 = st.columns([2, 1, 1, 1])
+        filtro_txt = f1.text_input("Filtrar por nome", key="list_filter_name").strip().lower()
+        filtro_tipo = f2.selectbox("Tipo", ["Todos", "ROUTER", "SWITCH", "AP", "ENDPOINT"], key="list_filter_type")
+        ordem = f3.selectbox("Ordenar por", ["Nome", "Inserção"], key="list_order")
+        por_pagina = f4.selectbox("Por página", [25, 50, 100], key="list_page_size")
+
+        # Mudou o filtro/ordem/tamanho -> volta à primeira página
+        pedido = (filtro_txt, filtro_tipo, ordem, por_pagina)
+        if st.session_state.get("list_query") != pedido:
+            st.session_state.list_query = pedido
+            st.session_state.list_cursors = [None]
+
+        def filtro_lista(d):
+            if filtro_tipo != "Todos" and d.device_type != filtro_tipo:
+                return False
+            return not filtro_txt or filtro_txt in d.name.lower()
+
+        cursores = st.session_state.list_cursors
+        predicado = filtro_lista if (filtro_txt or filtro_tipo != "Todos") else None
+        with bloqueio():
+            try:
+                pagina, proximo = inv.page(por_pagina, cursores[-1], "name" if ordem == "Nome" else "insertion", predicado)
+            except ValueError:
+                # Cursor inválido (ex: inventário substituído): recomeça
+                st.session_state.list_cursors = cursores = [None]
+                pagina, proximo = inv.page(por_pagina, None, "name" if ordem == "Nome" else "insertion", predicado)
+            linhas = [{
+                "Nome": d.name,
+                "Tipo": d.device_type,
+                "Estado": d.status,
+                "MAC": getattr(d, "mac_address", "-"),
+                "Modelo": d.model,
+                "Serial": "Sim" if d.serial_interface else "Não",
+                "Obs.": d.observations,
+            } for d in pagina]
+
+        if not pagina:
+            st.info("Nenhum dispositivo encontrado.")
+        else:
+            st.dataframe(pd.DataFrame(linhas), use_container_width=True, hide_index=True)
+
+            # Ações sobre uma linha da página atual
+            a1, a2, a3 = st.columns([2, 1, 1])
+            por_nome = {d.name: d for d in pagina}
+            sel_nome = a1.selectbox("Dispositivo", list(por_nome), key="list_row_select", label_visibility="collapsed")
+            a2.button("Editar", key="btn_list_edit", on_click=click_editar, args=(por_nome[sel_nome],),
+                      use_container_width=True)
+            if a3.button("Eliminar", key="btn_list_delete", use_container_width=True):
+                with bloqueio():
+                    inv.remove_device(sel_nome)
+                st.rerun()
+
+        # Navegação entre páginas
+        n1, n2, n3 = st.columns([1, 2, 1])
+        if n1.button("◀ Anterior", key="btn_list_prev", disabled=len(cursores) == 1):
+            cursores.pop()
+            st.rerun()
+        n2.caption(f"Página {len(cursores)} · {len(inv)} dispositivos no inventário")
+        if n3.button("Seguinte ▶", key="btn_list_next", disabled=proximo is None):
+            cursores.append(proximo)
+            st.rerun()
+
         st.divider()
         if st.button("NUKE - Limpar Tudo", type="primary", use_container_width=True, key="btn_nuke_all"):
-            for d in list(inv.list_devices()): inv.remove_device(d.name)
+            with bloqueio():
+                for d in list(inv.list_devices()): inv.remove_device(d.name)
             st.session_state.editing_device = None
             limpar_form()
             st.rerun()
 
 # --- 2. TAB CONSULTAS (Filtros Atualizados) ---
+marcar("Consultas")
 with tab_consultas:
     st.subheader("Filtros de Pesquisa")
     
@@ -342,27 +514,28 @@ with tab_consultas:
     with r1_c1:
         search_m = st.text_input("Filtrar por Modelo", key="query_modelo")
         if st.button("Pesquisar Modelo", key="btn_filter_model"):
-            results = [d for d in inv.list_devices() if search_m.lower() in d.model.lower()]
+            with bloqueio():
+                results = [str(d) for d in inv.iter_devices() if search_m.lower() in d.model.lower()]
             if results:
-                for r in results: st.text(str(r))
+                for r in results: st.text(r)
             else: st.warning("Nenhum modelo encontrado.")
                 
     with r1_c2:
         search_ser = st.selectbox("Interface Serial?", ["Não", "Sim"], key="query_ser")
         if st.button("Filtrar Serial", key="btn_filter_serial"):
-            results = [d for d in inv.list_devices() if d.serial_interface == (search_ser == "Sim")]
+            with bloqueio():
+                results = [str(d) for d in inv.iter_devices() if d.serial_interface == (search_ser == "Sim")]
             if results:
-                for r in results: st.text(str(r))
+                for r in results: st.text(r)
             else: st.info("Nenhum dispositivo encontrado.")
 
     with r1_c3:
         search_t = st.selectbox("Filtrar por Tipo", ["Todos", "ROUTER", "SWITCH", "AP", "ENDPOINT"], key="query_tipo")
         if st.button("Pesquisar Tipo", key="btn_filter_tipo"):
-            if search_t == "Todos":
-                results = inv.list_devices()
-            else:
-                results = [d for d in inv.list_devices() if d.device_type == search_t]
-            for r in results: st.text(str(r))
+            # Gerador filtrado: não copia o inventário ("Todos" = sem filtro de tipo)
+            with bloqueio():
+                results = [str(d) for d in inv.iter_devices(device_type="" if search_t == "Todos" else search_t)]
+            for r in results: st.text(r)
 
     st.divider()
     
@@ -372,58 +545,279 @@ with tab_consultas:
         search_s = st.selectbox("Estado do Dispositivo", ["Ativo", "Inativo"], key="query_status")
         if st.button("Filtrar Estado", key="btn_filter_status"):
             status_map = {"Ativo": "ACTIVE", "Inativo": "INACTIVE"}
-            results = [d for d in inv.list_devices() if d.status == status_map[search_s]]
+            with bloqueio():
+                results = [str(d) for d in inv.iter_devices(status=status_map[search_s])]
             if results:
-                for r in results: st.text(str(r))
+                for r in results: st.text(r)
             else: st.info(f"Nenhum dispositivo {search_s.lower()} encontrado.")
 
     with r2_c2:
-        search_ip = st.text_input("Pesquisar por IP (IPv4)", key="query_ip")
+        search_ip = st.text_input("Pesquisar por IP (IPv4 ou rede)", key="query_ip").strip()
         if st.button("Pesquisar IP", key="btn_filter_ip"):
-            # Procura em routers e endpoints que têm atributo ipv4
-            results = [d for d in inv.list_devices() if getattr(d, 'ipv4', '') == search_ip]
+            # Consulta direta ao índice de IPv4 (aceita também uma rede, ex: 10.0.0.0/24)
+            try:
+                with bloqueio():
+                    if "/" in search_ip:
+                        results = [str(d) for d in inv.find_by_ipv4_network(search_ip)]
+                    else:
+                        found = inv.find_by_ipv4(search_ip)
+                        results = [str(found)] if found else []
+            except ValueError:
+                results = []
             if results:
-                for r in results: st.text(str(r))
+                for r in results: st.text(r)
             else: st.warning("IP não encontrado no inventário.")
 
 # --- 3. TAB TRÁFEGO ---
+marcar("Tráfego: endpoint")
 with tab_trafego:
-    eps = [d for d in inv.list_devices() if isinstance(d, Endpoint)]
-    if not eps: 
+    with bloqueio():
+        n_eps = inv.count_by_type("ENDPOINT")
+    if not n_eps: 
         st.info("Adicione Endpoints na Gestão para monitorizar o tráfego.")
     else:
-        target = st.selectbox("Selecionar Endpoint", [e.name for e in eps], key="traffic_target_select")
-        ep_obj = inv.get_endpoint(target)
-        up = st.number_input("Novo Upload (MB)", value=float(ep_obj.traffic_up_mb), key="input_traffic_up")
-        down = st.number_input("Novo Download (MB)", value=float(ep_obj.traffic_down_mb), key="input_traffic_down")
-        if st.button("Atualizar Consumo", key="btn_update_traffic"):
-            ep_obj.traffic_up_mb, ep_obj.traffic_down_mb = up, down
-            st.success("Dados atualizados!")
-            st.rerun()
+        # A lista de escolha mostra no máximo LIMITE_ESCOLHA endpoints cujo nome começa
+        # pelo texto pesquisado (índice de nomes ordenados), e não todos os endpoints
+        t1, t2 = st.columns([1, 2])
+        pesquisa_ep = t1.text_input("Pesquisar endpoint (início do nome)", key="traffic_search")
+        with bloqueio():
+            candidatos = [e.name for e in inv.find_by_name_prefix(pesquisa_ep, LIMITE_ESCOLHA, ("ENDPOINT",))]
+        target = t2.selectbox("Selecionar Endpoint", candidatos, key="traffic_target_select")
+        st.caption(f"{n_eps} endpoints no inventário · a lista mostra no máximo {LIMITE_ESCOLHA}")
+        ep_obj = inv.get_endpoint(target) if target else None
+        if ep_obj is None:
+            st.info("Nenhum endpoint começa por esse nome.")
+        else:
+            up = st.number_input("Novo Upload (MB)", value=float(ep_obj.traffic_up_mb), key="input_traffic_up")
+            down = st.number_input("Novo Download (MB)", value=float(ep_obj.traffic_down_mb), key="input_traffic_down")
+            if st.button("Atualizar Consumo", key="btn_update_traffic"):
+                # set_traffic regista o aumento no histórico do endpoint
+                with bloqueio():
+                    ep_obj.set_traffic(up, down)
+                st.success("Dados atualizados!")
+                st.rerun()
+
+            # Histórico recente (buffers circulares do endpoint selecionado)
+            serie = ep_obj.traffic_series
+            if serie is not None:
+                resolucao = st.radio("Resolução", ["1m", "1h", "1d"], horizontal=True, key="traffic_resolution")
+                with bloqueio():
+                    taxa, ultima_hora, p95 = serie.rate(300), sum(serie.window_totals(3600)), serie.percentile(95)
+                    baldes = serie.downsample(resolucao)
+                m1, m2, m3 = st.columns(3)
+                m1.metric("Taxa (últimos 5 min)", f"{taxa:.3f} MB/s")
+                m2.metric("Tráfego (última hora)", f"{ultima_hora:.2f} MB")
+                m3.metric("P95 por minuto (última hora)", f"{p95:.2f} MB")
+                if baldes:
+                    hist_df = pd.DataFrame(baldes, columns=["Início", "Upload", "Download"])
+                    hist_df["Início"] = pd.to_datetime(hist_df["Início"], unit="s")
+                    st.line_chart(hist_df.set_index("Início"))
         
         st.divider()
+        marcar("Tráfego: políticas")
+        st.subheader("Política de Tráfego")
+        tipo_pol = st.radio("Tipo de política", ["Total acumulado", "Janela deslizante"], horizontal=True, key="policy_kind")
+        p1, p2, p3 = st.columns(3)
+        limite = p1.number_input("Limite (MB)", min_value=0.0, value=1000.0, key="policy_limit")
+        janela = p2.number_input("Janela (min)", min_value=1, value=15, key="policy_window",
+                                 disabled=(tipo_pol == "Total acumulado"))
+        susp_min = p3.number_input("Suspensão (min)", min_value=1, value=30, key="policy_suspend")
+        if tipo_pol == "Total acumulado":
+            politica = CumulativeLimitPolicy(limite, int(susp_min))
+        else:
+            politica = WindowLimitPolicy(limite, int(janela), int(susp_min))
+
+        b1, b2 = st.columns(2)
+        if b1.button("Aplicar Agora", key="btn_apply_policy"):
+            with bloqueio():
+                afetados = inv.apply_policy(politica)
+            if afetados:
+                st.warning("Suspensos: " + ", ".join(e.name for e in afetados))
+            else:
+                st.success("Nenhum endpoint foi suspenso.")
+
+        # Política permanente: avaliada a cada atualização de tráfego, só para o endpoint afetado
+        if b2.button("Tornar Permanente", key="btn_register_policy"):
+            with bloqueio():
+                inv.register_policy(politica)
+            st.rerun()
+
+        for i, pol in enumerate(inv.standing_policies):
+            c_pol, c_rem = st.columns([4, 1])
+            c_pol.write(f"🛡️ {pol.describe()} → suspensão de {pol.suspend_minutes} min")
+            if c_rem.button("Remover", key=f"rm_policy_{i}"):
+                with bloqueio():
+                    inv.unregister_policy(pol)
+                st.rerun()
+
+        # Regras por escalão: limites por utilizador, SSID ou modelo (a primeira regra que corresponde ganha)
+        st.markdown("#### Regras por Escalão")
+        if "rule_engine" not in st.session_state:
+            st.session_state.rule_engine = RuleEnginePolicy(30)
+        motor = st.session_state.rule_engine
+
+        with st.form("form_policy_rule", clear_on_submit=True):
+            r1, r2, r3 = st.columns(3)
+            r_nome = r1.text_input("Nome da regra")
+            r_crit = r2.selectbox("Critério", ["Utilizador", "SSID", "Modelo"])
+            r_valor = r3.text_input("Valor")
+            r4, r5 = st.columns(2)
+            r_limite = r4.number_input("Limite (MB)", min_value=0.0, value=500.0)
+            r_isento = r5.checkbox("Isento (sem limite)")
+            if st.form_submit_button("Adicionar Regra"):
+                campo = {"Utilizador": "user_id", "SSID": "ssid", "Modelo": "model"}[r_crit]
+                try:
+                    motor.add_rule(PolicyRule(r_nome, r_limite, exempt=r_isento, **{campo: r_valor}))
+                    st.rerun()
+                except ValueError as e:
+                    st.error(str(e))
+
+        for i, regra in enumerate(motor.rules):
+            c_reg, c_rem = st.columns([4, 1])
+            c_reg.write(f"{i + 1}. {regra.describe()}")
+            if c_rem.button("Remover", key=f"rm_rule_{i}"):
+                motor.remove_rule(i)
+                st.rerun()
+
+        d1, d2 = st.columns(2)
+        usar_omissao = d1.checkbox("Limite para os restantes endpoints", value=motor.default_limit_mb is not None,
+                                   key="rule_use_default")
+        omissao = d2.number_input("Limite por omissão (MB)", min_value=0.0,
+                                  value=float(motor.default_limit_mb or 1000.0), key="rule_default_limit",
+                                  disabled=not usar_omissao)
+        novo_omissao = omissao if usar_omissao else None
+        if novo_omissao != motor.default_limit_mb:
+            with bloqueio():
+                motor.set_default_limit(novo_omissao)
+        motor.suspend_minutes = int(susp_min)
+
+        b3, b4 = st.columns(2)
+        if b3.button("Aplicar Regras", key="btn_apply_rules"):
+            with bloqueio():
+                afetados = inv.apply_policy(motor)
+            if afetados:
+                for e in afetados:
+                    st.warning(f"{e.name} suspenso — {motor.reason(e)}")
+            else:
+                st.success("Nenhum endpoint foi suspenso.")
+        if b4.button("Tornar Regras Permanentes", key="btn_register_rules",
+                     disabled=motor in inv.standing_policies):
+            with bloqueio():
+                inv.register_policy(motor)
+            st.rerun()
+
+        with bloqueio():
+            suspensoes = list(inv.recent_suspensions)
+        if suspensoes:
+            with st.expander("Suspensões automáticas recentes"):
+                for ts_s, nome_s, motivo in reversed(suspensoes):
+                    st.write(f"{pd.to_datetime(ts_s, unit='s'):%Y-%m-%d %H:%M:%S} — {nome_s}: {motivo}")
+
+        st.divider()
+        marcar("Tráfego: gráfico")
         st.subheader("Visualização de Consumo")
-        chart_data = {e.name: e.traffic_up_mb + e.traffic_down_mb for e in eps}
-        st.bar_chart(chart_data)
+        # O gráfico usa um resumo de tamanho fixo (top N + "Outros", histograma, quantis)
+        # calculado no servidor e guardado até o inventário mudar (inv.version)
+        v1, v2, v3 = st.columns([2, 2, 1])
+        agrupar = v1.radio("Agrupar por", ["Endpoint", "Utilizador", "AP"], horizontal=True, key="chart_group")
+        vista = v2.radio("Vista", ["Top N + Outros", "Histograma", "Quantis"], horizontal=True, key="chart_view")
+        top_n = v3.number_input("N", min_value=1, max_value=50, value=10, key="chart_top_n")
+
+        grupo = {"Endpoint": "endpoint", "Utilizador": "user", "AP": "ap"}[agrupar]
+        cache_graf = inventario_partilhado().setdefault("charts", {})
+        chave = (grupo, int(top_n))
+        versao = (inventario_partilhado()["geracao"], inv.version)
+        pronto = cache_graf.get(chave)
+        if pronto is None or pronto[0] != versao:
+            with bloqueio():
+                pronto = (versao, summarize(inv.traffic_totals(grupo), int(top_n)))
+            cache_graf[chave] = pronto
+        resumo = pronto[1]
+
+        if not resumo["count"]:
+            st.info("Sem dados para este agrupamento.")
+        elif vista == "Top N + Outros":
+            st.bar_chart(pd.DataFrame(resumo["top"], columns=["Nome", "Total (MB)"]).set_index("Nome"),
+                         sort=False)
+        elif vista == "Histograma":
+            st.bar_chart(pd.DataFrame(
+                [(f"{a:.1f}–{b:.1f}", c) for a, b, c in resumo["histogram"]], columns=["Intervalo (MB)", "Quantidade"]
+            ).set_index("Intervalo (MB)"), sort=False)
+        else:
+            cols_q = st.columns(len(resumo["quantiles"]))
+            for col_q, (rotulo_q, valor_q) in zip(cols_q, resumo["quantiles"].items()):
+                col_q.metric(rotulo_q, f"{valor_q:.2f} MB")
+        if resumo["count"]:
+            plural = {"Endpoint": "endpoints", "Utilizador": "utilizadores", "AP": "APs"}[agrupar]
+            st.caption(f"{resumo['count']} {plural} · total {resumo['sum']:.2f} MB")
+
+        st.divider()
+        marcar("Tráfego: utilizadores")
+        st.subheader("Utilizadores")
+        with bloqueio():
+            top_u = inv.top_users(10)
+        st.dataframe(pd.DataFrame(top_u, columns=["Utilizador", "Upload (MB)", "Download (MB)"]),
+                     use_container_width=True, hide_index=True)
+        # O utilizador é escrito (por omissão o de maior consumo) em vez de escolhido
+        # numa lista com todos os utilizadores do inventário
+        u1, u2 = st.columns(2)
+        user_sel = u1.text_input("Utilizador", value=top_u[0][0] if top_u else "", key="user_suspend_input").strip()
+        user_min = u2.number_input("Suspensão (min)", min_value=1, value=30, key="user_suspend_minutes")
+        with bloqueio():
+            eps_user = [e.name for e in inv.find_by_user(user_sel)] if user_sel else []
+        if eps_user:
+            extra = f" (+{len(eps_user) - 20})" if len(eps_user) > 20 else ""
+            st.caption("Endpoints: " + ", ".join(eps_user[:20]) + extra)
+        elif user_sel:
+            st.caption("Este utilizador não tem endpoints.")
+        if st.button("Suspender Utilizador", key="btn_suspend_user", disabled=not eps_user):
+            with bloqueio():
+                suspensos = inv.suspend_user(user_sel, int(user_min))
+            st.warning("Suspensos: " + ", ".join(e.name for e in suspensos))
 
 # --- 4. TAB LIGAÇÕES ---
+marcar("Ligações")
 with tab_ligacoes:
-    hosts = [d for d in inv.list_devices() if hasattr(d, "connected_devices") or hasattr(d, "connected_endpoints")]
-    if not hosts: 
+    with bloqueio():
+        n_hosts = sum(inv.count_by_type(t) for t in TIPOS_EQUIPAMENTO)
+    if not n_hosts: 
         st.info("Crie Routers ou Switches para estabelecer ligações.")
     else:
-        h_name = st.selectbox("Escolher Equipamento Base", [h.name for h in hosts], key="host_link_select")
-        h_obj = inv.devices.get(h_name)
-        
+        # As listas de escolha (equipamento e destino) são limitadas e filtradas pelo
+        # início do nome, tal como no separador Tráfego
+        h1, h2 = st.columns([1, 2])
+        pesquisa_host = h1.text_input("Pesquisar equipamento (início do nome)", key="host_search")
+        with bloqueio():
+            candidatos_h = [h.name for h in inv.find_by_name_prefix(pesquisa_host, LIMITE_ESCOLHA, TIPOS_EQUIPAMENTO)]
+        h_name = h2.selectbox("Escolher Equipamento Base", candidatos_h, key="host_link_select")
+        h_obj = inv.devices.get(h_name) if h_name else None
+
+    if n_hosts and h_obj is None:
+        st.info("Nenhum equipamento começa por esse nome.")
+    elif n_hosts:
         c_link, c_view = st.columns(2)
         with c_link:
             st.markdown("### Criar Nova Ligação")
-            others = [d.name for d in inv.list_devices() if d.name != h_name]
+            pesquisa_alvo = st.text_input("Pesquisar destino (início do nome)", key="target_search")
+            with bloqueio():
+                others = [d.name for d in inv.find_by_name_prefix(pesquisa_alvo, LIMITE_ESCOLHA + 1)
+                          if d.name != h_name][:LIMITE_ESCOLHA]
             target = st.selectbox("Ligar a:", others, key="target_link_select")
-            if st.button("Estabelecer Ligação", key="btn_establish_link"):
+
+            # Nos Switches escolhe-se a classe de porta (contadores de portas livres por classe)
+            port_class = None
+            if isinstance(h_obj, Switch):
+                opcoes_porta = ["Automático"] + [f"{c} ({h_obj.free_ports(c)} livres)" for c in PORT_CLASSES]
+                escolha = st.selectbox("Porta", opcoes_porta, key="port_class_select")
+                if escolha != "Automático":
+                    port_class = escolha.split()[0]
+
+            if st.button("Estabelecer Ligação", key="btn_establish_link", disabled=not target):
                 try:
-                    if hasattr(h_obj, "connect_device"): h_obj.connect_device(target)
-                    else: h_obj.connect_endpoint(target)
+                    with bloqueio():
+                        if isinstance(h_obj, Switch): h_obj.connect_device(target, port_class)
+                        elif hasattr(h_obj, "connect_device"): h_obj.connect_device(target)
+                        else: h_obj.connect_endpoint(target)
                     st.success(f"Ligado: {h_name} <-> {target}")
                     st.rerun()
                 except Exception as e: st.error(e)
@@ -433,8 +827,70 @@ with tab_ligacoes:
             cons = getattr(h_obj, "connected_devices", []) or getattr(h_obj, "connected_endpoints", [])
             if not cons:
                 st.write("Sem dispositivos ligados.")
-            for c in cons:
+            # Só se desenham LIMITE_LIGACOES botões; o filtro encontra as restantes ligações
+            filtro_lig = st.text_input("Filtrar ligações", key="links_filter") if len(cons) > LIMITE_LIGACOES else ""
+            visiveis = [c for c in cons if c.startswith(filtro_lig)]
+            if len(visiveis) > LIMITE_LIGACOES:
+                st.caption(f"{len(visiveis)} ligações · a mostrar as primeiras {LIMITE_LIGACOES}")
+            for c in visiveis[:LIMITE_LIGACOES]:
                 if st.button(f"Desligar {c}", key=f"dis_{h_name}_{c}"):
-                    if hasattr(h_obj, "disconnect_device"): h_obj.disconnect_device(c)
-                    else: h_obj.disconnect_endpoint(c)
+                    with bloqueio():
+                        if hasattr(h_obj, "disconnect_device"): h_obj.disconnect_device(c)
+                        else: h_obj.disconnect_endpoint(c)
                     st.rerun()
+
+        # Carga agregada (mantida pelo inventário a cada tráfego/ligação, sem percorrer a rede)
+        st.divider()
+        st.markdown("### Carga por Equipamento")
+        with bloqueio():
+            up_h, down_h = inv.traffic_rollup(h_name)
+            a_montante = inv.upstream_of(h_name)
+        l1, l2, l3 = st.columns(3)
+        l1.metric(f"Upload ({h_name})", f"{up_h:.2f} MB")
+        l2.metric(f"Download ({h_name})", f"{down_h:.2f} MB")
+        l3.metric("A montante", a_montante or "-")
+
+        # Tabela de tamanho fixo: os equipamentos mais carregados de um tipo (top N +
+        # "Outros"), guardada até o inventário mudar, como o gráfico do separador Tráfego
+        tipo_carga = st.radio("Equipamentos", ["AP", "Switch", "Router"], horizontal=True, key="load_group")
+        grupo_carga = tipo_carga.lower()
+        cache_graf = inventario_partilhado().setdefault("charts", {})
+        chave = ("carga", grupo_carga)
+        versao = (inventario_partilhado()["geracao"], inv.version)
+        pronto = cache_graf.get(chave)
+        if pronto is None or pronto[0] != versao:
+            with bloqueio():
+                pronto = (versao, summarize(inv.traffic_totals(grupo_carga), 10))
+            cache_graf[chave] = pronto
+        resumo_carga = pronto[1]
+        if resumo_carga["count"]:
+            st.dataframe(pd.DataFrame(resumo_carga["top"], columns=["Equipamento", "Total (MB)"]),
+                         use_container_width=True, hide_index=True)
+            st.caption(f"{resumo_carga['count']} equipamentos · total {resumo_carga['sum']:.2f} MB")
+        else:
+            st.info("Sem equipamentos deste tipo.")
+
+# ==================================================
+# HUD DE DESEMPENHO
+# ==================================================
+with st.sidebar:
+    st.divider()
+    st.checkbox("Mostrar desempenho (HUD)", key="perf_hud", on_change=alternar_hud,
+                help="Mede cada secção e as chamadas ao inventário em cada rerun (só desta sessão).")
+    if hud_ativo:
+        run = medidor.end_run()
+        with st.expander("Desempenho", expanded=True):
+            st.caption(f"Última run: {run['total'] * 1000:.1f} ms · histórico de {len(medidor.runs)} runs")
+            st.dataframe(pd.DataFrame(
+                [(nome, ultima * 1000, p50 * 1000, p95 * 1000, maximo * 1000)
+                 for nome, _, ultima, p50, p95, maximo in medidor.summary()],
+                columns=["Secção", "Última (ms)", "P50 (ms)", "P95 (ms)", "Máx (ms)"]
+            ).round(1), use_container_width=True, hide_index=True)
+            st.dataframe(pd.DataFrame(
+                [(nome.split(".", 1)[1], n_run, t_run * 1000, n_tot, t_tot * 1000)
+                 for nome, n_run, t_run, n_tot, t_tot in medidor.call_summary()[:20]],
+                columns=["Método", "Chamadas (run)", "Tempo (run, ms)", "Chamadas", "Tempo (ms)"]
+            ).round(2), use_container_width=True, hide_index=True)
+            if st.button("Limpar histórico", key="btn_perf_reset"):
+                medidor.reset()
+                st.rerun()
@@ -0,0 +1,2 @@
+# Scripts de medição de desempenho (executar a partir da raiz do projeto):
+#     python -m benchmarks.<nome_do_script>
@@ -0,0 +1,139 @@
+# MÓDULO: benchmarks/bench_api.py
+# PROPÓSITO: Medir o débito da API HTTP (api_server.py) com um cliente local
+
+# DESCRIÇÃO:
+    # Arranca o api_server.py numa thread (porta livre, inventário sintético com N
+    # endpoints) e mede pedidos/s com C clientes em paralelo (http.client):
+    #   - GET /devices/<nome> com uma ligação nova por pedido vs keep-alive
+    #   - GET condicional (If-None-Match com o ETag atual -> 304, sem corpo)
+    #   - POST /traffic: um registo por pedido vs lotes de B registos (registos/s)
+    # Os tempos incluem o cliente (mesma máquina e mesmo processo, por isso o GIL é
+    # partilhado): servem para comparar os modos entre si, não como valor absoluto.
+
+# EXECUÇÃO:
+    # python -m benchmarks.bench_api [N] [--clients 4] [--requests 2000] [--batch 500]
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+
+from api_server import InventoryAPI, PooledHTTPServer
+from devices import Endpoint
+from inventory import NetworkInventory
+
+
+def _mac(i: int) -> str:
+    return ":".join(f"{(i >> s) & 255:02X}" for s in (40, 32, 24, 16, 8, 0))
+
+
+def _inventory(n: int) -> NetworkInventory:
+    inv = NetworkInventory()
+    for i in range(n):
+        inv.add_device(Endpoint(f"ep{i}", f"user{i % 50}", "", "", _mac(i)))
+    return inv
+
+
+def _run(clients: int, per_client: int, work) -> float:
+    # Corre work(conn_factory, rnd, k) per_client vezes em cada cliente; devolve os segundos
+    barrier = threading.Barrier(clients + 1)
+
+    def client(seed):
+        rnd = random.Random(seed)
+        state = {}
+        barrier.wait()
+        for k in range(per_client):
+            work(state, rnd, k)
+        conn = state.get("conn")
+        if conn is not None:
+            conn.close()
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def _request(conn, method, path, body=None, headers=None):
+    data = json.dumps(body).encode() if body is not None else None
+    hdrs = dict(headers or {})
+    if data is not None:
+        hdrs["Content-Type"] = "application/json"
+    conn.request(method, path, body=data, headers=hdrs)
+    resp = conn.getresponse()
+    resp.read()
+    return resp
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débito da API HTTP do inventário.")
+    parser.add_argument("endpoints", type=int, nargs="?", default=10000)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000, help="pedidos por cenário")
+    parser.add_argument("--batch", type=int, default=500, help="registos por pedido em lote")
+    args = parser.parse_args()
+
+    n = args.endpoints
+    server = PooledHTTPServer(("127.0.0.1", 0), InventoryAPI(_inventory(n)), threads=args.clients)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    per_client = max(1, args.requests // args.clients)
+    total = per_client * args.clients
+
+    def conn_of(state):
+        conn = state.get("conn")
+        if conn is None:
+            conn = state["conn"] = http.client.HTTPConnection(host, port)
+        return conn
+
+    def get_new_connection(state, rnd, k):
+        conn = http.client.HTTPConnection(host, port)
+        _request(conn, "GET", f"/devices/ep{rnd.randrange(n)}", headers={"Connection": "close"})
+        conn.close()
+
+    def get_keep_alive(state, rnd, k):
+        _request(conn_of(state), "GET", f"/devices/ep{rnd.randrange(n)}")
+
+    def get_conditional(state, rnd, k):
+        conn = conn_of(state)
+        path = f"/devices/ep{rnd.randrange(n)}"
+        resp = _request(conn, "GET", path, headers={"If-None-Match": state.get("etag", "")})
+        state["etag"] = resp.getheader("ETag")
+
+    def post_single(state, rnd, k):
+        i = rnd.randrange(n)
+        _request(conn_of(state), "POST", "/traffic", {"records": [[f"ep{i}", 1.0, 2.0]]})
+
+    def post_batch(state, rnd, k):
+        records = [[f"ep{i}" if i % 2 == 0 else _mac(i), 1.0, 2.0]
+                   for i in (rnd.randrange(n) for _ in range(args.batch))]
+        _request(conn_of(state), "POST", "/traffic", {"records": records})
+
+    print(f"Endpoints: {n}   clientes: {args.clients}   pedidos por cenário: {total}")
+    print(f"{'cenário':<44}{'pedidos/s':>12}{'registos/s':>14}")
+    scenarios = (
+        ("GET /devices/<nome> (ligação nova)", get_new_connection, 1),
+        ("GET /devices/<nome> (keep-alive)", get_keep_alive, 1),
+        ("GET condicional (If-None-Match -> 304)", get_conditional, 1),
+        ("POST /traffic (1 registo por pedido)", post_single, 1),
+        (f"POST /traffic (lotes de {args.batch})", post_batch, args.batch),
+    )
+    for label, work, records in scenarios:
+        # Os lotes são mais pesados: menos pedidos para um tempo comparável
+        count = per_client if records == 1 else max(1, per_client // 10)
+        seconds = _run(args.clients, count, work)
+        rate = count * args.clients / seconds
+        print(f"{label:<44}{rate:>12.0f}{rate * records:>14.0f}")
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# MÓDULO: benchmarks/bench_memory.py
+# PROPÓSITO: Medir a memória ocupada por cada dispositivo (bytes/dispositivo)
+
+# DESCRIÇÃO:
+    # Usa o tracemalloc para medir quantos bytes são alocados ao criar N endpoints:
+    #   - "antes": objetos com __dict__ e strings repetidas em cópias separadas
+    #     (o formato original das classes de devices.py)
+    #   - "depois": as classes atuais de devices.py (__slots__ + strings interned)
+
+# EXECUÇÃO:
+    # python -m benchmarks.bench_memory [N]
+
+import sys
+import tracemalloc
+
+from devices import Endpoint
+
+
+class _LegacyEndpoint:
+    # Réplica do layout antigo: atributos num __dict__ por instância e strings
+    # de baixa cardinalidade copiadas (não partilhadas) em cada objeto
+    def __init__(self, i: int):
+        self.name = f"ep{i}"
+        self.device_type = "".join(["END", "POINT"])
+        self.model = "".join(["Think", "Pad"])
+        self.serial_interface = False
+        self.status = "".join(["ACT", "IVE"])
+        self.observations = ""
+        self.user_id = "".join(["user", str(i % 50)])
+        self.ipv4 = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+        self.ipv6 = ""
+        self.mac_address = ":".join(f"{(i >> s) & 255:02X}" for s in (40, 32, 24, 16, 8, 0))
+        self.traffic_up_mb = 0.0
+        self.traffic_down_mb = 0.0
+        self.suspended_until = None
+
+
+def _new_endpoint(i: int):
+    return Endpoint(
+        name=f"ep{i}",
+        user_id="".join(["user", str(i % 50)]),
+        ipv4=f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+        ipv6="",
+        mac_address=":".join(f"{(i >> s) & 255:02X}" for s in (40, 32, 24, 16, 8, 0)),
+        model="".join(["Think", "Pad"]),
+    )
+
+
+def measure(factory, n: int) -> float:
+    # Devolve os bytes alocados (e ainda vivos) por objeto criado
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objs = [factory(i) for i in range(n)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Desconta a própria lista que segura os objetos
+    per_obj = (after - before - sys.getsizeof(objs)) / n
+    del objs
+    return per_obj
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    legacy = measure(_LegacyEndpoint, n)
+    current = measure(_new_endpoint, n)
+    print(f"Endpoints medidos: {n}")
+    print(f"Antes  (__dict__, sem interning): {legacy:8.1f} bytes/dispositivo")
+    print(f"Depois (__slots__ + interning):   {current:8.1f} bytes/dispositivo")
+    print(f"Redução: {100 * (1 - current / legacy):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# MÓDULO: benchmarks/bench_validation.py
+# PROPÓSITO: Medir a validação/conversão de endereços (MAC, IPv4, IPv6)
+
+# DESCRIÇÃO:
+    # Compara, para N endereços de cada tipo (com uma fração repetida e inválida):
+    #   - "antes": um valor de cada vez como antes (regex passada em texto a cada
+    #     chamada, ip_address interpretado para validar e outra vez para converter)
+    #   - "memorizado": is_valid_* + *_to_int do utils.py (parse_ip com LRU),
+    #     a frio (cache vazia) e a quente (segunda passagem)
+    #   - "lote": validate_macs / validate_ipv4s / validate_ipv6s do utils.py
+
+# EXECUÇÃO:
+    # python -m benchmarks.bench_validation [N]
+
+import random
+import re
+import sys
+import time
+from ipaddress import ip_address
+
+import utils
+from utils import (is_valid_ipv4, is_valid_ipv6, is_valid_mac, ipv4_to_int, ipv6_to_int, mac_to_int,
+                   validate_ipv4s, validate_ipv6s, validate_macs)
+
+
+def _legacy_mac(value):
+    mac = value.strip().upper().replace("-", ":")
+    if re.match(r"^([0-9A-F]{2}:){5}[0-9A-F]{2}$", mac) is None:
+        return None
+    return int(mac.replace(":", ""), 16)
+
+
+def _legacy_ip(version):
+    def convert(value):
+        try:
+            if ip_address(value).version != version:
+                return None
+        except ValueError:
+            return None
+        return int(ip_address(value))
+    return convert
+
+
+def _memo_mac(value):
+    return mac_to_int(value) if is_valid_mac(value) else None
+
+
+def _memo_ipv4(value):
+    return ipv4_to_int(value) if is_valid_ipv4(value) else None
+
+
+def _memo_ipv6(value):
+    return ipv6_to_int(value) if is_valid_ipv6(value) else None
+
+
+def _samples(n: int):
+    # ~10% de valores repetidos e ~2% inválidos, como numa folha real
+    rnd = random.Random(42)
+    macs, ipv4s, ipv6s = [], [], []
+    for i in range(n):
+        j = rnd.randrange(i) if i and rnd.random() < 0.1 else i
+        if rnd.random() < 0.02:
+            macs.append("ZZ:00"); ipv4s.append("300.1.1.1"); ipv6s.append("2001:db8::g")
+            continue
+        macs.append(":".join(f"{(j >> s) & 255:02x}" for s in (40, 32, 24, 16, 8, 0)))
+        ipv4s.append(f"10.{(j >> 16) & 255}.{(j >> 8) & 255}.{j & 255}")
+        ipv6s.append(f"2001:db8::{j:x}")
+    return {"MAC": macs, "IPv4": ipv4s, "IPv6": ipv6s}
+
+
+def _time(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    samples = _samples(n)
+    paths = {
+        "MAC": (_legacy_mac, _memo_mac, validate_macs),
+        "IPv4": (_legacy_ip(4), _memo_ipv4, validate_ipv4s),
+        "IPv6": (_legacy_ip(6), _memo_ipv6, validate_ipv6s),
+    }
+
+    print(f"Endereços por tipo: {n}")
+    print(f"{'tipo':<6}{'antes':>12}{'memo (frio)':>14}{'memo (quente)':>16}{'lote':>12}")
+    for kind, values in samples.items():
+        legacy, memo, batch = paths[kind]
+        expected = [legacy(v) for v in values]
+        assert batch(values)[1] == expected, kind
+
+        t_legacy = _time(lambda: [legacy(v) for v in values])
+        utils.parse_ip.cache_clear()
+        t_cold = _time(lambda: [memo(v) for v in values])
+        t_warm = _time(lambda: [memo(v) for v in values])
+        utils.parse_ip.cache_clear()
+        t_batch = _time(lambda: batch(values))
+        print(f"{kind:<6}{t_legacy:>11.3f}s{t_cold:>13.3f}s{t_warm:>15.3f}s{t_batch:>11.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# MÓDULO: benchmarks/load_generator.py
+# PROPÓSITO: Gerador de carga para o ingest_daemon (substitui os exportadores reais)
+
+# DESCRIÇÃO:
+    # Gera registos "chave,up,down" para N endpoints (metade por nome, metade por MAC)
+    # e envia-os ao ritmo pedido, em datagramas/blocos de várias linhas.
+    #   - udp / tcp: envia para um ingest_daemon já a correr
+    #   - local: sem sockets; mede o débito do IngestBuffer (parse + coalescing)
+    #     e do flush para um inventário sintético com N endpoints
+
+# EXECUÇÃO:
+    # python ingest_daemon.py --file inventario.json        (noutro terminal)
+    # python -m benchmarks.load_generator udp --rate 100000 --seconds 10
+    # python -m benchmarks.load_generator local --records 1000000
+
+import argparse
+import random
+import socket
+import time
+
+from devices import Endpoint
+from inventory import NetworkInventory
+from ingest_daemon import IngestBuffer
+
+
+def _mac(i: int) -> str:
+    return ":".join(f"{(i >> s) & 255:02X}" for s in (40, 32, 24, 16, 8, 0))
+
+
+def _keys(n: int, names=None):
+    # Chaves dos registos: nomes e MACs alternados (os dois formatos aceites)
+    if names:
+        return names
+    return [f"ep{i}" if i % 2 == 0 else _mac(i) for i in range(n)]
+
+
+def _batches(keys, lines_per_batch: int):
+    # Gerador infinito de blocos de texto com lines_per_batch registos cada
+    rnd = random.Random(1)
+    while True:
+        lines = [f"{rnd.choice(keys)},{rnd.random():.3f},{rnd.random() * 4:.3f}" for _ in range(lines_per_batch)]
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def send(mode: str, host: str, port: int, keys, rate: int, seconds: float, lines_per_batch: int):
+
+    # FUNÇÃO: send()
+
+    # O QUE FAZ:
+    #     - Envia blocos de registos por UDP ou TCP durante "seconds" segundos
+    #     - Dorme entre blocos para não ultrapassar "rate" registos/s
+    #     - Devolve o nº de registos enviados
+
+    if mode == "udp":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        out = lambda b: sock.sendto(b, (host, port))
+    else:
+        sock = socket.create_connection((host, port))
+        out = sock.sendall
+
+    # Pré-gera os blocos para o custo de geração não limitar o débito
+    gen = _batches(keys, lines_per_batch)
+    pool = [next(gen) for _ in range(64)]
+
+    sent = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            elapsed = time.perf_counter() - start
+            if elapsed >= seconds:
+                break
+            ahead = sent / rate - elapsed
+            if ahead > 0:
+                time.sleep(ahead)
+            out(pool[(sent // lines_per_batch) % len(pool)])
+            sent += lines_per_batch
+    finally:
+        sock.close()
+    return sent
+
+
+def local(n_endpoints: int, n_records: int, lines_per_batch: int, flush_every: int):
+
+    # FUNÇÃO: local()
+
+    # O QUE FAZ:
+    #     - Cria um inventário com n_endpoints endpoints
+    #     - Alimenta um IngestBuffer com n_records registos e faz flush a cada
+    #       flush_every blocos; devolve (registos/s, estatísticas)
+
+    inv = NetworkInventory()
+    for i in range(n_endpoints):
+        inv.add_device(Endpoint(f"ep{i}", f"user{i % 50}", "", "", _mac(i)))
+
+    buf = IngestBuffer()
+    gen = _batches(_keys(n_endpoints), lines_per_batch)
+    blocks = [next(gen) for _ in range(max(1, n_records // lines_per_batch))]
+
+    start = time.perf_counter()
+    for k, block in enumerate(blocks, 1):
+        buf.feed(block)
+        if k % flush_every == 0:
+            buf.flush_into(inv)
+    buf.flush_into(inv)
+    elapsed = time.perf_counter() - start
+    return len(blocks) * lines_per_batch / elapsed, buf.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga para o ingest_daemon.")
+    parser.add_argument("mode", choices=["udp", "tcp", "local"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="por omissão 9999 (UDP) / 9998 (TCP)")
+    parser.add_argument("--endpoints", type=int, default=1000, help="nº de endpoints distintos")
+    parser.add_argument("--names", help="lista de chaves separadas por vírgulas (em vez de ep0, MAC1, ...)")
+    parser.add_argument("--rate", type=int, default=100_000, help="registos/s (udp/tcp)")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duração (udp/tcp)")
+    parser.add_argument("--records", type=int, default=1_000_000, help="nº de registos (local)")
+    parser.add_argument("--batch", type=int, default=100, help="registos por datagrama/bloco")
+    parser.add_argument("--flush-every", type=int, default=1000, help="blocos entre flushes (local)")
+    args = parser.parse_args()
+
+    if args.mode == "local":
+        rate, stats = local(args.endpoints, args.records, args.batch, args.flush_every)
+        print(f"{rate:,.0f} registos/s  {stats}")
+        return
+
+    port = args.port or (9999 if args.mode == "udp" else 9998)
+    names = args.names.split(",") if args.names else None
+    sent = send(args.mode, args.host, port, _keys(args.endpoints, names), args.rate, args.seconds, args.batch)
+    print(f"Enviados {sent:,} registos em {args.seconds:.0f}s ({sent / args.seconds:,.0f} registos/s)")
+
+
+if __name__ == "__main__":
+    main()
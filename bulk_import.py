@@ -0,0 +1,273 @@
+# MÓDULO: bulk_import.py
+# PROPÓSITO: Importação em massa de dispositivos a partir de folhas CSV ou Excel
+
+# DESCRIÇÃO:
+    # Para registar um site inteiro (dezenas de milhares de linhas) de uma vez.
+    # A folha tem as mesmas colunas que a exportação (exports.py): type, name, model,
+    # serial_interface, status, observations, ipv4, ipv6, mac_address, ports,
+    # eth_ports, fast_eth_ports, giga_eth_ports, ssid, user_id, traffic_up_mb, ...
+    # A importação tem três fases:
+    #   1. Validação por coluna (pandas, operações vetoriais em vez de um ciclo por linha):
+    #      tipo, nome, campos obrigatórios, números e estado; MAC, IPv4 e IPv6 com a
+    #      validação em lote do utils.py (validate_macs/validate_ipv4s/validate_ipv6s)
+    #   2. Duplicados dentro do ficheiro (duplicated) e contra o inventário (junção com
+    #      os conjuntos de nomes/endereços já indexados), comparando endereços como
+    #      inteiros (grafias equivalentes contam como iguais)
+    #   3. Cria os objetos das linhas válidas (os construtores podem juntar erros) e,
+    #      só se não houver nenhum erro, adiciona-os todos ao inventário
+    #      (transação: se alguma adição falhar, as anteriores são desfeitas)
+    # Todos os erros são devolvidos de uma vez: [(linha, coluna, mensagem)], com a
+    # linha contada como na folha (cabeçalho = linha 1).
+
+# EXECUÇÃO:
+    # python bulk_import.py site.xlsx --file inventario.json [--dry-run] [--report erros.csv]
+
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from inventory import NetworkInventory
+from storage import device_from_dict, load_from_json, save_to_json
+from utils import validate_ipv4s, validate_ipv6s, validate_macs
+
+TYPES = ("ROUTER", "SWITCH", "AP", "ENDPOINT")
+
+# Colunas obrigatórias (além de type e name) por tipo de dispositivo
+REQUIRED = {
+    "ROUTER": ("mac_address",),
+    "SWITCH": ("mac_address", "ports"),
+    "AP": ("ssid",),
+    "ENDPOINT": ("user_id", "mac_address"),
+}
+
+# Tipos que têm cada endereço (nos restantes a coluna é ignorada)
+HAS_MAC = ("ROUTER", "SWITCH", "ENDPOINT")
+HAS_IPV4 = ("ROUTER", "SWITCH", "ENDPOINT")
+HAS_IPV6 = ("ROUTER", "ENDPOINT")
+
+INT_COLUMNS = ("ports", "eth_ports", "fast_eth_ports", "giga_eth_ports")
+FLOAT_COLUMNS = ("traffic_up_mb", "traffic_down_mb")
+LIST_COLUMNS = ("connected_devices", "connected_endpoints", "connected_ports")
+
+_TRUE = {"TRUE", "SIM", "1", "YES", "S", "Y"}
+_FALSE = {"FALSE", "NÃO", "NAO", "0", "NO", "N", ""}
+
+
+def read_table(source, filename: str = None) -> pd.DataFrame:
+
+    # FUNÇÃO: read_table()
+
+    # O QUE FAZ:
+    #     - Lê um CSV ou Excel (.xlsx) para um DataFrame só de texto (dtype=str),
+    #       com as células vazias como "" (sem NaN)
+    #     - source: caminho ou ficheiro aberto; filename indica a extensão quando
+    #       source é um ficheiro em memória (ex: upload do Streamlit)
+
+    name = (filename or (source if isinstance(source, str) else "")).lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        df = pd.read_excel(source, dtype=str, engine="openpyxl").fillna("")
+    else:
+        df = pd.read_csv(source, dtype=str, keep_default_na=False)
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+class BulkImporter:
+    def __init__(self, inventory):
+        self.inventory = inventory
+
+    # ------------------------------------------------------------------
+    # Fase 1 e 2: validação
+    # ------------------------------------------------------------------
+
+    def validate(self, df: pd.DataFrame):
+
+        # MÉTODO: validate()
+
+        # O QUE FAZ:
+        #     - Normaliza as colunas (strip, maiúsculas no tipo/MAC/estado)
+        #     - Devolve (DataFrame normalizado, lista de erros [(linha, coluna, mensagem)])
+
+        df = df.reset_index(drop=True)
+        for col in ("type", "name") + tuple(c for r in REQUIRED.values() for c in r):
+            if col not in df.columns:
+                df[col] = ""
+        for col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
+
+        errors = []
+        rows = df.index.to_numpy() + 2   # linha na folha (cabeçalho = 1)
+
+        def report(mask, column, message):
+            mask = np.asarray(mask, dtype=bool)
+            errors.extend((int(r), column, message) for r in rows[mask])
+
+        tipo = df["type"].str.upper()
+        df["type"] = tipo
+        report(~tipo.isin(TYPES), "type", "Tipo desconhecido (ROUTER, SWITCH, AP ou ENDPOINT).")
+
+        # Nomes: vazios, repetidos na folha e já existentes no inventário
+        name = df["name"]
+        report(name == "", "name", "Nome vazio.")
+        report((name != "") & name.duplicated(keep=False), "name", "Nome repetido no ficheiro.")
+        report(name.isin(self.inventory.devices.keys()), "name", "Já existe um dispositivo com esse nome.")
+
+        for t, columns in REQUIRED.items():
+            of_type = tipo == t
+            for col in columns:
+                report(of_type & (df[col] == ""), col, f"Campo obrigatório para {t}.")
+
+        # Endereços: validados e convertidos para inteiros em lote (utils.validate_*),
+        # cada valor distinto uma só vez; duplicados comparados como inteiros
+        mac = df["mac_address"].str.upper().str.replace("-", ":", regex=False)
+        df["mac_address"] = mac
+        self._addresses(df, tipo, mac, HAS_MAC, validate_macs, "mac_address", "MAC", "mac", report)
+        for col, types, validate, label in (("ipv4", HAS_IPV4, validate_ipv4s, "IPv4"),
+                                            ("ipv6", HAS_IPV6, validate_ipv6s, "IPv6")):
+            values = df[col] if col in df.columns else pd.Series("", index=df.index)
+            self._addresses(df, tipo, values, types, validate, col, label, col, report)
+
+        # Números: inteiros (portas) e decimais (tráfego)
+        for col in INT_COLUMNS + FLOAT_COLUMNS:
+            if col not in df.columns:
+                continue
+            filled = df[col] != ""
+            num = pd.to_numeric(df[col].where(filled), errors="coerce")
+            bad = filled & (num.isna() | (num < 0))
+            if col in INT_COLUMNS:
+                bad |= filled & num.notna() & (num % 1 != 0)
+            report(bad, col, "Número inválido.")
+        if "ports" in df.columns:
+            ports = pd.to_numeric(df["ports"], errors="coerce")
+            report((tipo == "SWITCH") & (ports <= 0), "ports", "O total de portas tem de ser > 0.")
+
+        if "status" in df.columns:
+            df["status"] = df["status"].str.upper()
+            report(~df["status"].isin(("", "ACTIVE", "INACTIVE")), "status", "Estado inválido (ACTIVE ou INACTIVE).")
+        if "serial_interface" in df.columns:
+            report(~df["serial_interface"].str.upper().isin(_TRUE | _FALSE), "serial_interface",
+                   "Valor inválido (Sim/Não ou True/False).")
+
+        errors.sort()
+        return df, errors
+
+    def _addresses(self, df, tipo, values, types, validate, column, label, kind, report):
+        # Formato, repetidos dentro da folha e junção com o índice de endereços do inventário
+        present = np.flatnonzero((tipo.isin(types) & (values != "")).to_numpy())
+        mask, ints = validate(values.to_numpy()[present])
+        ok = np.array(mask, dtype=bool)
+
+        invalid = np.zeros(len(df), dtype=bool)
+        invalid[present[~ok]] = True
+        report(invalid, column, f"{label} inválido.")
+
+        # Inteiros das linhas válidas, indexados pela posição da linha
+        as_int = pd.Series([n for n in ints if n is not None], index=present[ok], dtype="object")
+        for hits, message in ((as_int.duplicated(keep=False), f"{label} repetido no ficheiro."),
+                              (as_int.isin(self.inventory.address_keys(kind)), f"{label} duplicado no inventário.")):
+            flagged = np.zeros(len(df), dtype=bool)
+            flagged[as_int.index[hits.to_numpy()]] = True
+            report(flagged, column, message)
+
+    # ------------------------------------------------------------------
+    # Fase 3: criação e commit
+    # ------------------------------------------------------------------
+
+    def _build(self, df: pd.DataFrame, errors: list) -> list:
+        # Cria os objetos das linhas sem erros (as validações restantes ficam nos
+        # construtores; os seus erros juntam-se ao relatório)
+        devices = []
+        columns = list(df.columns)
+        bad_rows = {e[0] for e in errors}
+        for row, values in zip(df.index.to_numpy() + 2, df.itertuples(index=False, name=None)):
+            if row in bad_rows:
+                continue
+            item = {c: v for c, v in zip(columns, values) if v != ""}
+            try:
+                for col in INT_COLUMNS:
+                    if col in item:
+                        item[col] = int(float(item[col]))
+                for col in LIST_COLUMNS:
+                    if col in item:
+                        item[col] = json.loads(item[col])
+                item["serial_interface"] = item.get("serial_interface", "").upper() in _TRUE
+                obj = device_from_dict(item)
+            except (ValueError, TypeError, KeyError) as e:
+                errors.append((int(row), "", str(e)))
+                continue
+            devices.append(obj)
+        return devices
+
+    def import_frame(self, df: pd.DataFrame, dry_run: bool = False) -> dict:
+
+        # MÉTODO: import_frame()
+
+        # O QUE FAZ:
+        #     1. Valida a folha inteira (validate) e cria os objetos das linhas válidas
+        #     2. Se houver erros (ou dry_run), não altera o inventário
+        #     3. Caso contrário adiciona todos os dispositivos; se uma adição falhar
+        #        remove os que já tinham entrado (tudo ou nada)
+        #     Devolve { "rows", "added", "errors": [(linha, coluna, mensagem)] }
+
+        df, errors = self.validate(df)
+        devices = self._build(df, errors)
+        if errors or dry_run:
+            return {"rows": len(df), "added": 0, "errors": sorted(errors)}
+
+        inv = self.inventory
+        added = []
+        try:
+            for obj in devices:
+                inv.add_device(obj)
+                added.append(obj.name)
+        except ValueError:
+            for name in reversed(added):
+                inv.remove_device(name)
+            raise
+        return {"rows": len(df), "added": len(added), "errors": []}
+
+    def import_file(self, source, filename: str = None, dry_run: bool = False) -> dict:
+        return self.import_frame(read_table(source, filename), dry_run)
+
+
+def write_report(errors: list, path: str):
+    # Relatório de erros em CSV: linha, coluna, erro
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["linha", "coluna", "erro"])
+        writer.writerows(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa dispositivos em massa de um CSV ou Excel.")
+    parser.add_argument("source", help="ficheiro .csv ou .xlsx")
+    parser.add_argument("--file", default="inventario.json", help="ficheiro JSON do inventário")
+    parser.add_argument("--dry-run", action="store_true", help="só valida, não grava")
+    parser.add_argument("--report", help="grava os erros neste CSV")
+    args = parser.parse_args()
+
+    inv = load_from_json(args.file) if os.path.exists(args.file) else NetworkInventory()
+
+    result = BulkImporter(inv).import_file(args.source, dry_run=args.dry_run)
+    for row, column, message in result["errors"][:50]:
+        print(f"Linha {row} [{column or '-'}]: {message}")
+    if len(result["errors"]) > 50:
+        print(f"... e mais {len(result['errors']) - 50} erros.")
+    if args.report and result["errors"]:
+        write_report(result["errors"], args.report)
+
+    if result["errors"]:
+        print(f"{len(result['errors'])} erros em {result['rows']} linhas: nada foi importado.")
+    elif args.dry_run:
+        print(f"{result['rows']} linhas válidas (dry-run, nada foi gravado).")
+    else:
+        save_to_json(inv, args.file)
+        print(f"{result['added']} dispositivos importados.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# MÓDULO: counters_importer.py
+# PROPÓSITO: Importar o tráfego dos contadores de interface do kernel (/proc/net/dev)
+
+# DESCRIÇÃO:
+    # Os hosts Linux já mantêm contadores de bytes por interface em /proc/net/dev.
+    # Este importador lê esse ficheiro (ou cópias no mesmo formato, uma por host),
+    # calcula quanto cada contador avançou desde a leitura anterior e aplica os
+    # aumentos ao Endpoint correspondente, de uma vez, com ingest_traffic (add_traffic).
+    #   - Interface -> Endpoint: mapa explícito ("ficheiro:iface" ou "iface" -> MAC/nome),
+    #     senão o MAC em /sys/class/net/<iface>/address (só para o /proc local),
+    #     senão o próprio nome da interface como nome do endpoint
+    #   - Do ponto de vista do host: bytes recebidos = download, transmitidos = upload
+    #   - Primeira leitura de cada contador: serve só de referência (sem delta)
+    #   - Contador que diminui: volta dos 32 bits (wraparound) se for plausível,
+    #     caso contrário reinício (reboot / interface recriada) -> delta = valor atual
+
+# CUSTO DA MONITORIZAÇÃO:
+    # Os ficheiros de snapshot só são relidos quando o mtime ou o tamanho mudam;
+    # os que mudaram são lidos e interpretados em paralelo (ThreadPoolExecutor).
+    # Ficheiros virtuais (/proc, tamanho 0) são sempre relidos.
+
+# EXECUÇÃO:
+    # python counters_importer.py --file inventario.json --interval 5 [--map mapa.json] [ficheiros...]
+    # (sem ficheiros lê /proc/net/dev)
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import load_from_json, save_to_json
+
+PROC_NET_DEV = "/proc/net/dev"
+
+_WRAP_32 = 1 << 32
+_MB = 1024 * 1024
+
+
+def parse_net_dev(text: str) -> dict:
+
+    # FUNÇÃO: parse_net_dev()
+
+    # O QUE FAZ:
+    #     - Interpreta o conteúdo de /proc/net/dev
+    #     - Devolve { interface: (bytes_recebidos, bytes_transmitidos) }
+    #     - Ignora os cabeçalhos e linhas mal formadas
+
+    counters = {}
+    for line in text.splitlines():
+        iface, sep, rest = line.partition(":")
+        if not sep:
+            continue
+        fields = rest.split()
+        # 8 campos de receção seguidos de 8 de transmissão
+        if len(fields) < 16:
+            continue
+        try:
+            counters[iface.strip()] = (int(fields[0]), int(fields[8]))
+        except ValueError:
+            continue
+    return counters
+
+
+def counter_delta(previous: int, current: int):
+
+    # FUNÇÃO: counter_delta()
+
+    # O QUE FAZ:
+    #     - Devolve (delta, motivo) com motivo None, "wrap" ou "reset"
+    #     - Contador de 32 bits que dá a volta: o delta é o que faltava até 2^32 + atual,
+    #       desde que seja plausível (menos de meia volta); caso contrário é reinício
+
+    if current >= previous:
+        return current - previous, None
+    if previous < _WRAP_32:
+        wrapped = current + _WRAP_32 - previous
+        if wrapped < _WRAP_32 // 2:
+            return wrapped, "wrap"
+    return current, "reset"
+
+
+class CounterImporter:
+    def __init__(self, inventory, interface_map: dict = None, ignore=("lo",), max_workers: int = 8):
+        self.inventory = inventory
+        # { "ficheiro:iface" ou "iface": MAC ou nome do endpoint }
+        self.interface_map = dict(interface_map or {})
+        self.ignore = set(ignore)
+        self.max_workers = max_workers
+
+        # Estado entre leituras
+        self._file_sig = {}     # { ficheiro: (mtime_ns, tamanho) } da última leitura
+        self._last = {}         # { (ficheiro, iface): (rx, tx) }
+        self._mac_cache = {}    # { iface: MAC lido do sysfs }
+
+    def _changed_files(self, paths):
+        # Ficheiros cujo mtime/tamanho mudou desde a última leitura (ou virtuais)
+        changed = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            sig = (st.st_mtime_ns, st.st_size)
+            if st.st_size == 0 or self._file_sig.get(path) != sig:
+                self._file_sig[path] = sig
+                changed.append(path)
+        return changed
+
+    @staticmethod
+    def _read(path: str):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return path, parse_net_dev(f.read())
+
+    def _sysfs_mac(self, iface: str):
+        if iface not in self._mac_cache:
+            try:
+                with open(f"/sys/class/net/{iface}/address", "r") as f:
+                    self._mac_cache[iface] = f.read().strip()
+            except OSError:
+                self._mac_cache[iface] = None
+        return self._mac_cache[iface]
+
+    def resolve(self, path: str, iface: str):
+
+        # MÉTODO: resolve()
+
+        # O QUE FAZ:
+        #     - Devolve o nome do Endpoint associado à interface do ficheiro, ou None
+        #     - Ordem: mapa "ficheiro:iface", mapa "iface", MAC do sysfs, nome da interface
+
+        key = self.interface_map.get(f"{path}:{iface}") or self.interface_map.get(iface)
+        if key is None and path == PROC_NET_DEV:
+            key = self._sysfs_mac(iface)
+        if key is None:
+            key = iface
+
+        inv = self.inventory
+        if key in inv.devices:
+            return key if inv.get_endpoint(key) is not None else None
+        device = inv.find_by_mac(key)
+        return device.name if device is not None and inv.get_endpoint(device.name) is not None else None
+
+    def poll(self, paths=(PROC_NET_DEV,), ts: float = None) -> dict:
+
+        # MÉTODO: poll()
+
+        # O QUE FAZ:
+        #     1. Filtra os ficheiros que mudaram desde a última leitura
+        #     2. Lê e interpreta esses ficheiros em paralelo
+        #     3. Calcula os deltas de cada contador (com wraparound / reinício)
+        #     4. Aplica os aumentos (MB) em bloco com ingest_traffic
+        #     5. Devolve estatísticas: ficheiros lidos/ignorados, aplicados, desconhecidos, etc.
+
+        paths = list(paths)
+        changed = self._changed_files(paths)
+        if len(changed) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(changed))) as pool:
+                snapshots = list(pool.map(self._read, changed))
+        else:
+            snapshots = [self._read(p) for p in changed]
+
+        totals = {}
+        unknown = set()
+        wraps = resets = 0
+        for path, counters in snapshots:
+            for iface, (rx, tx) in counters.items():
+                if iface in self.ignore:
+                    continue
+                previous = self._last.get((path, iface))
+                self._last[(path, iface)] = (rx, tx)
+                if previous is None:
+                    continue
+
+                d_rx, why_rx = counter_delta(previous[0], rx)
+                d_tx, why_tx = counter_delta(previous[1], tx)
+                wraps += (why_rx == "wrap") + (why_tx == "wrap")
+                resets += (why_rx == "reset") + (why_tx == "reset")
+                if not d_rx and not d_tx:
+                    continue
+
+                name = self.resolve(path, iface)
+                if name is None:
+                    unknown.add(f"{path}:{iface}")
+                    continue
+                # Várias interfaces podem pertencer ao mesmo endpoint: soma-as
+                up, down = totals.get(name, (0.0, 0.0))
+                totals[name] = (up + d_tx / _MB, down + d_rx / _MB)
+
+        result = self.inventory.ingest_traffic(((n, u, d) for n, (u, d) in totals.items()), ts)
+        return {
+            "files_read": len(changed),
+            "files_skipped": len(paths) - len(changed),
+            "applied": result["applied"],
+            "unknown": sorted(unknown),
+            "wraps": wraps,
+            "resets": resets,
+            "suspended": result["suspended"],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa o tráfego dos contadores de /proc/net/dev para o inventário.")
+    parser.add_argument("paths", nargs="*", default=[PROC_NET_DEV], help="ficheiros no formato /proc/net/dev")
+    parser.add_argument("--file", default="inventario.json", help="ficheiro JSON do inventário")
+    parser.add_argument("--map", help="JSON { \"iface\" ou \"ficheiro:iface\": MAC ou nome do endpoint }")
+    parser.add_argument("--interval", type=float, default=5.0, help="segundos entre leituras")
+    parser.add_argument("--once", action="store_true", help="faz só duas leituras (referência + delta) e termina")
+    parser.add_argument("--history", help="pasta do histórico em disco (history.py)")
+    args = parser.parse_args()
+
+    inv = load_from_json(args.file)
+    store = None
+    if args.history:
+        # Só carrega o numpy quando o histórico em disco é pedido
+        from history import HistoryStore
+        store = HistoryStore(args.history)
+        inv.attach_history(store)
+    mapping = {}
+    if args.map:
+        with open(args.map, "r", encoding="utf-8") as f:
+            mapping = json.load(f)
+    importer = CounterImporter(inv, mapping)
+
+    try:
+        importer.poll(args.paths)
+        while True:
+            time.sleep(args.interval)
+            stats = importer.poll(args.paths)
+            print(f"lidos={stats['files_read']} ignorados={stats['files_skipped']} aplicados={stats['applied']} "
+                  f"desconhecidos={len(stats['unknown'])} voltas={stats['wraps']} reinícios={stats['resets']}")
+            if args.once:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+        save_to_json(inv, args.file)
+        print("Inventário gravado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,54 @@
 # Importa datetime e timedelta para gerir datas e tempos de suspensão
 from datetime import datetime, timedelta
 
+# sys.intern partilha uma única cópia de strings repetidas (tipo, estado, modelo, ...)
+import sys
+
+# time dá o timestamp das amostras de tráfego; TrafficSeries guarda o histórico
+import time
+from traffic_series import TrafficSeries
+
 # Importa funções de validação (IPs e MAC) e normalização de MAC
 from utils import is_valid_ipv4, is_valid_ipv6, is_valid_mac, normalize_mac
 
+# Conversões entre a forma textual e a forma inteira (compacta) dos endereços
+from utils import mac_to_int, int_to_mac, ipv4_to_int, int_to_ipv4, ipv6_to_int, int_to_ipv6
+
 # Constantes para o estado dos dispositivos
 ACTIVE = "ACTIVE"
 INACTIVE = "INACTIVE"
 
+# Classes de portas de um Switch (Ethernet, Fast Ethernet, Gigabit Ethernet)
+PORT_CLASSES = ("eth", "fast", "giga")
+
+# --------------------------------------------------
+# Classe LinkSet (conjunto ordenado de ligações)
+# --------------------------------------------------
+# Um dict mantém a ordem de inserção e tem pertença/remoção O(1), ao contrário
+# de uma lista (in/remove são O(n)). As chaves são os nomes dos dispositivos
+# ligados; o valor guarda informação da ligação (ex: classe de porta no Switch).
+# Iterar, len(), "in" e list() funcionam como na lista antiga.
+
+class LinkSet(dict):
+    def add(self, name: str, value=None):
+        self[name] = value
+
+    def discard(self, name: str):
+        self.pop(name, None)
+
+    def __repr__(self):
+        return repr(list(self))
+
 # --------------------------------------------------
 # Classe base Device (equipamento genérico)
 # --------------------------------------------------
 
 class Device:
+    # __slots__ elimina o __dict__ de cada instância (muito menos memória por dispositivo).
+    # Cada subclasse declara apenas os atributos que acrescenta.
+    # _owner: inventário a que o dispositivo pertence (avisado das alterações diretas)
+    __slots__ = ("name", "device_type", "model", "serial_interface", "status", "observations", "_owner")
+
     def __init__(self, name: str, device_type: str, model: str = "", serial_interface: bool = False, observations: str = ""):
         # Remove espaços e valida o nome
         name = (name or "").strip()
@@ -21,8 +57,10 @@ class Device:
 
         # Atributos base
         self.name = name
-        self.device_type = device_type
-        self.model = (model or "").strip()
+        # Campos de baixa cardinalidade são "interned": milhares de dispositivos
+        # partilham a mesma string em memória
+        self.device_type = sys.intern(device_type)
+        self.model = sys.intern((model or "").strip())
         
         # Campo booleano para identificar presença de interfaces seriais
         self.serial_interface = serial_interface
@@ -30,11 +68,49 @@ class Device:
         self.status = ACTIVE
         self.observations = (observations or "").strip()
 
+        # Definido pelo NetworkInventory em add_device (None fora de um inventário)
+        self._owner = None
+
+    def _notify(self, event: str, *args):
+        # Avisa o inventário dono (se existir) de uma alteração feita diretamente
+        # no objeto (ex: ligação criada), para manter os índices atualizados
+        if self._owner is not None:
+            self._owner._on_device_event(self, event, *args)
+
     def set_status(self, status: str):
         status = (status or "").strip().upper()
         if status not in (ACTIVE, INACTIVE):
             raise ValueError("status tem de ser ACTIVE ou INACTIVE.")
-        self.status = status
+        if status != self.status:
+            self.status = sys.intern(status)
+            self._notify("status")
+
+    def _set_address(self, attr: str, kind: str, value):
+        # Troca um endereço (_mac/_ipv4/_ipv6). Num inventário, o dono valida a
+        # unicidade e atualiza o seu índice ANTES da troca: se o endereço já pertencer
+        # a outro dispositivo levanta ValueError e o objeto fica como estava
+        old = getattr(self, attr)
+        if value == old:
+            return
+        if self._owner is not None:
+            self._owner._on_address_change(self, kind, old, value)
+        setattr(self, attr, value)
+
+    def __getstate__(self):
+        # Objetos com __slots__ não têm __dict__: recolhe os atributos de toda a hierarquia
+        # (mantém a compatibilidade com pickle/copy)
+        state = {}
+        for cls in type(self).__mro__:
+            for attr in getattr(cls, "__slots__", ()):
+                if attr not in ("_owner", "_counters", "_slot") and hasattr(self, attr):
+                    state[attr] = getattr(self, attr)
+        return state
+
+    def __setstate__(self, state):
+        # A cópia nasce fora de qualquer inventário
+        self._owner = None
+        for attr, value in state.items():
+            setattr(self, attr, value)
 
     def to_dict(self) -> dict:
         return {
@@ -51,11 +127,79 @@ class Device:
         return f"[{self.device_type}] name={self.name} model={self.model or '-'} serial_int={ser_text} status={self.status}"
 
 
+# --------------------------------------------------
+# Mixins de endereçamento (MAC, IPv4, IPv6)
+# --------------------------------------------------
+# Os endereços são guardados internamente como inteiros (_mac: 48 bits,
+# _ipv4: 32 bits, _ipv6: 128 bits; None quando vazio). As propriedades
+# mac_address/ipv4/ipv6 continuam a devolver texto, por compatibilidade.
+# Os mixins não têm slots próprios: cada classe concreta declara _mac/_ipv4/_ipv6.
+# Os setters passam por Device._set_address, que mantém os índices do inventário.
+
+class _MacMixin:
+    __slots__ = ()
+
+    @property
+    def mac_address(self) -> str:
+        return int_to_mac(self._mac)
+
+    @mac_address.setter
+    def mac_address(self, value: str):
+        value = normalize_mac(value or "")
+        if not is_valid_mac(value):
+            raise ValueError("MAC inválido.")
+        self._set_address("_mac", "mac", mac_to_int(value))
+
+    @property
+    def mac_int(self) -> int:
+        return self._mac
+
+
+class _IPv4Mixin:
+    __slots__ = ()
+
+    @property
+    def ipv4(self) -> str:
+        return int_to_ipv4(self._ipv4) if self._ipv4 is not None else ""
+
+    @ipv4.setter
+    def ipv4(self, value: str):
+        value = (value or "").strip()
+        if value and (not is_valid_ipv4(value)):
+            raise ValueError("IPv4 inválido.")
+        self._set_address("_ipv4", "ipv4", ipv4_to_int(value) if value else None)
+
+    @property
+    def ipv4_int(self):
+        return self._ipv4
+
+
+class _IPv6Mixin:
+    __slots__ = ()
+
+    @property
+    def ipv6(self) -> str:
+        return int_to_ipv6(self._ipv6) if self._ipv6 is not None else ""
+
+    @ipv6.setter
+    def ipv6(self, value: str):
+        value = (value or "").strip()
+        if value and (not is_valid_ipv6(value)):
+            raise ValueError("IPv6 inválido.")
+        self._set_address("_ipv6", "ipv6", ipv6_to_int(value) if value else None)
+
+    @property
+    def ipv6_int(self):
+        return self._ipv6
+
+
 # --------------------------------------------------
 # Classe Router (herda de Device)
 # --------------------------------------------------
 
-class Router(Device):
+class Router(Device, _MacMixin, _IPv4Mixin, _IPv6Mixin):
+    __slots__ = ("_ipv4", "_ipv6", "_mac", "_links")
+
     def __init__(self, name: str, ipv4: str, ipv6: str, mac_address: str, model: str = "", serial_interface: bool = False, observations: str = ""):
         super().__init__(name=name, device_type="ROUTER", model=model, serial_interface=serial_interface, observations=observations)
 
@@ -63,32 +207,47 @@ class Router(Device):
         ipv4 = (ipv4 or "").strip()
         if ipv4 and (not is_valid_ipv4(ipv4)):
             raise ValueError("IPv4 inválido no Router.")
-        self.ipv4 = ipv4
+        self._ipv4 = ipv4_to_int(ipv4) if ipv4 else None
 
         ipv6 = (ipv6 or "").strip()
         if ipv6 and (not is_valid_ipv6(ipv6)):
             raise ValueError("IPv6 inválido no Router.")
-        self.ipv6 = ipv6
+        self._ipv6 = ipv6_to_int(ipv6) if ipv6 else None
 
         mac_address = normalize_mac(mac_address)
         if not is_valid_mac(mac_address):
             raise ValueError("MAC inválido no Router.")
-        self.mac_address = mac_address
+        self._mac = mac_to_int(mac_address)
+
+        self._links = LinkSet()
 
-        self.connected_devices = []
+    @property
+    def connected_devices(self) -> LinkSet:
+        return self._links
+
+    @connected_devices.setter
+    def connected_devices(self, names):
+        # Substitui todas as ligações (ex: ao carregar de ficheiro); nomes repetidos contam uma vez
+        names = list(dict.fromkeys(names))
+        for old in list(self._links):
+            self.disconnect_device(old)
+        for n in names:
+            self.connect_device(n)
 
     def connect_device(self, device_name: str):
         device_name = (device_name or "").strip()
         if not device_name:
             raise ValueError("Nome do dispositivo a ligar não pode ser vazio.")
-        if device_name in self.connected_devices:
+        if device_name in self._links:
             raise ValueError("Esse dispositivo já está ligado ao Router.")
-        self.connected_devices.append(device_name)
+        self._links.add(device_name)
+        self._notify("link", device_name)
 
     def disconnect_device(self, device_name: str):
         device_name = (device_name or "").strip()
-        if device_name in self.connected_devices:
-            self.connected_devices.remove(device_name)
+        if device_name in self._links:
+            self._links.discard(device_name)
+            self._notify("unlink", device_name)
 
     def to_dict(self) -> dict:
         d = super().to_dict()
@@ -105,7 +264,10 @@ class Router(Device):
 # Classe Switch (herda de Device)
 # --------------------------------------------------
 
-class Switch(Device):
+class Switch(Device, _MacMixin, _IPv4Mixin):
+    # _links: { nome: classe_de_porta }; _used: { classe_de_porta: nº de portas ocupadas }
+    __slots__ = ("_ipv4", "_mac", "ports", "eth_ports", "fast_eth_ports", "giga_eth_ports", "_links", "_used")
+
     def __init__(self, name: str, ipv4: str, mac_address: str, ports: int, 
                  eth_ports: int = 0, fast_eth_ports: int = 0, giga_eth_ports: int = 0,
                  model: str = "", serial_interface: bool = False, observations: str = ""):
@@ -114,12 +276,12 @@ class Switch(Device):
         ipv4 = (ipv4 or "").strip()
         if ipv4 and (not is_valid_ipv4(ipv4)):
             raise ValueError("IPv4 inválido no Switch.")
-        self.ipv4 = ipv4
+        self._ipv4 = ipv4_to_int(ipv4) if ipv4 else None
 
         mac_address = normalize_mac(mac_address)
         if not is_valid_mac(mac_address):
             raise ValueError("MAC inválido no Switch.")
-        self.mac_address = mac_address
+        self._mac = mac_to_int(mac_address)
 
         if ports <= 0:
             raise ValueError("O total de portas tem de ser > 0.")
@@ -129,22 +291,72 @@ class Switch(Device):
         self.fast_eth_ports = fast_eth_ports
         self.giga_eth_ports = giga_eth_ports
 
-        self.connected_devices = []
-
-    def connect_device(self, device_name: str):
+        self._links = LinkSet()
+        self._used = {c: 0 for c in PORT_CLASSES}
+
+    @property
+    def connected_devices(self) -> LinkSet:
+        return self._links
+
+    @connected_devices.setter
+    def connected_devices(self, names):
+        # Aceita uma lista de nomes ou um dict { nome: classe_de_porta }
+        # (ao carregar de ficheiro, ligações a mais do que as portas ficam sem classe)
+        port_of = dict(names) if isinstance(names, dict) else dict.fromkeys(names)
+        for old in list(self._links):
+            self.disconnect_device(old)
+        for n, port_class in port_of.items():
+            try:
+                self.connect_device(n, port_class)
+            except ValueError:
+                self._links.add(n, None)
+                self._notify("link", n)
+
+    def port_capacity(self, port_class: str) -> int:
+        # As portas "eth" são as restantes (total - fast - giga); assim um Switch
+        # criado só com o total de portas tem todas como "eth"
+        if port_class == "giga":
+            return self.giga_eth_ports
+        if port_class == "fast":
+            return self.fast_eth_ports
+        if port_class == "eth":
+            return max(0, self.ports - self.fast_eth_ports - self.giga_eth_ports)
+        raise ValueError(f"Classe de porta inválida (use {', '.join(PORT_CLASSES)}).")
+
+    def free_ports(self, port_class: str = None) -> int:
+        # Portas livres no total ou de uma classe específica (O(1): contadores)
+        if port_class is None:
+            return self.ports - len(self._links)
+        return min(self.port_capacity(port_class) - self._used[port_class], self.free_ports())
+
+    def connect_device(self, device_name: str, port_class: str = None):
         device_name = (device_name or "").strip()
         if not device_name:
             raise ValueError("Nome do dispositivo a ligar não pode ser vazio.")
-        if device_name in self.connected_devices:
+        if device_name in self._links:
             raise ValueError("Esse dispositivo já está ligado ao Switch.")
-        if len(self.connected_devices) >= self.ports:
+        if len(self._links) >= self.ports:
             raise ValueError("Switch sem portas livres.")
-        self.connected_devices.append(device_name)
+
+        if port_class is None:
+            # Sem classe pedida: usa a porta mais lenta disponível (poupa as Gigabit)
+            port_class = next((c for c in PORT_CLASSES if self.free_ports(c) > 0), None)
+            if port_class is None:
+                raise ValueError("Switch sem portas livres.")
+        elif self.free_ports(port_class) <= 0:
+            raise ValueError(f"Switch sem portas '{port_class}' livres.")
+
+        self._links.add(device_name, port_class)
+        self._used[port_class] += 1
+        self._notify("link", device_name)
 
     def disconnect_device(self, device_name: str):
         device_name = (device_name or "").strip()
-        if device_name in self.connected_devices:
-            self.connected_devices.remove(device_name)
+        if device_name in self._links:
+            port_class = self._links.pop(device_name)
+            if port_class is not None:
+                self._used[port_class] -= 1
+            self._notify("unlink", device_name)
 
     def to_dict(self) -> dict:
         d = super().to_dict()
@@ -156,6 +368,7 @@ class Switch(Device):
             "fast_eth_ports": self.fast_eth_ports,
             "giga_eth_ports": self.giga_eth_ports,
             "connected_devices": list(self.connected_devices),
+            "connected_ports": dict(self._links),
         })
         return d
 
@@ -165,27 +378,43 @@ class Switch(Device):
 # --------------------------------------------------
 
 class AccessPoint(Device):
+    __slots__ = ("ssid", "_links")
+
     def __init__(self, name: str, ssid: str, model: str = "", serial_interface: bool = False, observations: str = ""):
         super().__init__(name=name, device_type="AP", model=model, serial_interface=serial_interface, observations=observations)
 
         ssid = (ssid or "").strip()
         if not ssid:
             raise ValueError("ssid não pode ser vazio.")
-        self.ssid = ssid
-        self.connected_endpoints = []
+        self.ssid = sys.intern(ssid)
+        self._links = LinkSet()
+
+    @property
+    def connected_endpoints(self) -> LinkSet:
+        return self._links
+
+    @connected_endpoints.setter
+    def connected_endpoints(self, names):
+        names = list(dict.fromkeys(names))
+        for old in list(self._links):
+            self.disconnect_endpoint(old)
+        for n in names:
+            self.connect_endpoint(n)
 
     def connect_endpoint(self, endpoint_name: str):
         endpoint_name = (endpoint_name or "").strip()
         if not endpoint_name:
             raise ValueError("Nome do endpoint não pode ser vazio.")
-        if endpoint_name in self.connected_endpoints:
+        if endpoint_name in self._links:
             raise ValueError("Esse endpoint já está ligado ao AP.")
-        self.connected_endpoints.append(endpoint_name)
+        self._links.add(endpoint_name)
+        self._notify("link", endpoint_name)
 
     def disconnect_endpoint(self, endpoint_name: str):
         endpoint_name = (endpoint_name or "").strip()
-        if endpoint_name in self.connected_endpoints:
-            self.connected_endpoints.remove(endpoint_name)
+        if endpoint_name in self._links:
+            self._links.discard(endpoint_name)
+            self._notify("unlink", endpoint_name)
 
     def to_dict(self) -> dict:
         d = super().to_dict()
@@ -200,40 +429,152 @@ class AccessPoint(Device):
 # Classe Endpoint (herda de Device)
 # --------------------------------------------------
 
-class Endpoint(Device):
+class Endpoint(Device, _MacMixin, _IPv4Mixin, _IPv6Mixin):
+    # _series: histórico recente de tráfego (TrafficSeries), criado na primeira amostra
+    # _up/_down: totais locais; com contadores partilhados ligados (_counters, _slot),
+    # os totais vivem na memória partilhada (ver shared_counters.py)
+    __slots__ = ("_user_id", "_ipv4", "_ipv6", "_mac", "_up", "_down", "suspended_until", "_series",
+                 "_counters", "_slot")
+
     def __init__(self, name: str, user_id: str, ipv4: str, ipv6: str, mac_address: str, model: str = "", serial_interface: bool = False, observations: str = ""):
         super().__init__(name=name, device_type="ENDPOINT", model=model, serial_interface=serial_interface, observations=observations)
 
-        user_id = (user_id or "").strip()
-        if not user_id:
-            raise ValueError("user_id não pode ser vazio.")
+        self._user_id = None
         self.user_id = user_id
 
         # IPv4 OPCIONAL
         ipv4 = (ipv4 or "").strip()
         if ipv4 and (not is_valid_ipv4(ipv4)):
             raise ValueError("IPv4 inválido no Endpoint.")
-        self.ipv4 = ipv4
+        self._ipv4 = ipv4_to_int(ipv4) if ipv4 else None
 
         ipv6 = (ipv6 or "").strip()
         if ipv6 and (not is_valid_ipv6(ipv6)):
             raise ValueError("IPv6 inválido no Endpoint.")
-        self.ipv6 = ipv6
+        self._ipv6 = ipv6_to_int(ipv6) if ipv6 else None
 
         mac_address = normalize_mac(mac_address)
         if not is_valid_mac(mac_address):
             raise ValueError("MAC inválido no Endpoint.")
-        self.mac_address = mac_address
+        self._mac = mac_to_int(mac_address)
 
-        self.traffic_up_mb = 0.0
-        self.traffic_down_mb = 0.0
+        self._counters = None
+        self._slot = None
+        self._up = 0.0
+        self._down = 0.0
         self.suspended_until = None
-
-    def add_traffic(self, up_mb: float, down_mb: float):
+        self._series = None
+
+    @property
+    def user_id(self) -> str:
+        return self._user_id
+
+    @user_id.setter
+    def user_id(self, value: str):
+        # Num inventário, o dono move o endpoint (e os seus totais) para o novo
+        # utilizador ANTES da troca, como em _set_address
+        value = (value or "").strip()
+        if not value:
+            raise ValueError("user_id não pode ser vazio.")
+        value = sys.intern(value)
+        old = self._user_id
+        if value == old:
+            return
+        if self._owner is not None:
+            self._owner._on_user_change(self, old, value)
+        self._user_id = value
+
+    @property
+    def traffic_up_mb(self) -> float:
+        if self._counters is None:
+            return self._up
+        return self._counters.totals(self._slot)[0]
+
+    @traffic_up_mb.setter
+    def traffic_up_mb(self, value: float):
+        if self._counters is None:
+            self._up = value
+        else:
+            self._counters.set_totals(self._slot, value, self.traffic_down_mb)
+
+    @property
+    def traffic_down_mb(self) -> float:
+        if self._counters is None:
+            return self._down
+        return self._counters.totals(self._slot)[1]
+
+    @traffic_down_mb.setter
+    def traffic_down_mb(self, value: float):
+        if self._counters is None:
+            self._down = value
+        else:
+            self._counters.set_totals(self._slot, self.traffic_up_mb, value)
+
+    def bind_counters(self, counters, slot: int):
+        # Passa a guardar os totais no slot dos contadores partilhados
+        counters.bind(slot, self._up, self._down)
+        self._counters = counters
+        self._slot = slot
+
+    def unbind_counters(self):
+        # Volta a guardar os totais localmente (ex: removido do inventário)
+        if self._counters is not None:
+            self._up, self._down = self._counters.totals(self._slot)
+            self._counters = None
+            self._slot = None
+
+    def __getstate__(self):
+        # Os totais vão sempre como valores locais (a memória partilhada não se copia)
+        state = super().__getstate__()
+        state["_up"], state["_down"] = self.traffic_up_mb, self.traffic_down_mb
+        return state
+
+    def __setstate__(self, state):
+        self._counters = None
+        self._slot = None
+        super().__setstate__(state)
+
+    @property
+    def traffic_series(self):
+        # Série temporal de tráfego (None se o endpoint ainda não teve tráfego)
+        return self._series
+
+    def add_traffic(self, up_mb: float, down_mb: float, ts: float = None):
+        if up_mb < 0 or down_mb < 0:
+            raise ValueError("Tráfego não pode ser negativo.")
+        if self._counters is None:
+            self._up += up_mb
+            self._down += down_mb
+        else:
+            self._counters.add_base(self._slot, up_mb, down_mb)
+        self.record_traffic(up_mb, down_mb, ts)
+
+    def record_traffic(self, up_mb: float, down_mb: float, ts: float = None):
+        # Regista a amostra no histórico e avisa o inventário, sem mexer nos totais
+        # (usado quando os totais já foram somados noutro sítio, ex: contadores partilhados)
+        ts = time.time() if ts is None else ts
+        if self._series is None:
+            self._series = TrafficSeries()
+        self._series.append(ts, up_mb, down_mb)
+        self._notify("traffic", up_mb, down_mb, ts)
+
+    def set_traffic(self, up_mb: float, down_mb: float):
+        # Define os totais acumulados diretamente (correção manual);
+        # os aumentos entram no histórico como uma amostra normal
         if up_mb < 0 or down_mb < 0:
             raise ValueError("Tráfego não pode ser negativo.")
-        self.traffic_up_mb += up_mb
-        self.traffic_down_mb += down_mb
+        delta_up = max(0.0, up_mb - self.traffic_up_mb)
+        delta_down = max(0.0, down_mb - self.traffic_down_mb)
+        if delta_up or delta_down:
+            self.add_traffic(delta_up, delta_down)
+
+        # Descidas não entram no histórico, mas quem agrega totais tem de saber
+        adjust_up = up_mb - self.traffic_up_mb
+        adjust_down = down_mb - self.traffic_down_mb
+        self.traffic_up_mb = up_mb
+        self.traffic_down_mb = down_mb
+        if adjust_up or adjust_down:
+            self._notify("adjust", adjust_up, adjust_down)
 
     def is_suspended(self) -> bool:
         if self.suspended_until is None:
@@ -245,11 +586,13 @@ class Endpoint(Device):
             raise ValueError("minutes tem de ser > 0.")
         self.suspended_until = datetime.now() + timedelta(minutes=minutes)
         self.status = INACTIVE
+        self._notify("status")
 
     def refresh_status(self):
         if self.suspended_until is not None and datetime.now() >= self.suspended_until:
             self.suspended_until = None
             self.status = ACTIVE
+            self._notify("status")
 
     def to_dict(self) -> dict:
         d = super().to_dict()
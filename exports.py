@@ -0,0 +1,209 @@
+# MÓDULO: exports.py
+# PROPÓSITO: Gerar os ficheiros de exportação do inventário (JSON, NDJSON, CSV, Excel, TXT)
+
+# DESCRIÇÃO:
+    # As exportações são escritas em streaming, diretamente a partir de inv.iter_devices():
+    #   - iter_csv / iter_ndjson / iter_json / iter_txt: geradores de blocos de bytes,
+    #     com no máximo chunk_rows dispositivos por bloco
+    #   - write_excel: openpyxl em modo write-only (cada linha vai logo para o ficheiro
+    #     temporário do openpyxl, não há workbook completo nem DataFrame em memória)
+    #   - write_export: escreve qualquer formato num ficheiro (usado pelo main.py)
+    # A memória usada fica limitada a um bloco, qualquer que seja o tamanho do inventário.
+    # A interface web usa as funções export_* (bytes para o download_button), que
+    # juntam os mesmos blocos, e guarda o resultado até o inventário mudar (inv.version).
+
+# FORMATOS:
+    # FORMATS = { chave: (rótulo, nome_do_ficheiro, mime, função) }
+
+# EXEMPLO DE USO:
+    # write_export(inv, "csv", "inventario.csv")
+    # for chunk in iter_ndjson(inv): sock.sendall(chunk)
+
+import csv
+import json
+from io import BytesIO, StringIO
+
+from openpyxl import Workbook
+
+CHUNK_ROWS = 1000
+
+# Tipos de dispositivo, pela ordem das colunas nas exportações em tabela
+DEVICE_TYPES = ("ROUTER", "SWITCH", "AP", "ENDPOINT")
+
+
+def _columns(inv) -> list:
+    # União das chaves de to_dict() dos tipos presentes. As chaves só dependem do
+    # tipo, por isso basta um dispositivo de cada tipo, obtido pelo índice de nomes
+    # do inventário (sem percorrer os dispositivos)
+    columns = []
+    for device_type in DEVICE_TYPES:
+        for d in inv.find_by_name_prefix("", 1, (device_type,)):
+            for key in d.to_dict():
+                if key not in columns:
+                    columns.append(key)
+    return columns
+
+
+def _cell(value):
+    # Valor de uma célula CSV/Excel: listas e dicionários em JSON, None vazio
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def iter_csv(inv, chunk_rows: int = CHUNK_ROWS):
+
+    # FUNÇÃO: iter_csv()
+
+    # O QUE FAZ:
+    #     - Gerador de blocos CSV (utf-8): cabeçalho e depois chunk_rows linhas por bloco
+    #     - Colunas que um tipo de dispositivo não tem ficam vazias
+
+    columns = _columns(inv)
+    buffer = StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    rows = 0
+    for d in inv.iter_devices():
+        data = d.to_dict()
+        writer.writerow([_cell(data.get(c)) for c in columns])
+        rows += 1
+        if rows >= chunk_rows:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_ndjson(inv, chunk_rows: int = CHUNK_ROWS):
+    # Um objeto JSON por linha (newline-delimited JSON)
+    lines = []
+    for d in inv.iter_devices():
+        lines.append(json.dumps(d.to_dict(), ensure_ascii=False))
+        if len(lines) >= chunk_rows:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def iter_json(inv, chunk_rows: int = CHUNK_ROWS):
+    # Lista JSON indentada (igual a json.dumps(lista, indent=2)), escrita item a item
+    parts = []
+    first = True
+    for d in inv.iter_devices():
+        item = json.dumps(d.to_dict(), indent=2, ensure_ascii=False).replace("\n", "\n  ")
+        parts.append(("[\n  " if first else ",\n  ") + item)
+        first = False
+        if len(parts) >= chunk_rows:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+    parts.append("[]" if first else "\n]")
+    yield "".join(parts).encode("utf-8")
+
+
+def _txt(data: dict) -> str:
+    # Linha do relatório (igual a str(dispositivo)), mas a partir de to_dict(): não
+    # chama refresh_status, por isso o estado é o guardado, como nas outras exportações
+    ser_text = "Sim" if data["serial_interface"] else "Não"
+    line = (f"[{data['type']}] name={data['name']} model={data['model'] or '-'} "
+            f"serial_int={ser_text} status={data['status']}")
+    if "traffic_up_mb" in data:
+        line += f" total_traffic={data['traffic_up_mb'] + data['traffic_down_mb']:.2f}MB"
+    return line
+
+
+def iter_txt(inv, chunk_rows: int = CHUNK_ROWS):
+    # Relatório legível, linha a linha
+    parts = []
+    first = True
+    for d in inv.iter_devices():
+        data = d.to_dict()
+        parts.append(("" if first else "\n") + f"--- {data['name']} ---\n{_txt(data)}\nObs: {data['observations']}\n")
+        first = False
+        if len(parts) >= chunk_rows:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+def write_excel(inv, fileobj):
+
+    # FUNÇÃO: write_excel()
+
+    # O QUE FAZ:
+    #     - Escreve o inventário numa folha "Dispositivos" com openpyxl em modo write-only
+    #     - fileobj: caminho ou ficheiro binário aberto
+
+    columns = _columns(inv)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Dispositivos")
+    ws.append(columns)
+    for d in inv.iter_devices():
+        data = d.to_dict()
+        ws.append([_cell(data.get(c)) for c in columns])
+    wb.save(fileobj)
+
+
+STREAMS = {
+    "json": iter_json,
+    "ndjson": iter_ndjson,
+    "csv": iter_csv,
+    "txt": iter_txt,
+}
+
+
+def write_export(inv, fmt: str, path: str):
+
+    # FUNÇÃO: write_export()
+
+    # O QUE FAZ:
+    #     - Escreve o inventário no ficheiro "path" no formato pedido, bloco a bloco
+    #     - Formatos: json, ndjson, csv, txt, excel
+
+    if fmt == "excel":
+        write_excel(inv, path)
+        return
+    if fmt not in STREAMS:
+        raise ValueError(f"Formato de exportação inválido: {fmt}")
+    with open(path, "wb") as f:
+        for chunk in STREAMS[fmt](inv):
+            f.write(chunk)
+
+
+def export_json(inv) -> bytes:
+    return b"".join(iter_json(inv))
+
+
+def export_ndjson(inv) -> bytes:
+    return b"".join(iter_ndjson(inv))
+
+
+def export_csv(inv) -> bytes:
+    return b"".join(iter_csv(inv))
+
+
+def export_excel(inv) -> bytes:
+    # O download_button precisa dos bytes: o write-only escreve para um buffer
+    buffer = BytesIO()
+    write_excel(inv, buffer)
+    return buffer.getvalue()
+
+
+def export_txt(inv) -> bytes:
+    return b"".join(iter_txt(inv))
+
+
+FORMATS = {
+    "json": ("📄 JSON", "inventario.json", "application/json", export_json),
+    "ndjson": ("🧾 NDJSON", "inventario.ndjson", "application/x-ndjson", export_ndjson),
+    "csv": ("📊 CSV", "inventario.csv", "text/csv", export_csv),
+    "excel": ("📗 Excel", "inventario.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+              export_excel),
+    "txt": ("📝 TXT", "inventario.txt", "text/plain", export_txt),
+}
@@ -0,0 +1,296 @@
+# MÓDULO: history.py
+# PROPÓSITO: Histórico de tráfego de longo prazo em ficheiros colunares por dia
+
+# DESCRIÇÃO:
+    # O histórico dos endpoints (traffic_series.py) guarda só os últimos 30 dias
+    # agregados, em memória. Para meses de histórico (ex: reclamações de faturação)
+    # este módulo guarda cada amostra em disco, só por acrescento (append-only):
+    #   - Um conjunto de ficheiros por dia (UTC), um por coluna, com arrays paralelos:
+    #         AAAA-MM-DD.ts    float64  timestamp
+    #         AAAA-MM-DD.slot  uint32   id do endpoint no registo do histórico
+    #         AAAA-MM-DD.user  uint32   id do utilizador do endpoint NO MOMENTO da amostra
+    #         AAAA-MM-DD.up    float64  upload (MB)
+    #         AAAA-MM-DD.down  float64  download (MB)
+    #   - AAAA-MM-DD.idx.json: índice pequeno com blocos [primeira_linha, ts_min, ts_max]
+    #     (um por escrita), para as pesquisas por intervalo saltarem blocos inteiros
+    #   - registry.json: os nomes dos endpoints e os user_id, cada um com o seu id
+    #     (a posição na lista). Os ids do histórico são próprios e persistentes (os
+    #     slots do inventário mudam entre execuções). Um endpoint que muda de
+    #     utilizador não reescreve o passado: cada amostra guarda o utilizador da altura
+    # As escritas passam por um buffer (HistoryStore.append) que só vai ao disco a
+    # cada flush_rows amostras, em flush() ou em close().
+    # As consultas abrem as colunas com numpy.memmap: só as páginas lidas entram em memória.
+
+# EXEMPLO DE USO:
+    # store = HistoryStore("historico")
+    # inv.attach_history(store)              # cada add_traffic passa a ser gravado
+    # ...
+    # store.totals_by_user(inicio, fim)      # { user_id: (up, down) }
+    # store.close()
+
+# EXECUÇÃO:
+    # python history.py historico --from 2026-10-01 --to 2026-10-31 [--by user|endpoint]
+
+import argparse
+import json
+import os
+from array import array
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+# Colunas: extensão -> (código do módulo array, dtype numpy)
+COLUMNS = {
+    "ts": ("d", np.float64),
+    "slot": ("I", np.uint32),
+    "user": ("I", np.uint32),
+    "up": ("d", np.float64),
+    "down": ("d", np.float64),
+}
+
+# Versão do formato em disco (registry.json); pastas de versões anteriores são recusadas
+FORMAT = 2
+
+_DAY = 86400
+
+
+def _day_of(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+
+
+class HistoryStore:
+    def __init__(self, directory: str, flush_rows: int = 65536):
+        if flush_rows <= 0:
+            raise ValueError("flush_rows tem de ser > 0.")
+        self.directory = directory
+        self.flush_rows = flush_rows
+        os.makedirs(directory, exist_ok=True)
+
+        # Registos persistentes: nome do endpoint -> id e user_id -> id
+        self._ids = {}
+        self._names = []
+        self._user_ids = {}
+        self._users = []
+        self._registry_dirty = False
+        path = os.path.join(directory, "registry.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") != FORMAT:
+                raise ValueError(f"Histórico em {directory} num formato antigo (esperado: {FORMAT}).")
+            self._names = list(data.get("names", []))
+            self._users = list(data.get("users", []))
+            self._ids = {name: i for i, name in enumerate(self._names)}
+            self._user_ids = {user: i for i, user in enumerate(self._users)}
+
+        self._new_buffer()
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def _new_buffer(self):
+        self._buf = {col: array(code) for col, (code, _) in COLUMNS.items()}
+
+    def endpoint_id(self, name: str) -> int:
+        # Id persistente do endpoint (criado na primeira amostra)
+        i = self._ids.get(name)
+        if i is None:
+            i = len(self._names)
+            self._ids[name] = i
+            self._names.append(name)
+            self._registry_dirty = True
+        return i
+
+    def user_id(self, user: str) -> int:
+        # Id persistente do utilizador (criado na primeira amostra com ele)
+        i = self._user_ids.get(user)
+        if i is None:
+            i = len(self._users)
+            self._user_ids[user] = i
+            self._users.append(user)
+            self._registry_dirty = True
+        return i
+
+    def append(self, name: str, user_id: str, ts: float, up: float, down: float):
+
+        # MÉTODO: append()
+
+        # O QUE FAZ:
+        #     - Acrescenta uma amostra ao buffer em memória (arrays, sem objetos por linha)
+        #     - Quando o buffer chega a flush_rows amostras, grava-o
+
+        buf = self._buf
+        buf["ts"].append(ts)
+        buf["slot"].append(self.endpoint_id(name))
+        buf["user"].append(self.user_id(user_id))
+        buf["up"].append(up)
+        buf["down"].append(down)
+        if len(buf["ts"]) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+
+        # MÉTODO: flush()
+
+        # O QUE FAZ:
+        #     1. Separa o buffer por dia (UTC)
+        #     2. Acrescenta cada coluna ao ficheiro do dia (modo "ab")
+        #     3. Regista o bloco escrito no índice do dia e grava o registo de endpoints
+
+        buf = self._buf
+        n = len(buf["ts"])
+        if n:
+            self._new_buffer()
+            ts = np.frombuffer(buf["ts"], dtype=np.float64)
+            days = (ts // _DAY).astype(np.int64)
+            for day in np.unique(days):
+                rows = np.nonzero(days == day)[0]
+                self._write_day(_day_of(float(day) * _DAY), {col: np.frombuffer(buf[col], dtype=dt)[rows]
+                                                               for col, (_, dt) in COLUMNS.items()})
+        if self._registry_dirty:
+            self._save_registry()
+
+    def _write_day(self, day: str, cols: dict):
+        base = os.path.join(self.directory, day)
+        first_row = self._rows_on_disk(day)
+        for col, values in cols.items():
+            path = f"{base}.{col}"
+            # Uma escrita interrompida pode ter deixado colunas mais compridas: alinha-as
+            if os.path.exists(path):
+                os.truncate(path, first_row * values.dtype.itemsize)
+            with open(path, "ab") as f:
+                f.write(values.tobytes())
+
+        index = self._read_index(day)
+        index["blocks"].append([first_row, float(cols["ts"].min()), float(cols["ts"].max())])
+        index["rows"] = first_row + len(cols["ts"])
+        tmp = f"{base}.idx.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, f"{base}.idx.json")
+
+    def _save_registry(self):
+        path = os.path.join(self.directory, "registry.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"format": FORMAT, "names": self._names, "users": self._users}, f)
+        os.replace(path + ".tmp", path)
+        self._registry_dirty = False
+
+    def close(self):
+        self.flush()
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def _read_index(self, day: str) -> dict:
+        path = os.path.join(self.directory, f"{day}.idx.json")
+        if not os.path.exists(path):
+            return {"rows": 0, "blocks": []}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _rows_on_disk(self, day: str) -> int:
+        # Nº de linhas completas: a coluna mais curta manda (escrita interrompida a meio)
+        base = os.path.join(self.directory, day)
+        rows = None
+        for col, (_, dt) in COLUMNS.items():
+            path = f"{base}.{col}"
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            n = size // np.dtype(dt).itemsize
+            rows = n if rows is None else min(rows, n)
+        return rows or 0
+
+    def days(self) -> list:
+        return sorted(f[:-len(".idx.json")] for f in os.listdir(self.directory) if f.endswith(".idx.json"))
+
+    def _columns(self, day: str, rows: int) -> dict:
+        base = os.path.join(self.directory, day)
+        return {col: np.memmap(f"{base}.{col}", dtype=dt, mode="r", shape=(rows,))
+                for col, (_, dt) in COLUMNS.items()}
+
+    def scan(self, start: float, end: float, names=None):
+
+        # MÉTODO: scan()
+
+        # O QUE FAZ:
+        #     - Gerador de blocos (ts, id, user, up, down) em arrays numpy com start <= ts < end
+        #       (id: endpoint; user: utilizador no momento da amostra)
+        #     - Só abre os dias do intervalo e, em cada dia, salta os blocos do índice
+        #       que não tocam no intervalo
+        #     - names: se indicado, só esses endpoints
+
+        ids = None
+        if names is not None:
+            ids = np.array([self._ids[n] for n in names if n in self._ids], dtype=np.uint32)
+
+        day = datetime.fromtimestamp(start // _DAY * _DAY, timezone.utc)
+        last = _day_of(max(start, end - 1e-6))
+        on_disk = set(self.days())
+        while True:
+            key = day.strftime("%Y-%m-%d")
+            if key in on_disk:
+                rows = self._rows_on_disk(key)
+                if rows:
+                    cols = self._columns(key, rows)
+                    blocks = self._read_index(key)["blocks"]
+                    bounds = [b[0] for b in blocks] + [rows]
+                    for (first, t_min, t_max), stop in zip(blocks, bounds[1:]):
+                        if t_max < start or t_min >= end:
+                            continue
+                        ts = cols["ts"][first:stop]
+                        mask = (ts >= start) & (ts < end)
+                        if ids is not None:
+                            mask &= np.isin(cols["slot"][first:stop], ids)
+                        if mask.any():
+                            yield (ts[mask], cols["slot"][first:stop][mask], cols["user"][first:stop][mask],
+                                   cols["up"][first:stop][mask], cols["down"][first:stop][mask])
+            if key >= last:
+                break
+            day += timedelta(days=1)
+
+    def _totals(self, start: float, end: float, names=None, by_user: bool = False):
+        # Somas de up/down por id de endpoint (ou de utilizador), com np.bincount
+        # com pesos, bloco a bloco
+        n = len(self._users) if by_user else len(self._names)
+        up = np.zeros(n)
+        down = np.zeros(n)
+        for _, ids, users, u, d in self.scan(start, end, names):
+            key = users if by_user else ids
+            up += np.bincount(key, weights=u, minlength=n)[:n]
+            down += np.bincount(key, weights=d, minlength=n)[:n]
+        return up, down
+
+    def totals_by_endpoint(self, start: float, end: float, names=None) -> dict:
+        # { nome: (up, down) } no intervalo (só endpoints com tráfego)
+        self.flush()
+        up, down = self._totals(start, end, names)
+        return {self._names[i]: (float(up[i]), float(down[i])) for i in np.nonzero(up + down)[0]}
+
+    def totals_by_user(self, start: float, end: float) -> dict:
+        # { user_id: (up, down) } no intervalo, cada amostra contada para o utilizador
+        # que o endpoint tinha quando ela foi registada
+        self.flush()
+        up, down = self._totals(start, end, by_user=True)
+        return {self._users[i]: (float(up[i]), float(down[i])) for i in np.nonzero(up + down)[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta o histórico de tráfego em disco.")
+    parser.add_argument("directory", help="pasta do histórico")
+    parser.add_argument("--from", dest="start", required=True, help="data inicial (AAAA-MM-DD, UTC)")
+    parser.add_argument("--to", dest="end", required=True, help="data final, inclusive (AAAA-MM-DD, UTC)")
+    parser.add_argument("--by", choices=["endpoint", "user"], default="endpoint")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+    end = datetime.strptime(args.end, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() + _DAY
+    store = HistoryStore(args.directory)
+    totals = store.totals_by_user(start, end) if args.by == "user" else store.totals_by_endpoint(start, end)
+    for key, (up, down) in sorted(totals.items(), key=lambda kv: -(kv[1][0] + kv[1][1])):
+        print(f"{key}: upload={up:.2f} MB download={down:.2f} MB total={up + down:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
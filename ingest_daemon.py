@@ -0,0 +1,472 @@
+# MÓDULO: ingest_daemon.py
+# PROPÓSITO: Serviço (asyncio) que recebe registos de tráfego por UDP e TCP
+
+# DESCRIÇÃO:
+    # Em vez de escrever o consumo à mão (main.py / separador Tráfego), os
+    # exportadores enviam registos de texto, um por linha:
+    #     <nome_do_endpoint ou MAC>,<up_mb>,<down_mb>
+    # Num datagrama UDP podem seguir várias linhas; no TCP a ligação é um fluxo de linhas.
+    #   - Os registos são acumulados em memória por endpoint (coalescing): 1000
+    #     registos do mesmo endpoint entre dois flushes dão uma única amostra
+    #   - A cada flush_interval segundos o buffer é trocado por um vazio e aplicado
+    #     de uma vez com NetworkInventory.ingest_traffic (políticas avaliadas 1x/endpoint)
+    #   - Os MACs são resolvidos no flush (índice do inventário), não por registo
+
+# CONTROLO DE FLUXO (backpressure):
+    # O buffer aceita no máximo max_pending endpoints distintos. Quando está cheio:
+    #   - TCP: pára de interpretar o bloco na primeira chave nova que não cabe, guarda o
+    #     resto da ligação e deixa de ler (pause_reading) até ao próximo flush, que
+    #     retoma a partir daí; o kernel acumula e, quando enche, o emissor abranda.
+    #     Nenhum registo TCP é descartado
+    #   - UDP: não há forma de abrandar o emissor -> os registos de endpoints novos
+    #     são descartados e contados em "dropped" (os já presentes continuam a somar)
+
+# VÁRIOS PROCESSOS (--workers N):
+    # Um processo sozinho fica limitado pelo GIL. Com N workers, cada um abre o seu
+    # socket UDP na mesma porta (SO_REUSEPORT: o kernel reparte os datagramas),
+    # acumula como acima e soma o resultado na sua faixa dos contadores partilhados
+    # (shared_counters.py). O processo principal trata do TCP e, a cada flush, chama
+    # NetworkInventory.absorb_counters (histórico + políticas).
+    # Os workers resolvem nomes/MACs com o slot_map do arranque: endpoints criados
+    # depois só são reconhecidos após reiniciar o serviço.
+
+# EXECUÇÃO:
+    # python ingest_daemon.py [--file inventario.json] [--udp 9999] [--tcp 9998]
+    #                         [--flush 1.0] [--save-every 60] [--workers 4]
+    # Gerador de carga: python -m benchmarks.load_generator
+
+import argparse
+import asyncio
+import math
+import multiprocessing
+import os
+import signal
+import time
+
+from shared_counters import SharedCounters
+from storage import load_from_json, save_to_json
+from utils import normalize_mac, validate_macs
+
+
+def resolve_records(inventory, items):
+
+    # FUNÇÃO: resolve_records()
+
+    # O QUE FAZ:
+    #     - Recebe registos (chave, up, down) em que a chave é o nome ou o MAC do endpoint
+    #     - Devolve (registos com o nome do dispositivo, nº de chaves não resolvidas)
+    #     - Usado no flush do IngestBuffer e no POST /traffic do api_server.py
+
+    records = []
+    by_mac = []
+    for key, up, down in items:
+        if key in inventory.devices:
+            records.append((key, up, down))
+        else:
+            by_mac.append((key, up, down))
+
+    # As chaves que não são nomes são MACs: validadas e convertidas em lote
+    # (utils.validate_macs) e procuradas diretamente no índice de MACs
+    unresolved = 0
+    if by_mac:
+        _, mac_ints = validate_macs(key for key, _, _ in by_mac)
+        for (_, up, down), mac in zip(by_mac, mac_ints):
+            owner = inventory.address_owners(mac_int=mac)[0] if mac is not None else None
+            if owner is None:
+                unresolved += 1
+            else:
+                records.append((owner, up, down))
+    return records, unresolved
+
+
+class IngestBuffer:
+    def __init__(self, max_pending: int = 100_000):
+        if max_pending <= 0:
+            raise ValueError("max_pending tem de ser > 0.")
+        self.max_pending = max_pending
+        # { chave (nome ou MAC): [up, down] } acumulado desde o último flush
+        self._pending = {}
+        self.stats = {"received": 0, "malformed": 0, "dropped": 0,
+                      "flushed": 0, "applied": 0, "unknown": 0, "suspended": 0}
+
+    def __len__(self):
+        return len(self._pending)
+
+    @property
+    def full(self) -> bool:
+        return len(self._pending) >= self.max_pending
+
+    def feed(self, data: bytes) -> int:
+
+        # MÉTODO: feed()
+
+        # O QUE FAZ:
+        #     1. Divide os bytes recebidos em linhas "chave,up,down"
+        #     2. Soma up/down à entrada da chave (cria-a se ainda houver espaço)
+        #     3. Conta registos mal formados e descartados; devolve o nº aceite
+        #     (usado no UDP: com o buffer cheio, os registos de chaves novas perdem-se)
+
+        return self._consume(data, False)[0]
+
+    def feed_until_full(self, data: bytes):
+
+        # MÉTODO: feed_until_full()
+
+        # O QUE FAZ:
+        #     - Como feed(), mas pára na primeira linha de uma chave nova que já não cabe
+        #     - Devolve None se todas as linhas entraram, senão os bytes por ler (a partir
+        #       dessa linha), para o TCP os guardar e retomar depois do flush (nada é descartado)
+
+        return self._consume(data, True)[1]
+
+    def _consume(self, data: bytes, stop_when_full: bool):
+        pending = self._pending
+        accepted = malformed = dropped = 0
+        rest = None
+        lines = data.split(b"\n")
+        for i, line in enumerate(lines):
+            if not line.strip():
+                continue
+            parts = line.split(b",")
+            if len(parts) != 3:
+                malformed += 1
+                continue
+            try:
+                up = float(parts[1])
+                down = float(parts[2])
+            except ValueError:
+                malformed += 1
+                continue
+            # NaN/inf passariam o "< 0" e estragariam os totais para sempre
+            if not (math.isfinite(up) and math.isfinite(down)) or up < 0 or down < 0:
+                malformed += 1
+                continue
+
+            key = parts[0].strip().decode("utf-8", "replace")
+            entry = pending.get(key)
+            if entry is None:
+                if len(pending) >= self.max_pending:
+                    if stop_when_full:
+                        rest = b"\n".join(lines[i:])
+                        break
+                    dropped += 1
+                    continue
+                pending[key] = [up, down]
+            else:
+                entry[0] += up
+                entry[1] += down
+            accepted += 1
+
+        stats = self.stats
+        stats["received"] += accepted + malformed + dropped
+        stats["malformed"] += malformed
+        stats["dropped"] += dropped
+        return accepted, rest
+
+    def drain(self) -> dict:
+        # Troca o buffer por um vazio e devolve o acumulado
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def flush_into(self, inventory, ts: float = None) -> dict:
+
+        # MÉTODO: flush_into()
+
+        # O QUE FAZ:
+        #     1. Esvazia o buffer
+        #     2. Resolve cada chave: nome de dispositivo ou, senão, MAC (em lote)
+        #     3. Aplica tudo de uma vez com inventory.ingest_traffic
+        #     4. Atualiza os contadores e devolve o resultado do ingest_traffic
+
+        pending = self.drain()
+        records, unresolved = resolve_records(inventory, ((key, up, down) for key, (up, down) in pending.items()))
+
+        result = inventory.ingest_traffic(records, ts)
+        stats = self.stats
+        stats["flushed"] += len(pending)
+        stats["applied"] += result["applied"]
+        stats["unknown"] += unresolved + len(result["unknown"])
+        stats["suspended"] += len(result["suspended"])
+        return result
+
+    def flush_into_stripe(self, stripe, slot_map: dict) -> int:
+        # Versão para os workers: resolve as chaves com o slot_map e soma na
+        # faixa do worker nos contadores partilhados; devolve o nº aplicado
+        pending = self.drain()
+        applied = 0
+        for key, (up, down) in pending.items():
+            slot = slot_map.get(key)
+            if slot is None:
+                slot = slot_map.get(normalize_mac(key))
+            if slot is None or slot >= stripe.capacity:
+                self.stats["unknown"] += 1
+                continue
+            stripe.add(slot, up, down)
+            applied += 1
+        self.stats["flushed"] += len(pending)
+        self.stats["applied"] += applied
+        return applied
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def datagram_received(self, data, addr):
+        self.buffer.feed(data)
+
+
+def _worker_main(spec, worker_id: int, slot_map: dict, host: str, udp_port: int,
+                 flush_interval: float, max_pending: int):
+
+    # FUNÇÃO: _worker_main()
+
+    # O QUE FAZ:
+    #     - Corre num processo próprio: socket UDP partilhado (reuse_port) + IngestBuffer
+    #     - A cada flush_interval soma o acumulado na sua faixa dos contadores partilhados
+
+    counters = SharedCounters.attach(spec)
+    stripe = counters.stripe(worker_id)
+    buffer = IngestBuffer(max_pending)
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UDPProtocol(buffer), local_addr=(host, udp_port), reuse_port=True)
+        try:
+            while True:
+                await asyncio.sleep(flush_interval)
+                buffer.flush_into_stripe(stripe, slot_map)
+        finally:
+            transport.close()
+            buffer.flush_into_stripe(stripe, slot_map)
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del stripe
+        counters.close()
+
+
+class _TCPProtocol(asyncio.Protocol):
+    def __init__(self, daemon):
+        self.daemon = daemon
+        self.transport = None
+        # Bytes recebidos e ainda não aplicados: a linha incompleta do fim e, com o
+        # buffer cheio, as linhas completas que ficaram por ler (retomadas após o flush)
+        self._partial = b""
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.daemon._tcp_clients.add(self)
+        if self.daemon._paused:
+            transport.pause_reading()
+
+    def connection_lost(self, exc):
+        self.daemon._tcp_clients.discard(self)
+        # O que ficou por ler (incluindo uma linha final sem "\n") é aplicado nos
+        # próximos flushes, como o resto do backlog
+        if self._partial.strip():
+            self.daemon._orphans.append(self._partial + b"\n")
+        self._partial = b""
+
+    def data_received(self, data):
+        if not self.consume(data) or self.daemon.buffer.full:
+            self.daemon._pause_tcp()
+
+    def consume(self, data: bytes = b"") -> bool:
+        # Só processa linhas completas; o resto fica para o próximo bloco.
+        # Devolve False se o buffer encheu a meio (as linhas por ler ficam em _partial)
+        data = self._partial + data
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            self._partial = data
+            return True
+        rest = self.daemon.buffer.feed_until_full(data[:cut])
+        if rest is not None:
+            self._partial = rest + data[cut:]
+            return False
+        self._partial = data[cut + 1:]
+        return True
+
+
+class IngestDaemon:
+    def __init__(self, inventory, host: str = "127.0.0.1", udp_port: int = 9999, tcp_port: int = 9998,
+                 flush_interval: float = 1.0, max_pending: int = 100_000, workers: int = 0):
+        if flush_interval <= 0:
+            raise ValueError("flush_interval tem de ser > 0.")
+        if workers < 0:
+            raise ValueError("workers não pode ser negativo.")
+        self.inventory = inventory
+        self.host = host
+        self.udp_port = udp_port
+        self.tcp_port = tcp_port
+        self.flush_interval = flush_interval
+        self.buffer = IngestBuffer(max_pending)
+        self.workers = workers
+
+        self._counters = None
+        self._processes = []
+        self._tcp_clients = set()
+        # Backlog de ligações TCP fechadas enquanto o buffer estava cheio
+        self._orphans = []
+        self._paused = False
+        self._udp_transport = None
+        self._tcp_server = None
+
+    def _pause_tcp(self):
+        if not self._paused:
+            self._paused = True
+            for client in self._tcp_clients:
+                client.transport.pause_reading()
+
+    def _resume_tcp(self):
+        # Primeiro as linhas retidas (ligações fechadas e pausadas): se o buffer voltar
+        # a encher, o TCP continua pausado até ao próximo flush
+        while self._orphans:
+            rest = self.buffer.feed_until_full(self._orphans[0])
+            if rest is not None:
+                self._orphans[0] = rest
+                return
+            self._orphans.pop(0)
+        for client in list(self._tcp_clients):
+            if not client.consume():
+                return
+        if self._paused:
+            self._paused = False
+            for client in self._tcp_clients:
+                client.transport.resume_reading()
+
+    def _backlog(self) -> bool:
+        return bool(self._orphans) or any(b"\n" in c._partial for c in self._tcp_clients)
+
+    def flush(self) -> dict:
+        result = self.buffer.flush_into(self.inventory)
+        self._resume_tcp()
+        if self._counters is not None:
+            absorbed = self.inventory.absorb_counters()
+            self.buffer.stats["applied"] += absorbed["applied"]
+            self.buffer.stats["suspended"] += len(absorbed["suspended"])
+        return result
+
+    def _start_workers(self):
+        # Contadores partilhados com folga para endpoints novos; os workers ficam com o UDP
+        capacity = max(1024, 2 * len(self.inventory))
+        self._counters = SharedCounters(capacity, self.workers)
+        self.inventory.attach_counters(self._counters)
+        slot_map = self.inventory.slot_map()
+        for worker_id in range(1, self.workers + 1):
+            p = multiprocessing.Process(
+                target=_worker_main, daemon=True,
+                args=(self._counters.spec, worker_id, slot_map, self.host, self.udp_port,
+                      self.flush_interval, self.buffer.max_pending))
+            p.start()
+            self._processes.append(p)
+
+    def _stop_workers(self):
+        # SIGINT deixa cada worker somar o que ainda tem em buffer antes de sair
+        for p in self._processes:
+            if p.is_alive():
+                os.kill(p.pid, signal.SIGINT)
+        for p in self._processes:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+        self._processes = []
+        if self._counters is not None:
+            self.inventory.absorb_counters()
+            self.inventory.detach_counters()
+            self._counters.close()
+            self._counters = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.udp_port is not None and self.workers:
+            self._start_workers()
+        elif self.udp_port is not None:
+            self._udp_transport, _ = await loop.create_datagram_endpoint(
+                lambda: _UDPProtocol(self.buffer), local_addr=(self.host, self.udp_port))
+        if self.tcp_port is not None:
+            self._tcp_server = await loop.create_server(lambda: _TCPProtocol(self), self.host, self.tcp_port)
+
+    async def stop(self):
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+        if self._tcp_server is not None:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+        # Aplica o que ainda estiver no buffer e as linhas retidas pela contrapressão
+        # (cada flush esvazia o buffer, por isso o backlog diminui a cada volta)
+        self.flush()
+        while self._backlog() or len(self.buffer):
+            self.flush()
+        self._stop_workers()
+
+    async def run(self, on_flush=None):
+
+        # MÉTODO: run()
+
+        # O QUE FAZ:
+        #     - Abre os sockets e faz flush a cada flush_interval segundos até ser cancelado
+        #     - on_flush(daemon, resultado) é chamado após cada flush (ex: gravar, log)
+
+        await self.start()
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                result = self.flush()
+                if on_flush is not None:
+                    on_flush(self, result)
+        finally:
+            await self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recebe registos de tráfego por UDP/TCP e aplica-os ao inventário.")
+    parser.add_argument("--file", default="inventario.json", help="ficheiro JSON do inventário")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--udp", type=int, default=9999, help="porta UDP (0 = desligado)")
+    parser.add_argument("--tcp", type=int, default=9998, help="porta TCP (0 = desligado)")
+    parser.add_argument("--flush", type=float, default=1.0, help="intervalo entre flushes (s)")
+    parser.add_argument("--max-pending", type=int, default=100_000, help="endpoints distintos em buffer")
+    parser.add_argument("--save-every", type=float, default=60.0, help="gravar o JSON a cada N segundos")
+    parser.add_argument("--workers", type=int, default=0, help="processos de ingestão UDP (0 = só este processo)")
+    parser.add_argument("--history", help="pasta do histórico em disco (history.py)")
+    args = parser.parse_args()
+
+    inv = load_from_json(args.file)
+    store = None
+    if args.history:
+        from history import HistoryStore
+        store = HistoryStore(args.history)
+        inv.attach_history(store)
+    daemon = IngestDaemon(inv, args.host, args.udp or None, args.tcp or None, args.flush, args.max_pending,
+                          args.workers)
+    last_save = time.monotonic()
+
+    def on_flush(d, result):
+        nonlocal last_save
+        s = d.buffer.stats
+        print(f"recebidos={s['received']} aplicados={s['applied']} desconhecidos={s['unknown']} "
+              f"descartados={s['dropped']} mal_formados={s['malformed']} suspensos={s['suspended']}")
+        if time.monotonic() - last_save >= args.save_every:
+            save_to_json(inv, args.file)
+            last_save = time.monotonic()
+
+    print(f"A escutar em {args.host} (UDP {args.udp or '-'}, TCP {args.tcp or '-'}). Ctrl+C para terminar.")
+    try:
+        asyncio.run(daemon.run(on_flush))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+        save_to_json(inv, args.file)
+        print("Inventário gravado.")
+
+
+if __name__ == "__main__":
+    main()
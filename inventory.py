@@ -23,7 +23,27 @@
 #   - Verificar se um dispositivo é Endpoint (usando isinstance)
 #   - Aceder aos métodos específicos de Endpoint (add_traffic, suspend_for_minutes, etc.)
 #   - Gerenciar suspensões e tráfego de endpoints
-from devices import Endpoint
+from devices import Endpoint, Switch, PORT_CLASSES
+
+# Políticas de tráfego (limite acumulado e janela deslizante)
+from policies import CumulativeLimitPolicy, WindowLimitPolicy
+import time
+
+# deque guarda o registo das suspensões mais recentes com tamanho limitado
+from collections import deque
+import heapq
+
+# hashlib e json são usados para calcular a "impressão digital" (hash) de cada
+# dispositivo a partir da forma canónica do seu to_dict() (diff e merge)
+import hashlib
+import json
+
+# bisect mantém listas ordenadas (índices de paginação) sem reordenar tudo
+from bisect import bisect_left, bisect_right, insort
+
+# ip_network e as conversões de utils permitem consultas por endereço inteiro
+from ipaddress import ip_network
+from utils import is_valid_ipv4, is_valid_mac, normalize_mac, ipv4_to_int, mac_to_int
 
 # ======================== CLASSE NETWORKINVENTORY ========================
 
@@ -36,9 +56,26 @@ class NetworkInventory:
         # - find_by_type(): Pesquisar por tipo de dispositivo
         # - find_by_status(): Pesquisar por estado (ativo/inativo)
         # - find_by_ipv4(): Pesquisar por endereço IP
+        # - find_by_mac(): Pesquisar por endereço MAC
+        # - find_by_ipv4_network(): Pesquisar por rede IPv4 (intervalo de endereços)
+        # - find_by_name_prefix() / count_by_type(): Listas de escolha limitadas e contagens
+        # - find_switch_with_free_port(): Switch com porta livre de uma classe (eth/fast/giga)
+        # - traffic_rollup() / rollups(): Tráfego agregado por AP, switch e router
+        # - find_by_user() / top_users() / suspend_user(): Consultas e ações por utilizador
+        # - traffic_totals(): Tráfego total por endpoint, utilizador ou AP
         # - get_endpoint(): Obter endpoint específico
         # - top_consumers(): Obter maiores consumidores de tráfego
         # - apply_traffic_policy(): Aplicar políticas de limite de tráfego
+        # - apply_window_policy(): Limite de tráfego numa janela deslizante (últimos N minutos)
+        # - apply_policy(): Aplicar qualquer política de policies.py
+        # - register_policy(): Política permanente, avaliada a cada add_traffic
+        # - ingest_traffic(): Aplicar tráfego em bloco (nome, up, down)
+        # - attach_counters() / absorb_counters(): Totais em memória partilhada (vários processos)
+        # - attach_history(): Gravar as amostras de tráfego no histórico em disco (history.py)
+        # - diff(): Comparar com outro inventário (adicionados/removidos/modificados)
+        # - merge(): Fusão a três vias com outro inventário e uma base comum
+        # - iter_devices(): Percorrer dispositivos sem criar listas (gerador)
+        # - page(): Paginação por cursor (por nome ou por ordem de inserção)
 
     def __init__(self):
 
@@ -53,6 +90,578 @@ class NetworkInventory:
 
         self.devices = {}
 
+        # Índices de paginação (mantidos em add_device/remove_device):
+        # - _names_sorted: nomes por ordem alfabética
+        # - _order_seqs/_order_names: nº de sequência e nome por ordem de inserção
+        # - _seq: { nome: nº de sequência } para localizar/remover rapidamente
+        # - _names_by_type: { tipo: nomes por ordem alfabética } (listas de escolha por tipo)
+        self._names_sorted = []
+        self._names_by_type = {}
+        self._order_seqs = []
+        self._order_names = []
+        self._seq = {}
+        self._next_seq = 0
+
+        # Índices de endereços: { endereço_inteiro: nome } (MAC, IPv4, IPv6)
+        self._mac_index = {}
+        self._ipv4_index = {}
+        self._ipv6_index = {}
+
+        # Índice de portas livres: { classe_de_porta: conjunto de nomes de Switches
+        # com pelo menos uma porta livre dessa classe }
+        self._free_port_switches = {c: set() for c in PORT_CLASSES}
+
+        # { nome_endpoint: timestamp da última amostra de tráfego }
+        self._last_traffic = {}
+
+        # Políticas permanentes: avaliadas no momento em que chega tráfego,
+        # apenas para o endpoint afetado (sem varrimentos periódicos)
+        self._standing_policies = []
+        self.recent_suspensions = deque(maxlen=100)
+
+        # Durante uma ingestão em bloco a avaliação é adiada: guarda os nomes tocados
+        self._bulk_touched = None
+
+        # Incrementado sempre que a topologia muda (dispositivos ou ligações);
+        # permite a quem calcula tabelas derivadas (ex: RuleEnginePolicy) saber se
+        # ainda são válidas
+        self.topology_version = 0
+
+        # Incrementado quando um dispositivo do inventário muda de MAC/IPv4/IPv6
+        # (add/remove já contam em topology_version); ex: Reconciler
+        self.address_version = 0
+
+        # Incrementado em qualquer alteração (dispositivos, ligações, tráfego, estados):
+        # permite guardar resultados caros (ex: exportações) até o inventário mudar
+        self.version = 0
+
+        # Slots estáveis dos endpoints nos contadores partilhados (shared_counters.py):
+        # { nome: slot }, slot -> nome, slots libertados para reutilizar
+        self._slots = {}
+        self._slot_names = {}
+        self._free_slots = []
+        self._next_slot = 0
+        self._counters = None
+
+        # Agregados de tráfego pela topologia (endpoint -> AP -> switch -> router):
+        # - _parent: { nome: dispositivo a montante ativo } (só um, para que o tráfego
+        #   não seja contado duas vezes num nó com várias ligações a montante)
+        # - _children: { nome: conjunto de nomes a jusante (que o têm como pai ativo) }
+        # - _uplinks: { nome: { nome a montante: nº de ligações } } todas as ligações a
+        #   montante, e _downlinks o inverso: quando o pai ativo é desligado ou removido,
+        #   o nó passa para outra destas ligações
+        # - _rollup: { nome: [up, down] } tráfego do próprio + de toda a sub-árvore
+        # - _pending_links: ligações para nomes que ainda não existem no inventário
+        self._parent = {}
+        self._children = {}
+        self._uplinks = {}
+        self._downlinks = {}
+        self._rollup = {}
+        self._pending_links = {}
+
+        # Índice por utilizador: { user_id: conjunto de nomes de endpoints } e
+        # { user_id: [up, down] } com os totais somados a cada add_traffic
+        self._user_endpoints = {}
+        self._user_totals = {}
+
+        # Histórico em disco (history.HistoryStore): cada amostra de tráfego é acrescentada
+        self._history = None
+
+    def __iter__(self):
+        # Permite "for d in inv" sem copiar a coleção
+        return iter(self.devices.values())
+
+    def __len__(self):
+        return len(self.devices)
+
+    def _index_device(self, device):
+
+        # MÉTODO: _index_device()
+
+        # O QUE FAZ:
+        #     - Regista um dispositivo acabado de adicionar nos índices auxiliares
+
+        insort(self._names_sorted, device.name)
+        self._seq[device.name] = self._next_seq
+        self._order_seqs.append(self._next_seq)
+        self._order_names.append(device.name)
+        self._next_seq += 1
+        insort(self._names_by_type.setdefault(device.device_type, []), device.name)
+
+        for attr, index in (("mac_int", self._mac_index), ("ipv4_int", self._ipv4_index), ("ipv6_int", self._ipv6_index)):
+            value = getattr(device, attr, None)
+            if value is not None:
+                index[value] = device.name
+
+        # O dispositivo passa a avisar este inventário das alterações diretas
+        device._owner = self
+        self.topology_version += 1
+        self.version += 1
+        if isinstance(device, Switch):
+            self._update_free_ports(device)
+
+        if isinstance(device, Endpoint):
+            self._assign_slot(device)
+            self._user_endpoints.setdefault(device.user_id, set()).add(device.name)
+            acc = self._user_totals.setdefault(device.user_id, [0.0, 0.0])
+            acc[0] += device.traffic_up_mb
+            acc[1] += device.traffic_down_mb
+        self._index_rollup(device)
+
+        # Endpoints que já trazem histórico (ex: vindos de outro inventário)
+        series = getattr(device, "traffic_series", None)
+        if series is not None and len(series):
+            self._last_traffic[device.name] = max(ts for ts, _, _ in series.samples())
+
+    def _unindex_device(self, device):
+
+        # MÉTODO: _unindex_device()
+
+        # O QUE FAZ:
+        #     - Retira um dispositivo removido dos índices auxiliares
+        #     - As posições são encontradas por pesquisa binária (bisect)
+
+        i = bisect_right(self._names_sorted, device.name) - 1
+        del self._names_sorted[i]
+
+        seq = self._seq.pop(device.name)
+        i = bisect_right(self._order_seqs, seq) - 1
+        del self._order_seqs[i]
+        del self._order_names[i]
+        names = self._names_by_type[device.device_type]
+        del names[bisect_right(names, device.name) - 1]
+
+        for attr, index in (("mac_int", self._mac_index), ("ipv4_int", self._ipv4_index), ("ipv6_int", self._ipv6_index)):
+            value = getattr(device, attr, None)
+            if value is not None and index.get(value) == device.name:
+                del index[value]
+
+        device._owner = None
+        self.topology_version += 1
+        self.version += 1
+        for names in self._free_port_switches.values():
+            names.discard(device.name)
+        self._last_traffic.pop(device.name, None)
+        if isinstance(device, Endpoint):
+            self._release_slot(device)
+            names = self._user_endpoints.get(device.user_id)
+            if names is not None:
+                names.discard(device.name)
+                if names:
+                    acc = self._user_totals[device.user_id]
+                    acc[0] -= device.traffic_up_mb
+                    acc[1] -= device.traffic_down_mb
+                else:
+                    del self._user_endpoints[device.user_id]
+                    del self._user_totals[device.user_id]
+        self._unindex_rollup(device)
+
+    def _assign_slot(self, ep):
+
+        # MÉTODO: _assign_slot()
+
+        # O QUE FAZ:
+        #     - Dá ao endpoint um slot estável (reutiliza primeiro os libertados)
+        #     - Se houver contadores partilhados com capacidade, liga-o ao seu slot
+
+        slot = self._free_slots.pop() if self._free_slots else self._next_slot
+        if slot == self._next_slot:
+            self._next_slot += 1
+        self._slots[ep.name] = slot
+        self._slot_names[slot] = ep.name
+        if self._counters is not None and slot < self._counters.capacity:
+            ep.bind_counters(self._counters, slot)
+
+    def _release_slot(self, ep):
+        slot = self._slots.pop(ep.name, None)
+        if slot is not None:
+            del self._slot_names[slot]
+            self._free_slots.append(slot)
+        ep.unbind_counters()
+
+    def _rebuild_indexes(self):
+
+        # MÉTODO: _rebuild_indexes()
+
+        # O QUE FAZ:
+        #     - Reconstrói todos os índices a partir do dicionário de dispositivos
+        #     - Usado quando o dicionário é trocado de uma só vez (replace_with)
+
+        self._names_sorted = []
+        self._order_seqs = []
+        self._order_names = []
+        self._seq = {}
+        self._next_seq = 0
+        self._mac_index = {}
+        self._ipv4_index = {}
+        self._ipv6_index = {}
+        self._free_port_switches = {c: set() for c in PORT_CLASSES}
+        self._last_traffic = {}
+        self._slots = {}
+        self._slot_names = {}
+        self._free_slots = []
+        self._next_slot = 0
+        self._parent = {}
+        self._children = {}
+        self._uplinks = {}
+        self._downlinks = {}
+        self._rollup = {}
+        self._pending_links = {}
+        self._user_endpoints = {}
+        self._user_totals = {}
+        self._names_by_type = {}
+        for d in self.devices.values():
+            self._index_device(d)
+
+    def _on_device_event(self, device, event: str, *args):
+
+        # MÉTODO: _on_device_event()
+
+        # O QUE FAZ:
+        #     - Chamado pelos próprios dispositivos (Device._notify) quando são
+        #       alterados diretamente (ex: h_obj.connect_device(...) na interface web)
+        #     - Mantém os índices afetados coerentes sem percorrer o inventário
+
+        self.version += 1
+        if event in ("link", "unlink"):
+            self.topology_version += 1
+            if isinstance(device, Switch):
+                self._update_free_ports(device)
+            if event == "link":
+                self._rollup_link(device.name, args[0])
+            else:
+                self._rollup_unlink(device.name, args[0])
+        elif event == "adjust":
+            # Correção manual dos totais (set_traffic): só afeta os agregados
+            self._rollup_add(device.name, *args)
+            self._user_add(device.user_id, *args)
+        elif event == "traffic":
+            up, down, ts = args
+            self._rollup_add(device.name, up, down)
+            self._user_add(device.user_id, up, down)
+            if self._history is not None:
+                self._history.append(device.name, device.user_id, ts, up, down)
+            if ts > self._last_traffic.get(device.name, 0.0):
+                self._last_traffic[device.name] = ts
+
+            # Avalia já as políticas permanentes para este endpoint
+            # (numa ingestão em bloco, só no fim e uma vez por endpoint)
+            if self._standing_policies:
+                if self._bulk_touched is not None:
+                    self._bulk_touched.add(device.name)
+                else:
+                    self._enforce(device, ts)
+
+    def _on_address_change(self, device, kind: str, old, new):
+
+        # MÉTODO: _on_address_change()
+
+        # O QUE FAZ:
+        #     - Chamado por Device._set_address antes de um dispositivo do inventário
+        #       mudar de MAC/IPv4/IPv6 (kind: "mac", "ipv4" ou "ipv6")
+        #     - Recusa (ValueError) um endereço que já pertence a outro dispositivo,
+        #       sem alterar nada; senão move a entrada do índice do valor antigo para o novo
+
+        index, label = {"mac": (self._mac_index, "MAC"), "ipv4": (self._ipv4_index, "IPv4"),
+                        "ipv6": (self._ipv6_index, "IPv6")}[kind]
+        if new is not None and index.get(new, device.name) != device.name:
+            raise ValueError(f"{label} duplicado no inventário.")
+        if old is not None and index.get(old) == device.name:
+            del index[old]
+        if new is not None:
+            index[new] = device.name
+        self.address_version += 1
+        self.version += 1
+
+    def _on_user_change(self, device, old: str, new: str):
+
+        # MÉTODO: _on_user_change()
+
+        # O QUE FAZ:
+        #     - Chamado pelo setter Endpoint.user_id antes de um endpoint do inventário
+        #       mudar de utilizador
+        #     - Move o endpoint e os seus totais do utilizador antigo para o novo
+
+        up, down = device.traffic_up_mb, device.traffic_down_mb
+        names = self._user_endpoints.get(old)
+        if names is not None:
+            names.discard(device.name)
+            if names:
+                self._user_add(old, -up, -down)
+            else:
+                del self._user_endpoints[old]
+                del self._user_totals[old]
+        self._user_endpoints.setdefault(new, set()).add(device.name)
+        acc = self._user_totals.setdefault(new, [0.0, 0.0])
+        acc[0] += up
+        acc[1] += down
+        self.version += 1
+
+    def _user_add(self, user_id: str, up: float, down: float):
+        acc = self._user_totals.get(user_id)
+        if acc is not None:
+            acc[0] += up
+            acc[1] += down
+
+    def find_by_user(self, user_id: str) -> list:
+
+        # MÉTODO: find_by_user()
+
+        # O QUE FAZ:
+        #     - Devolve os endpoints do utilizador (consulta ao índice, sem percorrer tudo)
+        #     - Ordenados por nome; lista vazia se o utilizador não existir
+
+        names = self._user_endpoints.get((user_id or "").strip(), ())
+        return [self.devices[n] for n in sorted(names)]
+
+    def user_totals(self, user_id: str):
+        # (up, down) somados de todos os endpoints do utilizador
+        acc = self._user_totals.get((user_id or "").strip())
+        return (acc[0], acc[1]) if acc is not None else (0.0, 0.0)
+
+    def top_users(self, n: int) -> list:
+
+        # MÉTODO: top_users()
+
+        # O QUE FAZ:
+        #     - Devolve os N utilizadores com mais tráfego: [(user_id, up, down), ...]
+        #     - Usa os totais por utilizador já mantidos (O(nº de utilizadores), sem
+        #       visitar os endpoints)
+
+        best = heapq.nlargest(n, self._user_totals.items(), key=lambda kv: kv[1][0] + kv[1][1])
+        return [(user_id, up, down) for user_id, (up, down) in best]
+
+    def traffic_totals(self, group: str = "endpoint") -> dict:
+
+        # MÉTODO: traffic_totals()
+
+        # O QUE FAZ:
+        #     - Devolve { chave: tráfego total (up + down) } agrupado por "endpoint",
+        #       "user", "ap", "switch" ou "router", a partir dos totais que o inventário
+        #       já mantém: contadores partilhados (por slot), totais por utilizador e
+        #       agregados da topologia (APs, switches e routers)
+        #     - Com contadores partilhados, todos os agrupamentos contam só o tráfego
+        #       já absorvido (absorb_counters), para que as somas batam certo entre si
+
+        if group == "user":
+            return {user_id: up + down for user_id, (up, down) in self._user_totals.items()}
+        if group in ("ap", "switch", "router"):
+            return {name: self._rollup[name][0] + self._rollup[name][1]
+                    for name in self._names_by_type.get(group.upper(), ())}
+        if group != "endpoint":
+            raise ValueError("group tem de ser 'endpoint', 'user', 'ap', 'switch' ou 'router'.")
+
+        if self._counters is not None:
+            totals = self._counters.all_totals()
+            result = {}
+            for slot, name in self._slot_names.items():
+                if slot < len(totals):
+                    result[name] = totals[slot]
+                else:
+                    ep = self.devices[name]
+                    result[name] = ep.traffic_up_mb + ep.traffic_down_mb
+            return result
+        return {e.name: e.traffic_up_mb + e.traffic_down_mb for e in self.iter_devices(device_type="ENDPOINT")}
+
+    def suspend_user(self, user_id: str, minutes: int) -> list:
+
+        # MÉTODO: suspend_user()
+
+        # O QUE FAZ:
+        #     - Suspende de uma vez todos os endpoints do utilizador
+        #     - Regista cada suspensão em recent_suspensions e devolve os endpoints
+
+        if minutes <= 0:
+            raise ValueError("minutes tem de ser > 0.")
+        endpoints = self.find_by_user(user_id)
+        if not endpoints:
+            raise ValueError("Utilizador sem endpoints no inventário.")
+        now = time.time()
+        for ep in endpoints:
+            ep.suspend_for_minutes(minutes)
+            self.recent_suspensions.append((now, ep.name, f"Suspensão do utilizador {ep.user_id}"))
+        return endpoints
+
+    # Posição de cada tipo na hierarquia: numa ligação, o de posição mais alta fica a montante
+    _RANK = {"ROUTER": 3, "SWITCH": 2, "AP": 1, "ENDPOINT": 0}
+
+    @staticmethod
+    def _links_of(device):
+        return getattr(device, "connected_devices", None) or getattr(device, "connected_endpoints", None) or ()
+
+    def _rollup_add(self, name: str, up: float, down: float):
+        # Soma (up, down) ao nó e a todos os nós a montante: O(profundidade)
+        while name is not None:
+            acc = self._rollup.get(name)
+            if acc is None:
+                return
+            acc[0] += up
+            acc[1] += down
+            name = self._parent.get(name)
+
+    def _rollup_attach(self, child: str, parent: str):
+        # Pendura a sub-árvore de "child" em "parent" (ignora se criaria um ciclo)
+        node = parent
+        while node is not None:
+            if node == child:
+                return
+            node = self._parent.get(node)
+        self._parent[child] = parent
+        self._children[parent].add(child)
+        up, down = self._rollup[child]
+        self._rollup_add(parent, up, down)
+
+    def _rollup_detach(self, child: str):
+        parent = self._parent.pop(child, None)
+        if parent is not None:
+            self._children[parent].discard(child)
+            up, down = self._rollup[child]
+            self._rollup_add(parent, -up, -down)
+
+    def _rollup_reattach(self, child: str):
+        # Pendura o nó (sem pai ativo) na primeira ligação a montante que não crie um ciclo
+        for parent in sorted(self._uplinks.get(child, ())):
+            self._rollup_attach(child, parent)
+            if child in self._parent:
+                return
+
+    def _orient(self, host: str, target: str):
+        # (filho, pai) de uma ligação: o de posição mais alta fica a montante; em empate, o host
+        rank = self._RANK
+        h_rank = rank.get(self.devices[host].device_type, 0)
+        t_rank = rank.get(self.devices[target].device_type, 0)
+        return (host, target) if t_rank > h_rank else (target, host)
+
+    def _rollup_link(self, host: str, target: str):
+
+        # MÉTODO: _rollup_link()
+
+        # O QUE FAZ:
+        #     - Nova ligação host -> target: o de posição mais alta (Router > Switch > AP > Endpoint)
+        #       passa a estar a montante do outro; em empate, o host
+        #     - Todas as ligações a montante ficam registadas (_uplinks), mas só uma é o
+        #       pai ativo: um nó que já tem pai não muda os agregados
+        #     - Se o target ainda não existe, a ligação fica pendente até ser adicionado
+
+        if target not in self._rollup:
+            self._pending_links.setdefault(target, set()).add(host)
+            return
+        if host not in self._rollup:
+            return
+        child, parent = self._orient(host, target)
+        ups = self._uplinks.setdefault(child, {})
+        ups[parent] = ups.get(parent, 0) + 1
+        self._downlinks.setdefault(parent, set()).add(child)
+        if child not in self._parent:
+            self._rollup_attach(child, parent)
+
+    def _drop_uplink(self, child: str, parent: str, count: int = 1):
+        # Retira "count" ligações child -> parent; sem nenhuma, se parent era o pai
+        # ativo, o nó passa para outra ligação a montante (se houver)
+        ups = self._uplinks.get(child)
+        if not ups or parent not in ups:
+            return
+        ups[parent] -= count
+        if ups[parent] > 0:
+            return
+        del ups[parent]
+        if not ups:
+            del self._uplinks[child]
+        downs = self._downlinks.get(parent)
+        if downs is not None:
+            downs.discard(child)
+        if self._parent.get(child) == parent:
+            self._rollup_detach(child)
+            self._rollup_reattach(child)
+
+    def _rollup_unlink(self, host: str, target: str):
+        pending = self._pending_links.get(target)
+        if pending is not None:
+            pending.discard(host)
+        if host in self._rollup and target in self._rollup:
+            self._drop_uplink(*self._orient(host, target))
+
+    def _index_rollup(self, device):
+        # Agregado inicial = tráfego do próprio; depois aplica as ligações dele
+        # e as ligações que outros já tinham para ele (pendentes)
+        name = device.name
+        own = [device.traffic_up_mb, device.traffic_down_mb] if isinstance(device, Endpoint) else [0.0, 0.0]
+        self._rollup[name] = own
+        self._children[name] = set()
+        for target in list(self._links_of(device)):
+            self._rollup_link(name, target)
+        for host in self._pending_links.pop(name, ()):
+            host_dev = self.devices.get(host)
+            if host_dev is not None and name in self._links_of(host_dev):
+                self._rollup_link(host, name)
+
+    def _unindex_rollup(self, device):
+        # Desliga o nó da árvore (os filhos passam para outra ligação a montante, se
+        # tiverem); quem ainda o tem nas suas ligações fica pendente (se voltar a ser
+        # adicionado, a ligação é reposta)
+        name = device.name
+        downs = self._downlinks.pop(name, set())
+        ups = self._uplinks.pop(name, {})
+        neighbours = list(downs) + list(ups)
+        self._rollup_detach(name)
+        for parent in ups:
+            self._downlinks[parent].discard(name)
+        for child in downs:
+            self._drop_uplink(child, name, self._uplinks[child][name])
+        for other in neighbours:
+            other_dev = self.devices.get(other)
+            if other_dev is not None and name in self._links_of(other_dev):
+                self._pending_links.setdefault(name, set()).add(other)
+        for target in self._links_of(device):
+            pending = self._pending_links.get(target)
+            if pending is not None:
+                pending.discard(name)
+        self._children.pop(name, None)
+        self._rollup.pop(name, None)
+
+    def traffic_rollup(self, name: str):
+
+        # MÉTODO: traffic_rollup()
+
+        # O QUE FAZ:
+        #     - Devolve (up, down) do dispositivo e de tudo o que está a jusante dele
+        #       (ex: um Switch soma os seus APs e os endpoints desses APs)
+        #     - Valor mantido a cada add_traffic/ligação: não percorre a topologia
+
+        acc = self._rollup.get(name)
+        return (acc[0], acc[1]) if acc is not None else (0.0, 0.0)
+
+    def rollups(self, device_type: str = None) -> dict:
+        # { nome: (up, down) } agregado de cada dispositivo (ex: device_type="SWITCH")
+        return {d.name: tuple(self._rollup[d.name]) for d in self.iter_devices(device_type=device_type)}
+
+    def upstream_of(self, name: str):
+        # Dispositivo a montante (pai na hierarquia de agregação) ou None
+        return self._parent.get(name)
+
+    def _update_free_ports(self, switch):
+        # Atualiza a presença do Switch no índice de portas livres (O(nº de classes))
+        for c in PORT_CLASSES:
+            if switch.free_ports(c) > 0:
+                self._free_port_switches[c].add(switch.name)
+            else:
+                self._free_port_switches[c].discard(switch.name)
+
+    def find_switch_with_free_port(self, port_class: str = "giga"):
+
+        # MÉTODO: find_switch_with_free_port()
+
+        # O QUE FAZ:
+        #     - Devolve um Switch com pelo menos uma porta livre da classe pedida
+        #       ("eth", "fast" ou "giga"), ou None se não houver nenhum
+        #     - Consulta o índice de portas livres: não percorre os Switches
+
+        if port_class not in self._free_port_switches:
+            raise ValueError(f"Classe de porta inválida (use {', '.join(PORT_CLASSES)}).")
+        for name in self._free_port_switches[port_class]:
+            return self.devices[name]
+        return None
+
     def replace_with(self, other_inv):
 
         # MÉTODO: replace_with()
@@ -62,8 +671,13 @@ class NetworkInventory:
             # - Descarta todos os dispositivos antigas
             # - Copia todas as referências do novo inventário
     
+        # Os endpoints antigos deixam os contadores partilhados (guardam os totais localmente)
+        for ep in self.iter_devices(device_type="ENDPOINT"):
+            ep.unbind_counters()
+
         # Substitui os dispositivos atuais pelos do outro inventário
         self.devices = other_inv.devices
+        self._rebuild_indexes()
 
     def add_device(self, device):
 
@@ -72,46 +686,34 @@ class NetworkInventory:
         # O QUE FAZ:
             # 1. Valida que o nome é único (não pode existir outro com mesmo nome)
             # 2. Valida que o MAC é único (se o dispositivo tiver MAC)
-            # 3. Valida que o IPv4 é único (se o dispositivo tiver IPv4)
+            # 3. Valida que o IPv4 e o IPv6 são únicos (se o dispositivo os tiver)
             # 4. Se passar em todas as validações, adiciona o dispositivo
             # 5. Se falhar, levanta uma exceção com mensagem de erro
+            # As verificações usam os índices de endereços (inteiros), por isso são O(1)
+            # e tratam grafias equivalentes (ex: IPv6 comprimido/expandido) como iguais.
 
         # Se o nome já existe no dicionário de dispositivos
         if device.name in self.devices:
             # Levanta exceção bloqueando a adição
             raise ValueError("Já existe um dispositivo com esse nome.")
 
-        # Alguns dispositivos têm mac_address, outros não
+        # Alguns dispositivos têm MAC/IPv4/IPv6, outros não
         # getattr(obj, attr, default) devolve o atributo ou default se não existir
-        new_mac = getattr(device, "mac_address", None)
+        new_mac = getattr(device, "mac_int", None)
+        if new_mac is not None and new_mac in self._mac_index:
+            raise ValueError("MAC duplicado no inventário.")
 
-        # Se o dispositivo tiver MAC (não é None e não é vazio)
-        if new_mac:
-            # Percorre todos os dispositivos já guardados no inventário
-            for d in self.devices.values():
-                # Vai buscar o MAC do dispositivo existente (se tiver)
-                mac = getattr(d, "mac_address", None)
+        new_ipv4 = getattr(device, "ipv4_int", None)
+        if new_ipv4 is not None and new_ipv4 in self._ipv4_index:
+            raise ValueError("IPv4 duplicado no inventário.")
 
-                # Se o dispositivo existente tiver MAC e for igual ao novo -> erro
-                if mac and mac == new_mac:
-                    raise ValueError("MAC duplicado no inventário.")
-
-        # Alguns dispositivos têm ipv4, outros podem não ter (ou ser vazio)
-        new_ipv4 = getattr(device, "ipv4", None)
-
-        # Se o dispositivo tiver IPv4 (não é None e não é vazio)
-        if new_ipv4:
-            # Percorre todos os dispositivos já guardados no inventário
-            for d in self.devices.values():
-                # Vai buscar o IPv4 do dispositivo existente (se tiver)
-                ipv4 = getattr(d, "ipv4", None)
-
-                # Se o dispositivo existente tiver IPv4 e for igual ao novo -> erro
-                if ipv4 and ipv4 == new_ipv4:
-                    raise ValueError("IPv4 duplicado no inventário.")
+        new_ipv6 = getattr(device, "ipv6_int", None)
+        if new_ipv6 is not None and new_ipv6 in self._ipv6_index:
+            raise ValueError("IPv6 duplicado no inventário.")
 
         # Se passou em todas as validações, adiciona o dispositivo ao dicionário
         self.devices[device.name] = device
+        self._index_device(device)
 
     def remove_device(self, name: str) -> bool:
 
@@ -129,8 +731,8 @@ class NetworkInventory:
 
         # Se o dispositivo existe no dicionário
         if name in self.devices:
-            # Remove (apaga) o dispositivo do dicionário
-            del self.devices[name]
+            # Remove (apaga) o dispositivo do dicionário e dos índices
+            self._unindex_device(self.devices.pop(name))
             # Devolve True indicando sucesso
             return True
 
@@ -147,8 +749,111 @@ class NetworkInventory:
         #     - A lista pode estar vazia se o inventário não tiver dispositivos
 
         # Devolve uma lista com todos os valores (objetos) do dicionário
+        # (para uma única passagem, preferir iter_devices() que não copia nada)
         return list(self.devices.values())
 
+    def iter_devices(self, device_type: str = None, status: str = None):
+
+        # MÉTODO: iter_devices()
+
+        # O QUE FAZ:
+        #     - Gerador que percorre os dispositivos sem criar uma lista nova
+        #     - Filtra opcionalmente por tipo e/ou estado
+        #     - Ideal para exportações e filtros que só precisam de uma passagem
+
+        device_type = (device_type or "").strip().upper()
+        status = (status or "").strip().upper()
+
+        for d in self.devices.values():
+            if device_type and d.device_type != device_type:
+                continue
+            if status and d.status != status:
+                continue
+            yield d
+
+    def page(self, limit: int = 50, cursor: str = None, order: str = "insertion", predicate=None):
+
+        # MÉTODO: page()
+
+        # O QUE FAZ:
+        #     1. Devolve no máximo "limit" dispositivos a partir do cursor
+        #     2. order="name": ordem alfabética; order="insertion": ordem de inserção
+        #     3. predicate (opcional): função d -> bool para filtrar do lado do servidor
+        #     4. Devolve (lista_da_página, próximo_cursor); o cursor é None no fim
+        #     O cursor guarda a chave do último elemento devolvido (e não uma posição),
+        #     por isso continua válido mesmo que entretanto se adicionem/removam dispositivos.
+
+        # EXEMPLO DE USO:
+        #     items, cur = inv.page(20)            # primeira página
+        #     items, cur = inv.page(20, cur)       # página seguinte
+
+        if limit <= 0:
+            raise ValueError("limit tem de ser > 0.")
+        if order not in ("name", "insertion"):
+            raise ValueError("order tem de ser 'name' ou 'insertion'.")
+
+        # Escolhe o índice ordenado e a chave de ordenação correspondente
+        if order == "name":
+            keys = self._names_sorted
+            names = self._names_sorted
+        else:
+            keys = self._order_seqs
+            names = self._order_names
+
+        # Descodifica o cursor ("ordem:chave") e encontra a posição seguinte
+        start = 0
+        if cursor:
+            c_order, _, c_key = cursor.partition(":")
+            if c_order != order:
+                raise ValueError("Cursor não corresponde à ordenação pedida.")
+            start = bisect_right(keys, c_key if order == "name" else int(c_key))
+
+        items = []
+        next_cursor = None
+        for i in range(start, len(names)):
+            d = self.devices[names[i]]
+            if predicate is not None and not predicate(d):
+                continue
+            # Já temos a página cheia e existe pelo menos mais um -> há página seguinte
+            if len(items) == limit:
+                last = items[-1].name
+                next_cursor = f"{order}:{last if order == 'name' else self._seq[last]}"
+                break
+            items.append(d)
+
+        return items, next_cursor
+
+    def count_by_type(self, device_type: str) -> int:
+        # Nº de dispositivos de um tipo (tamanho do índice de nomes desse tipo)
+        return len(self._names_by_type.get((device_type or "").strip().upper(), ()))
+
+    def find_by_name_prefix(self, prefix: str, limit: int = 50, device_types=None) -> list:
+
+        # MÉTODO: find_by_name_prefix()
+
+        # O QUE FAZ:
+        #     - Devolve no máximo "limit" dispositivos cujo nome começa por "prefix"
+        #       (por ordem alfabética, distingue maiúsculas), opcionalmente só de
+        #       alguns tipos (ex: ("ROUTER", "SWITCH"))
+        #     - Pesquisa binária nos índices de nomes ordenados (geral ou por tipo): só
+        #       lê até "limit" nomes de cada índice, seja qual for o tamanho do inventário
+
+        if limit <= 0:
+            raise ValueError("limit tem de ser > 0.")
+        prefix = (prefix or "").strip()
+        if device_types is None:
+            indexes = [self._names_sorted]
+        else:
+            indexes = [self._names_by_type.get(t.strip().upper(), []) for t in device_types]
+
+        runs = []
+        for names in indexes:
+            i = bisect_left(names, prefix)
+            # A lista está ordenada: os nomes com o prefixo são contíguos a partir de i
+            runs.append([name for name in names[i:i + limit] if name.startswith(prefix)])
+
+        return [self.devices[name] for name in heapq.merge(*runs)][:limit]
+
     def find_by_type(self, device_type: str):
 
         # MÉTODO: find_by_type()
@@ -185,26 +890,69 @@ class NetworkInventory:
         # MÉTODO: find_by_ipv4()
          
         # O QUE FAZ:
-        #     1. Limpa espaços do IPv4
-        #     2. Percorre todos os dispositivos do inventário
-        #     3. Procura um que tenha esse IPv4
-        #     4. Devolve o dispositivo encontrado ou None
+        #     1. Limpa espaços e valida o IPv4
+        #     2. Converte-o para inteiro e consulta o índice de IPv4 (sem percorrer tudo)
+        #     3. Devolve o dispositivo encontrado ou None
 
         # Limpa espaços do IPv4
         ipv4 = (ipv4 or "").strip()
+        if not is_valid_ipv4(ipv4):
+            return None
 
-        # Percorre todos os dispositivos do inventário
-        for d in self.devices.values():
-            # Vai buscar o ipv4 do dispositivo (se existir, devolve None se não tiver)
-            v = getattr(d, "ipv4", None)
+        # Consulta direta ao índice { ipv4_int: nome }
+        name = self._ipv4_index.get(ipv4_to_int(ipv4))
+        return self.devices.get(name) if name is not None else None
 
-            # Se o dispositivo tiver IPv4 e for igual ao procurado
-            if v and v == ipv4:
-                # Devolve o dispositivo encontrado
-                return d
+    def find_by_mac(self, mac: str):
 
-        # Se nenhum dispositivo tiver esse IPv4, devolve None
-        return None
+        # MÉTODO: find_by_mac()
+
+        # O QUE FAZ:
+        #     - Normaliza e valida o MAC
+        #     - Devolve o dispositivo com esse MAC (consulta ao índice) ou None
+
+        mac = normalize_mac(mac or "")
+        if not is_valid_mac(mac):
+            return None
+        name = self._mac_index.get(mac_to_int(mac))
+        return self.devices.get(name) if name is not None else None
+
+    def address_owners(self, mac_int: int = None, ipv4_int: int = None):
+
+        # MÉTODO: address_owners()
+
+        # O QUE FAZ:
+        #     - Para endereços já convertidos em inteiros (ex: tabelas ARP inteiras),
+        #       devolve (nome do dono do MAC, nome do dono do IPv4), None se não houver
+        #     - Duas consultas aos índices, sem normalizar/validar strings
+
+        return self._mac_index.get(mac_int), self._ipv4_index.get(ipv4_int)
+
+    def address_keys(self, kind: str):
+        # Endereços (inteiros) já usados: "mac", "ipv4" ou "ipv6" (vista só de leitura,
+        # para junções em massa, ex: bulk_import.py)
+        index = {"mac": self._mac_index, "ipv4": self._ipv4_index, "ipv6": self._ipv6_index}.get(kind)
+        if index is None:
+            raise ValueError("kind tem de ser 'mac', 'ipv4' ou 'ipv6'.")
+        return index.keys()
+
+    def find_by_ipv4_network(self, network: str):
+
+        # MÉTODO: find_by_ipv4_network()
+
+        # O QUE FAZ:
+        #     1. Converte a rede (ex: "10.0.0.0/24") num intervalo de inteiros
+        #     2. Seleciona os dispositivos cujo IPv4 cai nesse intervalo
+        #     3. Devolve-os ordenados por endereço (ordenação numérica, não textual)
+
+        net = ip_network((network or "").strip(), strict=False)
+        if net.version != 4:
+            raise ValueError("A rede tem de ser IPv4.")
+        first = int(net.network_address)
+        last = int(net.broadcast_address)
+
+        found = sorted((ip, name) for ip, name in self._ipv4_index.items() if first <= ip <= last)
+        return [self.devices[name] for _, name in found]
 
     def get_endpoint(self, name: str):
 
@@ -242,6 +990,24 @@ class NetworkInventory:
         #     4. Devolve apenas os primeiros N
         #     5. Se n > total de endpoints, devolve todos
 
+        # Com contadores partilhados, os totais são lidos do bloco inteiro de uma vez
+        # (uma soma por faixa) em vez de um endpoint de cada vez
+        if self._counters is not None:
+            totals = self._counters.all_totals()
+
+            def total(item):
+                slot, name = item
+                if slot < len(totals):
+                    return totals[slot]
+                # Slots acima da capacidade ficam com os totais locais
+                ep = self.devices[name]
+                return ep.traffic_up_mb + ep.traffic_down_mb
+
+            top = [self.devices[name] for _, name in heapq.nlargest(n, self._slot_names.items(), key=total)]
+            for ep in top:
+                ep.refresh_status()
+            return top
+
         # Cria uma lista só com endpoints (ignora Router, Switch, AP)
         endpoints = [d for d in self.devices.values() if isinstance(d, Endpoint)]
 
@@ -264,38 +1030,409 @@ class NetworkInventory:
         # MÉTODO: apply_traffic_policy()
 
         # O QUE FAZ:
-        #     1. Filtra apenas os Endpoints do inventário
-        #     2. Para cada Endpoint:
+        #     1. Suspende os Endpoints cujo tráfego total (upload + download)
+        #        ultrapassa limit_mb, pelo tempo especificado
+        #     2. Endpoints já suspensos não são afetados de novo
+        #     3. Devolve lista dos endpoints que foram suspensos
+        #     (atalho para apply_policy com uma CumulativeLimitPolicy)
+
+        return self.apply_policy(CumulativeLimitPolicy(limit_mb, suspend_minutes))
+
+    def apply_window_policy(self, limit_mb: float, window_minutes: int, suspend_minutes: int):
+
+        # MÉTODO: apply_window_policy()
+
+        # O QUE FAZ:
+        #     - Suspende os Endpoints com mais de limit_mb nos últimos window_minutes
+        #       minutos (janela deslizante sobre o histórico de cada endpoint)
+        #     - Só avalia endpoints com tráfego dentro da janela, por isso é barato
+        #       o suficiente para correr a cada poucos segundos
+
+        return self.apply_policy(WindowLimitPolicy(limit_mb, window_minutes, suspend_minutes))
+
+    def apply_policy(self, policy, now: float = None):
+
+        # MÉTODO: apply_policy()
+
+        # O QUE FAZ:
+        #     1. Pede à política os endpoints candidatos (policy.candidates)
+        #     2. Para cada candidato:
         #        a. Atualiza o estado (verifica suspensões expiradas)
-        #        b. Calcula o tráfego total (upload + download)
-        #        c. Se tráfego > limite E ainda não está suspenso:
-        #           - Suspende o endpoint pelo tempo especificado
+        #        b. Se viola a política E ainda não está suspenso:
+        #           - Suspende o endpoint pelo tempo definido na política
         #           - Adiciona à lista de afetados
         #     3. Devolve lista dos endpoints que foram suspensos
 
+        now = time.time() if now is None else now
+
         # Lista de endpoints que foram afetados/suspensos nesta execução
         affected = []
 
-        # Cria uma lista só com endpoints
-        endpoints = [d for d in self.devices.values() if isinstance(d, Endpoint)]
-
-        # Percorre cada endpoint para verificar se viola o limite de tráfego
-        for ep in endpoints:
+        # list(): a suspensão altera os endpoints enquanto percorremos os candidatos
+        for ep in list(policy.candidates(self, now)):
             # Atualiza status antes de aplicar a regra
             # Isto verifica se alguma suspensão anterior já expirou
             ep.refresh_status()
 
-            # Calcula o total de tráfego deste endpoint
-            # Soma o tráfego enviado (upload) com o recebido (download)
-            total = ep.traffic_up_mb + ep.traffic_down_mb
-
-            # Se tráfego total > limite E endpoint ainda não está suspenso
-            if total > limit_mb and not ep.is_suspended():
+            if not ep.is_suspended() and policy.exceeded(ep, now):
                 # Suspende o endpoint pelo tempo especificado (em minutos)
-                ep.suspend_for_minutes(suspend_minutes)
-                
+                ep.suspend_for_minutes(policy.suspend_minutes)
+
                 # Adiciona à lista de endpoints afetados nesta execução
+                # e regista o motivo (ex: a regra que disparou)
                 affected.append(ep)
+                self.recent_suspensions.append((now, ep.name, policy.reason(ep)))
 
         # Devolve a lista dos endpoints suspensos nesta execução
-        return affected
\ No newline at end of file
+        return affected
+
+    def register_policy(self, policy):
+
+        # MÉTODO: register_policy()
+
+        # O QUE FAZ:
+        #     - Regista uma política permanente (ex: WindowLimitPolicy)
+        #     - A partir daqui, cada add_traffic avalia apenas o endpoint afetado
+        #       e suspende-o logo que exceda o limite (sem esperar por um varrimento)
+
+        if policy not in self._standing_policies:
+            self._standing_policies.append(policy)
+
+        # Políticas compiladas (RuleEnginePolicy) preparam já a tabela de limites
+        if hasattr(policy, "compile"):
+            policy.compile(self)
+
+    def unregister_policy(self, policy) -> bool:
+        if policy in self._standing_policies:
+            self._standing_policies.remove(policy)
+            return True
+        return False
+
+    @property
+    def standing_policies(self):
+        return list(self._standing_policies)
+
+    def _enforce(self, ep, now: float):
+
+        # MÉTODO: _enforce()
+
+        # O QUE FAZ:
+        #     - Avalia as políticas permanentes para um único endpoint
+        #     - Suspende-o com a primeira política violada e regista a suspensão
+        #     - Devolve a política que disparou (ou None)
+
+        ep.refresh_status()
+        if ep.is_suspended():
+            return None
+        for policy in self._standing_policies:
+            if policy.exceeded(ep, now):
+                ep.suspend_for_minutes(policy.suspend_minutes)
+                self.recent_suspensions.append((now, ep.name, policy.reason(ep)))
+                return policy
+        return None
+
+    def ingest_traffic(self, records, ts: float = None):
+
+        # MÉTODO: ingest_traffic()
+
+        # O QUE FAZ:
+        #     1. Recebe um iterável de registos (nome_endpoint, up_mb, down_mb)
+        #     2. Aplica cada registo com Endpoint.add_traffic
+        #     3. No fim, avalia as políticas permanentes uma única vez por endpoint tocado
+        #     4. Devolve um dicionário com "applied" (nº de registos aplicados),
+        #        "unknown" (nomes que não são endpoints) e "suspended" (endpoints suspensos)
+
+        ts = time.time() if ts is None else ts
+        applied = 0
+        unknown = []
+        self._bulk_touched = set()
+        try:
+            for name, up, down in records:
+                ep = self.get_endpoint(name)
+                if ep is None:
+                    unknown.append(name)
+                    continue
+                ep.add_traffic(up, down, ts)
+                applied += 1
+            touched = self._bulk_touched
+        finally:
+            self._bulk_touched = None
+
+        suspended = []
+        for name in touched:
+            ep = self.devices.get(name)
+            if ep is not None and self._enforce(ep, ts) is not None:
+                suspended.append(ep)
+
+        return {"applied": applied, "unknown": unknown, "suspended": suspended}
+
+    def attach_counters(self, counters):
+
+        # MÉTODO: attach_counters()
+
+        # O QUE FAZ:
+        #     - Passa os totais de tráfego dos endpoints para contadores partilhados
+        #       (SharedCounters), cada um no seu slot; os totais atuais são copiados
+        #     - Endpoints com slot acima da capacidade continuam com totais locais
+
+        self.detach_counters()
+        self._counters = counters
+        for name, slot in self._slots.items():
+            if slot < counters.capacity:
+                self.devices[name].bind_counters(counters, slot)
+
+    def detach_counters(self):
+        # Os endpoints voltam a guardar os totais localmente
+        if self._counters is not None:
+            for ep in self.iter_devices(device_type="ENDPOINT"):
+                ep.unbind_counters()
+            self._counters = None
+
+    def attach_history(self, store):
+        # Passa a gravar cada amostra de tráfego (add_traffic, ingestões em bloco,
+        # contadores partilhados) no histórico em disco; None desliga
+        self._history = store
+
+    def slot_map(self) -> dict:
+
+        # MÉTODO: slot_map()
+
+        # O QUE FAZ:
+        #     - Devolve { nome_ou_MAC: slot } para os workers de ingestão resolverem
+        #       os registos sem precisarem do inventário
+
+        mapping = {}
+        for name, slot in self._slots.items():
+            mapping[name] = slot
+            mac = self.devices[name].mac_address
+            if mac:
+                mapping[mac] = slot
+        return mapping
+
+    def absorb_counters(self, ts: float = None) -> dict:
+
+        # MÉTODO: absorb_counters()
+
+        # O QUE FAZ:
+        #     1. Lê o que os workers somaram nos contadores partilhados desde a última vez
+        #     2. Para cada endpoint com tráfego novo regista a amostra no histórico
+        #        (os totais já estão na memória partilhada, não são somados outra vez)
+        #     3. Avalia as políticas permanentes uma vez por endpoint, como ingest_traffic
+
+        if self._counters is None:
+            return {"applied": 0, "suspended": []}
+        ts = time.time() if ts is None else ts
+        applied = 0
+        self._bulk_touched = set()
+        try:
+            for slot, up, down in self._counters.poll():
+                name = self._slot_names.get(slot)
+                if name is not None:
+                    self.devices[name].record_traffic(up, down, ts)
+                    applied += 1
+            touched = self._bulk_touched
+        finally:
+            self._bulk_touched = None
+
+        suspended = []
+        for name in touched:
+            ep = self.devices.get(name)
+            if ep is not None and self._enforce(ep, ts) is not None:
+                suspended.append(ep)
+
+        return {"applied": applied, "suspended": suspended}
+
+    def endpoint_access_points(self) -> dict:
+
+        # MÉTODO: endpoint_access_points()
+
+        # O QUE FAZ:
+        #     - Devolve { nome_endpoint: AccessPoint que o serve }
+        #     - Percorre apenas as ligações dos APs (não todos os dispositivos × APs)
+
+        result = {}
+        for ap in self.iter_devices(device_type="AP"):
+            for name in ap.connected_endpoints:
+                result.setdefault(name, ap)
+        return result
+
+    def endpoints_with_traffic_since(self, since: float):
+
+        # MÉTODO: endpoints_with_traffic_since()
+
+        # O QUE FAZ:
+        #     - Gerador dos endpoints cuja última amostra de tráfego é >= since
+        #     - Usa o registo _last_traffic (atualizado em cada add_traffic),
+        #       por isso ignora endpoints parados sem os visitar
+
+        for name, ts in self._last_traffic.items():
+            if ts >= since:
+                yield self.devices[name]
+
+    @staticmethod
+    def device_fingerprint(device) -> str:
+
+        # MÉTODO: device_fingerprint()
+
+        # O QUE FAZ:
+        #     1. Converte o dispositivo para dicionário (to_dict)
+        #     2. Serializa em JSON canónico (chaves ordenadas, sem espaços)
+        #     3. Devolve o hash SHA-1 desse texto
+        #     Dois dispositivos com o mesmo conteúdo têm sempre a mesma impressão digital
+
+        canonical = json.dumps(device.to_dict(), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    def fingerprints(self) -> dict:
+
+        # MÉTODO: fingerprints()
+
+        # O QUE FAZ:
+        #     - Devolve um dicionário { nome: hash } com a impressão digital de cada dispositivo
+        #     - Serve de "base" para fusões futuras (guardar o estado no momento da leitura)
+
+        return {name: self.device_fingerprint(d) for name, d in self.devices.items()}
+
+    def diff(self, other) -> dict:
+
+        # MÉTODO: diff()
+
+        # O QUE FAZ:
+        #     1. Calcula a impressão digital de cada dispositivo nos dois inventários
+        #     2. Compara os dicionários de hashes numa única passagem (tempo linear)
+        #     3. Devolve o que é preciso mudar para passar deste inventário para o outro:
+        #        - "added": nomes que só existem no outro
+        #        - "removed": nomes que só existem neste
+        #        - "modified": nomes que existem nos dois mas com conteúdo diferente
+
+        # Aceita outro inventário ou um dicionário de hashes já calculado
+        theirs = other if isinstance(other, dict) else other.fingerprints()
+        ours = self.fingerprints()
+
+        added = {name for name in theirs if name not in ours}
+        removed = {name for name in ours if name not in theirs}
+        modified = {name for name, h in ours.items() if name in theirs and theirs[name] != h}
+
+        return {"added": added, "removed": removed, "modified": modified}
+
+    def _merge_address_conflicts(self, incoming: dict, removed: set, replaced: set) -> dict:
+
+        # MÉTODO: _merge_address_conflicts()
+
+        # O QUE FAZ:
+        #     - Simula o inventário depois da fusão: os nossos dispositivos que ficam
+        #       mais os que entram (incoming: { nome: dispositivo novo })
+        #     - Um endereço com dois donos rejeita os dispositivos novos envolvidos
+        #       (uma substituição rejeitada mantém a versão antiga, que volta a contar)
+        #     - Repete até não haver colisões; devolve { nome_rejeitado: motivo }
+
+        rejected = {}
+        kinds = (("mac_int", self._mac_index, "MAC"), ("ipv4_int", self._ipv4_index, "IPv4"),
+                 ("ipv6_int", self._ipv6_index, "IPv6"))
+        while True:
+            leaving = removed | (replaced - rejected.keys())
+            collisions = {}
+            for attr, index, label in kinds:
+                # Só os endereços que entram podem colidir: com um dos nossos que fica
+                # (consulta ao índice) ou com outro dispositivo que entra
+                claims = {}
+                for name, d in incoming.items():
+                    value = getattr(d, attr, None)
+                    if value is None or name in rejected:
+                        continue
+                    holder = index.get(value)
+                    if holder is not None and holder not in leaving:
+                        collisions[name] = f"{label} duplicado no inventário."
+                    claims.setdefault(value, []).append(name)
+                for names in claims.values():
+                    if len(names) > 1:
+                        for name in names:
+                            collisions[name] = f"{label} duplicado no inventário."
+            if not collisions:
+                return rejected
+            rejected.update(collisions)
+
+    def merge(self, other, base=None) -> dict:
+
+        # MÉTODO: merge()
+
+        # O QUE FAZ:
+        #     Fusão a três vias entre este inventário ("nosso"), outro inventário
+        #     ("deles", ex: um backup editado) e uma base comum (hashes do momento
+        #     em que ambos divergiram). Para cada nome:
+        #        - Se "nosso" e "deles" são iguais -> nada a fazer
+        #        - Se só "deles" mudou em relação à base -> aplica a alteração deles
+        #        - Se só "nosso" mudou -> mantém o nosso
+        #        - Se ambos mudaram de forma diferente -> conflito (mantém o nosso)
+        #     As alterações são aplicadas de forma incremental (remover, substituir,
+        #     adicionar) em vez de substituir o inventário inteiro, com cópias dos
+        #     dispositivos deles; os endereços são validados antes contra o resultado final.
+
+        # RETORNA:
+        #     Dicionário com listas "added", "removed", "modified" (nomes aplicados)
+        #     e "conflicts" (lista de pares (nome, motivo))
+
+        # A base pode ser um inventário, um dicionário de hashes ou None (sem base)
+        if base is None:
+            base = {}
+        elif not isinstance(base, dict):
+            base = base.fingerprints()
+
+        ours = self.fingerprints()
+        theirs = other.fingerprints()
+
+        to_remove = []
+        to_replace = []
+        to_add = []
+        conflicts = []
+
+        # Uma única passagem pela união dos nomes dos três lados
+        for name in ours.keys() | theirs.keys() | base.keys():
+            o = ours.get(name)
+            t = theirs.get(name)
+            b = base.get(name)
+
+            # Os dois lados já estão iguais (inclui "ambos removeram")
+            if o == t:
+                continue
+
+            # Só o outro lado mudou -> aplica a alteração deles
+            if o == b:
+                if t is None:
+                    to_remove.append(name)
+                elif o is None:
+                    to_add.append(name)
+                else:
+                    to_replace.append(name)
+
+            # Só o nosso lado mudou -> mantém o nosso
+            elif t == b:
+                continue
+
+            # Ambos mudaram de forma diferente -> conflito
+            else:
+                conflicts.append((name, "Alterado nos dois lados."))
+
+        # Cópias independentes dos dispositivos deles (o mesmo objeto não pode estar
+        # nos dois inventários: _owner e os eventos seriam partilhados)
+        from storage import device_from_dict
+        incoming = {name: device_from_dict(other.devices[name].to_dict()) for name in to_replace + to_add}
+
+        # Unicidade de MAC/IPv4/IPv6 validada contra o conjunto final, antes de mexer
+        # em nada (ex: dois dispositivos que trocam de IP não são um conflito)
+        rejected = self._merge_address_conflicts(incoming, set(to_remove), set(to_replace))
+        for name, reason in rejected.items():
+            conflicts.append((name, reason))
+            del incoming[name]
+
+        # Remoções e versões antigas primeiro, para libertar nomes/MACs/IPs; depois as novas
+        for name in to_remove:
+            self.remove_device(name)
+        modified = [name for name in to_replace if name in incoming]
+        added = [name for name in to_add if name in incoming]
+        for name in modified:
+            self.remove_device(name)
+        for name in modified + added:
+            self.add_device(incoming[name])
+
+        return {"added": added, "removed": to_remove, "modified": modified, "conflicts": conflicts}
@@ -30,6 +30,12 @@ from utils import input_int, input_float, pause
 # Importa funções para persistência de dados em formato JSON
 from storage import save_to_json, load_from_json
 
+# Importa a exportação em streaming (ficheiros grandes sem carregar tudo em memória)
+from exports import write_export
+
+# Importa as políticas de tráfego (limite acumulado e janela deslizante)
+from policies import CumulativeLimitPolicy, WindowLimitPolicy
+
 # ======================== CONSTANTES ========================
 # Nome do ficheiro de base de dados onde o inventário é persistido
 FILE_DB = "inventario.json"
@@ -114,6 +120,7 @@ def submenu_trafego():
 # RETORNA: Nenhum (apenas imprime no ecrã)
 # O QUE FAZ:
 #   - Mostra opções para guardar e carregar dados em ficheiro JSON
+#   - E para exportar o inventário noutros formatos
 #   - Permite persistência do inventário entre sessões do programa
 # UTILIZAÇÃO: Chamada quando o utilizador escolhe a opção 4 no menu principal
 # --------------------------------------------------
@@ -121,6 +128,7 @@ def submenu_dados():
     print("\n[ Dados ]")
     print("1 - Guardar dados")
     print("2 - Carregar dados")
+    print("3 - Exportar dados (JSON, NDJSON, CSV, Excel, TXT)")
     print("0 - Voltar")
 
 # ======================== FUNÇÃO PRINCIPAL ========================
@@ -218,7 +226,7 @@ def main():
             while True:
                 # Mostra o submenu de dados
                 submenu_dados()
-                op = input_int("Opção: ", 0, 2)
+                op = input_int("Opção: ", 0, 3)
 
                 if op == 0:
                     break  # Volta ao menu principal
@@ -228,6 +236,9 @@ def main():
                 elif op == 2:
                     do_load(inv)  # Função para carregar inventário do ficheiro JSON
                     pause()
+                elif op == 3:
+                    do_export(inv)  # Função para exportar o inventário (em streaming)
+                    pause()
 
 # --------------------------------------------------
 # Funções de lógica
@@ -289,7 +300,7 @@ def remove_device(inv: NetworkInventory):
 def list_devices(inv: NetworkInventory):
     # Função para ir buscar todos os dispositivos criados até agora
     print("\n--- Lista de dispositivos ---")
-    for d in inv.list_devices():
+    for d in inv.iter_devices():
         print(d)
 
 def search_ipv4(inv: NetworkInventory):
@@ -482,16 +493,13 @@ def remove_device(inv: NetworkInventory):
 # --------------------------------------------------
 def list_devices(inv: NetworkInventory):
     print("\n--- Lista de dispositivos ---")
-    # Obtém todos os dispositivos do inventário
-    devices = inv.list_devices()
-
     # Verifica se existem dispositivos
-    if not devices:
+    if len(inv) == 0:
         print("(vazio)")
         return
 
-    # Imprime cada dispositivo
-    for d in devices:
+    # Imprime cada dispositivo (o gerador evita copiar o inventário para uma lista)
+    for d in inv.iter_devices():
         print(d)
 
 # ======================== FUNÇÕES DE LÓGICA - CONSULTAS/PESQUISAS ========================
@@ -654,29 +662,45 @@ def top_consumers(inv: NetworkInventory):
 # PARÂMETROS: inv (NetworkInventory) - instância do inventário
 # RETORNA: Nenhum (modifica endpoints e imprime resultados)
 # O QUE FAZ:
-#   1. Solicita o limite máximo permitido (em MB, upload + download)
-#   2. Solicita a duração da suspensão em minutos
+#   1. Solicita o tipo de política (total acumulado ou janela deslizante)
+#   2. Solicita o limite máximo permitido (em MB, upload + download),
+#      a janela em minutos (só na janela deslizante) e a duração da suspensão
 #   3. Aplica a política a todos os endpoints que excedem o limite
 #   4. Suspende os endpoints afetados pelo tempo especificado
 #   5. Exibe os endpoints suspensos e até quando
 # FUNCIONAMENTO:
-#   - Endpoints com tráfego total > limite serão suspensos
+#   - Acumulado: endpoints com tráfego total > limite serão suspensos
+#   - Janela: endpoints com mais do que o limite nos últimos N minutos serão suspensos
 #   - Suspensão dura o número de minutos especificado
+#   - Opcionalmente fica registada como permanente (avaliada a cada add_traffic)
 # --------------------------------------------------
 def apply_policy(inv: NetworkInventory):
     print("\n--- Política de tráfego ---")
+    print("Tipos: 1-Total acumulado  2-Janela deslizante (últimos N minutos)")
+
+    # Escolhe o tipo de política
+    kind = input_int("Escolha o tipo: ", 1, 2)
 
     # Solicita o limite máximo permitido (soma de upload + download)
-    limit = input_float("Limite total (up+down) em MB: ", 0)
+    limit = input_float("Limite (up+down) em MB: ", 0)
+
+    # Na janela deslizante, o limite aplica-se apenas aos últimos N minutos
+    window = input_int("Janela em minutos: ", 1, 43200) if kind == 2 else None
 
     # Solicita o tempo de suspensão (entre 1 e 100000 minutos)
     minutes = input_int("Suspender por quantos minutos? ", 1, 100000)
 
     # Aplica a política e obtém a lista de endpoints afetados
-    affected = inv.apply_traffic_policy(
-        limit_mb=limit,
-        suspend_minutes=minutes
-    )
+    if kind == 1:
+        policy = CumulativeLimitPolicy(limit_mb=limit, suspend_minutes=minutes)
+    else:
+        policy = WindowLimitPolicy(limit_mb=limit, window_minutes=window, suspend_minutes=minutes)
+    affected = inv.apply_policy(policy)
+
+    # Política permanente: passa a ser avaliada em cada atualização de tráfego
+    if input("Manter como política permanente? (s/N): ").strip().lower() == "s":
+        inv.register_policy(policy)
+        print("Política registada: " + policy.describe())
 
     # Exibe os resultados
     if not affected:
@@ -743,6 +767,34 @@ def do_load(inv: NetworkInventory):
         # Trata qualquer outro erro que possa ocorrer na leitura
         print(f"Erro a carregar: {e}")
 
+# --------------------------------------------------
+# FUNÇÃO: do_export()
+# --------------------------------------------------
+# PROPÓSITO: Exportar o inventário para um ficheiro noutro formato
+# PARÂMETROS: inv (NetworkInventory) - instância do inventário a exportar
+# RETORNA: Nenhum (escreve o ficheiro e imprime confirmação)
+# O QUE FAZ:
+#   1. Pede o formato (json, ndjson, csv, excel, txt) e o nome do ficheiro
+#   2. Escreve o ficheiro em streaming (exports.write_export), dispositivo a
+#      dispositivo, sem construir o ficheiro inteiro em memória
+#   3. Imprime confirmação de sucesso ou erro
+# --------------------------------------------------
+def do_export(inv: NetworkInventory):
+    extensoes = {"json": "json", "ndjson": "ndjson", "csv": "csv", "excel": "xlsx", "txt": "txt"}
+    fmt = input("Formato (json/ndjson/csv/excel/txt): ").strip().lower()
+    if fmt not in extensoes:
+        print("Formato inválido.")
+        return
+
+    default = f"inventario.{extensoes[fmt]}"
+    path = input(f"Ficheiro [{default}]: ").strip() or default
+    try:
+        write_export(inv, fmt, path)
+        print(f"Inventário exportado para {path}")
+    except Exception as e:
+        # Trata qualquer erro que possa ocorrer na escrita
+        print(f"Erro a exportar: {e}")
+
 
 # --------------------------------------------------
 # Entrada do programa
@@ -762,7 +814,7 @@ def main():
     while True:
         menu_categorias()
         # Lê a opção do utilizador
-        op = input_int("Opção: ", 0, 11)
+        op = input_int("Opção: ", 0, 12)
 
         if op == 0:
             print("A sair...")
@@ -800,6 +852,9 @@ def main():
         elif op == 11:
             do_load(inv)
             pause()
+        elif op == 12:
+            do_export(inv)
+            pause()
 
 # Ponto de entrada do programa
 if __name__ == "__main__":
@@ -0,0 +1,283 @@
+# MÓDULO: perf.py
+# PROPÓSITO: Camada leve de medição de tempos (secções e chamadas de métodos)
+
+# DESCRIÇÃO:
+    # Mede, sem profiler externo, onde é gasto o tempo de cada execução ("run"):
+    #   - Secções: blocos de código medidos com section() (with) ou mark() (marcos
+    #     sequenciais: cada mark fecha a secção anterior e abre a seguinte)
+    #   - Chamadas: instrument(classe) envolve os métodos públicos da classe e conta
+    #     as chamadas e o tempo de cada um (total e na run atual)
+    #   - Histórico: as últimas N runs ficam num deque, com P50/P95/máximo por secção
+    # Funciona em qualquer programa (app_web.py, daemons, scripts); cada thread tem a
+    # sua run atual (threading.local), os totais são partilhados e protegidos por lock.
+    # A troca dos métodos é global ao processo (a classe é uma só), por isso vários
+    # recorders podem instrumentar a mesma classe: os métodos originais só são
+    # repostos quando o último a larga (contagem de referências). Cada chamada conta
+    # apenas para o recorder com uma run ativa na thread que a fez, por isso recorders
+    # diferentes (ex: uma sessão do app_web.py cada) não veem os tempos uns dos outros.
+
+# EXEMPLO DE USO:
+    # rec = PerfRecorder()
+    # rec.instrument(NetworkInventory)
+    # rec.start_run()
+    # with rec.section("carregar"):
+    #     inv = load_from_json("inventario.json")
+    # rec.end_run()
+    # print(rec.report())
+
+import inspect
+import math
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Classes instrumentadas no processo: { classe: [nº de recorders, { nome: função original }] }
+_instrumented = {}
+_instrumented_lock = threading.Lock()
+
+# Recorder com uma run ativa em cada thread (é ele que recebe as chamadas medidas)
+_active = threading.local()
+
+
+def percentile(values, pct: float) -> float:
+    # Percentil por ordem (nearest-rank) de uma sequência não vazia
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def deactivate():
+    # Descarta a run ativa nesta thread, se houver (ex: uma run interrompida antes
+    # de end_run, para que as chamadas seguintes da thread não lhe sejam atribuídas)
+    recorder = getattr(_active, "recorder", None)
+    if recorder is not None:
+        recorder._local.start = None
+        _active.recorder = None
+
+
+def _timed(func, label: str):
+    clock = time.perf_counter
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        recorder = getattr(_active, "recorder", None)
+        if recorder is None:
+            return func(*args, **kwargs)
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            recorder.record_call(label, clock() - start)
+    return wrapper
+
+
+def _acquire(cls, names):
+    # Mais um recorder a usar a classe; os métodos só são trocados pelo primeiro
+    with _instrumented_lock:
+        entry = _instrumented.get(cls)
+        if entry is not None:
+            entry[0] += 1
+            return
+        if names is None:
+            # Só funções normais (métodos de instância): staticmethod/classmethod/property ficam
+            names = [n for n, v in vars(cls).items() if not n.startswith("_") and inspect.isfunction(v)]
+        originals = {}
+        for name in names:
+            original = vars(cls)[name]
+            setattr(cls, name, _timed(original, f"{cls.__name__}.{name}"))
+            originals[name] = original
+        _instrumented[cls] = [1, originals]
+
+
+def _release(cls):
+    # Menos um recorder a usar a classe; o último repõe os métodos originais
+    with _instrumented_lock:
+        entry = _instrumented.get(cls)
+        if entry is None:
+            return
+        entry[0] -= 1
+        if entry[0] == 0:
+            for name, original in _instrumented.pop(cls)[1].items():
+                setattr(cls, name, original)
+
+
+class PerfRecorder:
+    def __init__(self, history: int = 100):
+        if history <= 0:
+            raise ValueError("history tem de ser > 0.")
+        self.history = history
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        # { secção: deque das durações nas últimas runs }
+        self._sections = {}
+        # { método: [chamadas, segundos] } desde o início (ou reset)
+        self._calls = {}
+        # Runs completas: { "total": s, "sections": {...}, "calls": {...} }
+        self.runs = deque(maxlen=history)
+        # Classes que este recorder instrumentou: { classe: weakref.finalize }
+        # (se o recorder for descartado sem uninstrument, a referência é largada na mesma)
+        self._held = {}
+
+    # ------------------------------------------------------------------
+    # Runs e secções
+    # ------------------------------------------------------------------
+
+    def start_run(self):
+        # Começa uma run nesta thread (descarta uma run anterior que não terminou, deste
+        # ou de outro recorder) e passa a receber as chamadas medidas da thread
+        deactivate()
+        local = self._local
+        local.start = time.perf_counter()
+        local.sections = {}
+        local.calls = {}
+        local.open = None
+        _active.recorder = self
+
+    def _running(self) -> bool:
+        return getattr(self._local, "start", None) is not None
+
+    def record(self, name: str, seconds: float):
+        # Soma a duração à secção na run atual (ou diretamente ao histórico, fora de runs)
+        if self._running():
+            sections = self._local.sections
+            sections[name] = sections.get(name, 0.0) + seconds
+        else:
+            self._push(name, seconds)
+
+    def _push(self, name: str, seconds: float):
+        with self._lock:
+            self._sections.setdefault(name, deque(maxlen=self.history)).append(seconds)
+
+    @contextmanager
+    def section(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark(self, name: str):
+
+        # MÉTODO: mark()
+
+        # O QUE FAZ:
+        #     - Fecha a secção aberta por um mark anterior e abre "name"
+        #     - Útil para medir blocos seguidos sem reindentar o código (ex: separadores)
+
+        now = time.perf_counter()
+        self._close_mark(now)
+        self._local.open = (name, now)
+
+    def _close_mark(self, now: float):
+        opened = getattr(self._local, "open", None)
+        if opened is not None:
+            self.record(opened[0], now - opened[1])
+            self._local.open = None
+
+    def end_run(self) -> dict:
+
+        # MÉTODO: end_run()
+
+        # O QUE FAZ:
+        #     - Fecha a secção aberta, junta as durações da run ao histórico e
+        #       devolve a run { "total", "sections", "calls" } (None se não havia run)
+
+        if not self._running():
+            return None
+        now = time.perf_counter()
+        self._close_mark(now)
+        local = self._local
+        run = {"total": now - local.start, "sections": dict(local.sections), "calls": dict(local.calls)}
+        local.start = None
+        if getattr(_active, "recorder", None) is self:
+            _active.recorder = None
+        for name, seconds in run["sections"].items():
+            self._push(name, seconds)
+        self._push("total", run["total"])
+        with self._lock:
+            self.runs.append(run)
+        return run
+
+    # ------------------------------------------------------------------
+    # Chamadas de métodos
+    # ------------------------------------------------------------------
+
+    def record_call(self, name: str, seconds: float):
+        with self._lock:
+            acc = self._calls.get(name)
+            if acc is None:
+                self._calls[name] = [1, seconds]
+            else:
+                acc[0] += 1
+                acc[1] += seconds
+        if self._running():
+            calls = self._local.calls
+            acc = calls.get(name)
+            calls[name] = (1, seconds) if acc is None else (acc[0] + 1, acc[1] + seconds)
+
+    def instrument(self, cls, names=None):
+
+        # MÉTODO: instrument()
+
+        # O QUE FAZ:
+        #     - Substitui os métodos públicos da classe (ou os indicados) por versões
+        #       que medem cada chamada; chamadas aninhadas contam em ambos os métodos
+        #     - Se outro recorder já instrumentou a classe, partilha a mesma troca
+        #       (e os métodos escolhidos por ele); conta só as chamadas das suas runs
+        #     - Não faz nada se a classe já estiver instrumentada por este recorder
+
+        if cls in self._held:
+            return
+        _acquire(cls, names)
+        self._held[cls] = weakref.finalize(self, _release, cls)
+
+    def uninstrument(self, cls=None):
+        # Larga a instrumentação (de uma classe ou de todas); os métodos originais
+        # só são repostos quando nenhum outro recorder a estiver a usar
+        for c in ([cls] if cls is not None else list(self._held)):
+            release = self._held.pop(c, None)
+            if release is not None:
+                release()
+
+    @property
+    def instrumented(self) -> bool:
+        return bool(self._held)
+
+    # ------------------------------------------------------------------
+    # Resumos
+    # ------------------------------------------------------------------
+
+    def summary(self) -> list:
+        # [(secção, nº de runs, última, P50, P95, máximo)] em segundos, pela ordem de registo
+        with self._lock:
+            items = [(name, list(values)) for name, values in self._sections.items()]
+        return [(name, len(v), v[-1], percentile(v, 50), percentile(v, 95), max(v)) for name, v in items if v]
+
+    def call_summary(self) -> list:
+        # [(método, chamadas na última run, tempo na última run, chamadas totais, tempo total)]
+        with self._lock:
+            totals = {name: tuple(acc) for name, acc in self._calls.items()}
+            last = self.runs[-1]["calls"] if self.runs else {}
+        rows = [(name, *last.get(name, (0, 0.0)), count, seconds) for name, (count, seconds) in totals.items()]
+        rows.sort(key=lambda r: -r[4])
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._sections.clear()
+            self._calls.clear()
+            self.runs.clear()
+
+    def report(self) -> str:
+        # Texto com as secções e os métodos mais pesados (ex: para registar num log)
+        lines = [f"{'secção':<32}{'runs':>6}{'última':>10}{'P50':>10}{'P95':>10}{'máx':>10}"]
+        for name, n, last, p50, p95, worst in self.summary():
+            lines.append(f"{name:<32}{n:>6}{last * 1000:>8.1f}ms{p50 * 1000:>8.1f}ms"
+                         f"{p95 * 1000:>8.1f}ms{worst * 1000:>8.1f}ms")
+        for name, _, _, count, seconds in self.call_summary()[:15]:
+            lines.append(f"{name:<44}{count:>8} chamadas {seconds * 1000:>10.1f}ms")
+        return "\n".join(lines)
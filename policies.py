@@ -0,0 +1,226 @@
+# MÓDULO: policies.py
+# PROPÓSITO: Políticas de limite de tráfego aplicadas aos Endpoints
+
+# DESCRIÇÃO:
+    # Cada política decide se um endpoint excedeu o seu limite e por quantos
+    # minutos deve ser suspenso. O NetworkInventory aplica-as (apply_policy).
+    #   - CumulativeLimitPolicy: total acumulado (up + down) acima de limit_mb
+    #     (comportamento original de apply_traffic_policy)
+    #   - WindowLimitPolicy: mais de limit_mb nos últimos window_minutes minutos,
+    #     calculado sobre o histórico do endpoint (TrafficSeries)
+    #   - RuleEnginePolicy: limites por user_id, SSID do AP e modelo, com isenções,
+    #     compilados numa tabela por endpoint
+
+# INTERFACE COMUM:
+    # - suspend_minutes: duração da suspensão
+    # - exceeded(endpoint, now): True se o endpoint viola a política
+    # - candidates(inventory, now): endpoints que vale a pena avaliar
+    #   (a política de janela só olha para quem teve tráfego dentro da janela)
+    # - reason(endpoint): porque é que o endpoint foi suspenso (ex: regra que disparou)
+    # - describe(): texto curto para mostrar ao utilizador
+
+import time
+
+
+class CumulativeLimitPolicy:
+    def __init__(self, limit_mb: float, suspend_minutes: int):
+        if limit_mb < 0:
+            raise ValueError("limit_mb não pode ser negativo.")
+        if suspend_minutes <= 0:
+            raise ValueError("suspend_minutes tem de ser > 0.")
+        self.limit_mb = limit_mb
+        self.suspend_minutes = suspend_minutes
+
+    def exceeded(self, endpoint, now: float = None) -> bool:
+        return endpoint.traffic_up_mb + endpoint.traffic_down_mb > self.limit_mb
+
+    def candidates(self, inventory, now: float = None):
+        # O total acumulado pode exceder o limite em qualquer endpoint
+        return inventory.iter_devices(device_type="ENDPOINT")
+
+    def reason(self, endpoint) -> str:
+        return self.describe()
+
+    def describe(self) -> str:
+        return f"Total acumulado > {self.limit_mb} MB"
+
+
+class WindowLimitPolicy:
+    def __init__(self, limit_mb: float, window_minutes: int, suspend_minutes: int):
+        if limit_mb < 0:
+            raise ValueError("limit_mb não pode ser negativo.")
+        if window_minutes <= 0:
+            raise ValueError("window_minutes tem de ser > 0.")
+        if suspend_minutes <= 0:
+            raise ValueError("suspend_minutes tem de ser > 0.")
+        self.limit_mb = limit_mb
+        self.window_minutes = window_minutes
+        self.suspend_minutes = suspend_minutes
+
+    def exceeded(self, endpoint, now: float = None) -> bool:
+        series = endpoint.traffic_series
+        if series is None:
+            return False
+        up, down = series.window_totals(self.window_minutes * 60, now)
+        return up + down > self.limit_mb
+
+    def candidates(self, inventory, now: float = None):
+        # Só os endpoints com tráfego recente podem ter excedido a janela
+        now = time.time() if now is None else now
+        return inventory.endpoints_with_traffic_since(now - self.window_minutes * 60)
+
+    def reason(self, endpoint) -> str:
+        return self.describe()
+
+    def describe(self) -> str:
+        return f"Mais de {self.limit_mb} MB nos últimos {self.window_minutes} min"
+
+
+# --------------------------------------------------
+# Motor de regras por escalões (compilado)
+# --------------------------------------------------
+# Cada regra associa um limite (ou uma isenção) a um conjunto de endpoints,
+# escolhidos por user_id, pelo SSID do AccessPoint que os serve e/ou pelo modelo.
+# A primeira regra que corresponde ao endpoint ganha (como numa firewall):
+# por isso as isenções e as regras mais específicas devem vir primeiro.
+# As regras são "compiladas" numa tabela { endpoint: (limite, regra) }, que só é
+# recalculada quando as regras ou a topologia do inventário mudam; a avaliação
+# é depois uma única passagem pela tabela, seja qual for o número de regras.
+
+class PolicyRule:
+    def __init__(self, name: str, limit_mb: float = None, user_id: str = None, ssid: str = None,
+                 model: str = None, exempt: bool = False):
+        name = (name or "").strip()
+        if not name:
+            raise ValueError("A regra tem de ter um nome.")
+        if not exempt and (limit_mb is None or limit_mb < 0):
+            raise ValueError("Uma regra sem isenção precisa de um limite >= 0.")
+        self.name = name
+        self.limit_mb = None if exempt else limit_mb
+        # Critérios vazios ("" ou None) não restringem
+        self.user_id = (user_id or "").strip() or None
+        self.ssid = (ssid or "").strip() or None
+        self.model = (model or "").strip() or None
+        self.exempt = exempt
+
+    def matches(self, endpoint, ssid: str = None) -> bool:
+        if self.user_id is not None and endpoint.user_id != self.user_id:
+            return False
+        if self.model is not None and endpoint.model != self.model:
+            return False
+        if self.ssid is not None and ssid != self.ssid:
+            return False
+        return True
+
+    def describe(self) -> str:
+        crit = []
+        if self.user_id is not None:
+            crit.append(f"user_id={self.user_id}")
+        if self.ssid is not None:
+            crit.append(f"ssid={self.ssid}")
+        if self.model is not None:
+            crit.append(f"modelo={self.model}")
+        alvo = ", ".join(crit) if crit else "todos"
+        acao = "isento" if self.exempt else f"limite {self.limit_mb} MB"
+        return f"{self.name} ({alvo}: {acao})"
+
+
+class RuleEnginePolicy:
+    def __init__(self, suspend_minutes: int, default_limit_mb: float = None, window_minutes: int = None):
+        if suspend_minutes <= 0:
+            raise ValueError("suspend_minutes tem de ser > 0.")
+        if window_minutes is not None and window_minutes <= 0:
+            raise ValueError("window_minutes tem de ser > 0.")
+        self.suspend_minutes = suspend_minutes
+        # Limite para quem não corresponde a nenhuma regra (None = sem limite)
+        self.default_limit_mb = default_limit_mb
+        # None: compara o total acumulado; N: compara o tráfego dos últimos N minutos
+        self.window_minutes = window_minutes
+        self.rules = []
+        self._rules_version = 0
+
+        # Tabela compilada e a "versão" (regras, topologia) para a qual é válida
+        self._inventory = None
+        self._compiled_key = None
+        self._thresholds = {}
+
+    def add_rule(self, rule: PolicyRule):
+        self.rules.append(rule)
+        self._rules_version += 1
+
+    def remove_rule(self, index: int):
+        del self.rules[index]
+        self._rules_version += 1
+
+    def set_default_limit(self, limit_mb: float = None):
+        self.default_limit_mb = limit_mb
+        self._rules_version += 1
+
+    def compile(self, inventory) -> dict:
+
+        # MÉTODO: compile()
+
+        # O QUE FAZ:
+        #     1. Se as regras e a topologia não mudaram desde a última vez, reaproveita a tabela
+        #     2. Caso contrário, calcula o SSID de cada endpoint (AP que o serve)
+        #     3. Para cada endpoint escolhe a primeira regra que corresponde
+        #        (ou o limite por omissão) e guarda { nome: (limite, regra) }
+        #     4. Endpoints isentos ou sem limite ficam fora da tabela
+
+        key = (id(inventory), self._rules_version, inventory.topology_version)
+        if key == self._compiled_key:
+            return self._thresholds
+
+        ssid_of = {name: ap.ssid for name, ap in inventory.endpoint_access_points().items()}
+
+        thresholds = {}
+        for ep in inventory.iter_devices(device_type="ENDPOINT"):
+            ssid = ssid_of.get(ep.name)
+            rule = next((r for r in self.rules if r.matches(ep, ssid)), None)
+            if rule is None:
+                if self.default_limit_mb is not None:
+                    thresholds[ep.name] = (self.default_limit_mb, None)
+            elif not rule.exempt:
+                thresholds[ep.name] = (rule.limit_mb, rule)
+
+        self._inventory = inventory
+        self._compiled_key = key
+        self._thresholds = thresholds
+        return thresholds
+
+    def _usage(self, endpoint, now: float = None) -> float:
+        if self.window_minutes is None:
+            return endpoint.traffic_up_mb + endpoint.traffic_down_mb
+        series = endpoint.traffic_series
+        if series is None:
+            return 0.0
+        up, down = series.window_totals(self.window_minutes * 60, now)
+        return up + down
+
+    def exceeded(self, endpoint, now: float = None) -> bool:
+        # Usa a tabela compilada para o inventário do endpoint (recompila se mudou)
+        if self._inventory is not None:
+            self.compile(self._inventory)
+        entry = self._thresholds.get(endpoint.name)
+        return entry is not None and self._usage(endpoint, now) > entry[0]
+
+    def candidates(self, inventory, now: float = None):
+        # Só os endpoints com limite na tabela compilada (isentos ficam de fora)
+        thresholds = self.compile(inventory)
+        return [inventory.devices[name] for name in thresholds]
+
+    def fired_rule(self, endpoint):
+        # Regra responsável pelo limite do endpoint (None = limite por omissão)
+        entry = self._thresholds.get(endpoint.name)
+        return entry[1] if entry else None
+
+    def reason(self, endpoint) -> str:
+        entry = self._thresholds.get(endpoint.name)
+        if entry is None:
+            return self.describe()
+        rule = entry[1]
+        return rule.describe() if rule is not None else f"Limite por omissão ({entry[0]} MB)"
+
+    def describe(self) -> str:
+        base = "total acumulado" if self.window_minutes is None else f"últimos {self.window_minutes} min"
+        return f"Regras por escalão ({len(self.rules)} regras, {base})"
@@ -0,0 +1,217 @@
+# MÓDULO: reconciler.py
+# PROPÓSITO: Confrontar as tabelas de vizinhos (ARP) do Linux com o inventário
+
+# DESCRIÇÃO:
+    # Verifica se os pares MAC/IPv4 registados no inventário correspondem ao que
+    # a rede está realmente a ver. Aceita dois formatos (ficheiros locais ou o sistema):
+    #   - /proc/net/arp
+    #   - saída de "ip neigh" (ex: ip neigh show > vizinhos.txt)
+    # Cada entrada da tabela (IPv4 -> MAC) é cruzada com os índices de MAC e IPv4
+    # do inventário (address_owners): uma única passagem com consultas a dicionários.
+
+# RESULTADOS:
+    #   - unknown_mac: MAC que não pertence a nenhum dispositivo do inventário
+    #   - ip_conflict: o IPv4 está registado num dispositivo mas é usado por outro MAC
+    #     (ou o mesmo IPv4 aparece com MACs diferentes em várias tabelas)
+    #   - mismatch: MAC conhecido, mas o inventário regista outro IPv4 para esse dispositivo
+    #   - stale: par correto, mas o vizinho está STALE/FAILED/INCOMPLETE (não confirmado)
+
+# INCREMENTAL:
+    # O Reconciler guarda a tabela anterior e os resultados por entrada. Em cada
+    # execução só reavalia as entradas novas ou alteradas e descarta as que
+    # desapareceram; se o inventário mudou (topology_version ou
+    # address_version: dispositivos, ligações ou endereços) reavalia tudo.
+
+# EXECUÇÃO:
+    # python reconciler.py --file inventario.json [tabelas...]   (sem tabelas lê /proc/net/arp)
+
+import argparse
+
+from storage import load_from_json
+from utils import validate_ipv4s, validate_macs, int_to_ipv4, int_to_mac
+
+PROC_NET_ARP = "/proc/net/arp"
+
+# Estados do "ip neigh" em que o par IP/MAC não está confirmado
+STALE_STATES = {"STALE", "FAILED", "INCOMPLETE", "PROBE", "DELAY"}
+
+# Flag ATF_COM do /proc/net/arp: entrada completa
+_ATF_COM = 0x2
+
+FINDING_KINDS = ("unknown_mac", "ip_conflict", "mismatch", "stale")
+
+
+def _entries(raw: list) -> list:
+    # [(ip, mac, estado)] em texto -> [(ipv4_int, mac_int, estado)], só IPv4 com MAC válido.
+    # Valida e converte as colunas de uma vez (utils.validate_*), cada valor distinto uma vez
+    if not raw:
+        return []
+    ips, macs, states = zip(*raw)
+    ip_ok, ip_ints = validate_ipv4s(ips)
+    mac_ok, mac_ints = validate_macs(macs)
+    return [(ip, mac, state) for ok_i, ip, ok_m, mac, state in zip(ip_ok, ip_ints, mac_ok, mac_ints, states)
+            if ok_i and ok_m and mac != 0]
+
+
+def parse_proc_arp(text: str) -> list:
+
+    # FUNÇÃO: parse_proc_arp()
+
+    # O QUE FAZ:
+    #     - Interpreta /proc/net/arp ("IP address  HW type  Flags  HW address  Mask  Device")
+    #     - Devolve [(ipv4_int, mac_int, estado)], com estado REACHABLE ou INCOMPLETE
+
+    raw = []
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        try:
+            flags = int(fields[2], 16)
+        except ValueError:
+            continue
+        raw.append((fields[0], fields[3], "REACHABLE" if flags & _ATF_COM else "INCOMPLETE"))
+    return _entries(raw)
+
+
+def parse_ip_neigh(text: str) -> list:
+
+    # FUNÇÃO: parse_ip_neigh()
+
+    # O QUE FAZ:
+    #     - Interpreta linhas "10.0.0.1 dev eth0 lladdr aa:bb:cc:dd:ee:ff REACHABLE"
+    #     - Ignora IPv6 e entradas sem lladdr; o estado é a última palavra da linha
+
+    raw = []
+    for line in text.splitlines():
+        fields = line.split()
+        if "lladdr" not in fields:
+            continue
+        i = fields.index("lladdr")
+        if i + 1 >= len(fields):
+            continue
+        raw.append((fields[0], fields[i + 1], fields[-1].upper()))
+    return _entries(raw)
+
+
+def read_neighbor_table(path: str) -> list:
+    # Deteta o formato pelo cabeçalho do /proc/net/arp
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if text.startswith("IP address"):
+        return parse_proc_arp(text)
+    return parse_ip_neigh(text)
+
+
+class Reconciler:
+    def __init__(self, inventory):
+        self.inventory = inventory
+        self._table = {}        # { ipv4_int: (mac_int, estado) } da última execução
+        self._findings = {}     # { ipv4_int: (tipo, detalhe) } só para entradas com problemas
+        self._conflicts = {}    # { ipv4_int: {mac_int, ...} } IPs com vários MACs nas tabelas
+        self._inv_version = None
+
+    def _evaluate(self, ip: int, mac: int, state: str):
+
+        # MÉTODO: _evaluate()
+
+        # O QUE FAZ:
+        #     - Classifica uma entrada da tabela (tipo, detalhe) ou None se estiver correta
+
+        mac_owner, ip_owner = self.inventory.address_owners(mac, ip)
+        base = {"ip": int_to_ipv4(ip), "mac": int_to_mac(mac), "state": state, "device": mac_owner}
+        if ip in self._conflicts:
+            base["macs"] = sorted(int_to_mac(m) for m in self._conflicts[ip])
+            return "ip_conflict", base
+        if ip_owner is not None and ip_owner != mac_owner:
+            base["ip_owner"] = ip_owner
+            return "ip_conflict", base
+        if mac_owner is None:
+            return "unknown_mac", base
+        if ip_owner is None:
+            device = self.inventory.devices[mac_owner]
+            base["inventory_ipv4"] = getattr(device, "ipv4", "")
+            return "mismatch", base
+        if state in STALE_STATES:
+            return "stale", base
+        return None
+
+    def reconcile(self, entries) -> dict:
+
+        # MÉTODO: reconcile()
+
+        # O QUE FAZ:
+        #     1. Junta as entradas numa tabela { IPv4: (MAC, estado) } (IPs com vários MACs = conflito)
+        #     2. Compara com a tabela anterior: novas/alteradas são reavaliadas, removidas descartadas
+        #        (se o inventário mudou desde a última execução reavalia todas)
+        #     3. Devolve { tipo: [detalhes...] } com os problemas atuais e as contagens
+        #        "checked" (entradas reavaliadas), "removed" e "total"
+
+        table = {}
+        conflicts = {}
+        for ip, mac, state in entries:
+            previous = table.get(ip)
+            if previous is not None and previous[0] != mac:
+                conflicts.setdefault(ip, {previous[0]}).add(mac)
+            table[ip] = (mac, state)
+
+        inv_version = (self.inventory.topology_version, self.inventory.address_version)
+        full = self._inv_version != inv_version
+        old = {} if full else self._table
+        if full:
+            self._findings = {}
+        # IPs cujo estado de conflito mudou também têm de ser reavaliados
+        conflict_changed = set(conflicts) ^ set(self._conflicts)
+        self._conflicts = conflicts
+
+        removed = [ip for ip in old if ip not in table]
+        for ip in removed:
+            self._findings.pop(ip, None)
+
+        checked = 0
+        for ip, value in table.items():
+            if old.get(ip) == value and ip not in conflict_changed:
+                continue
+            checked += 1
+            finding = self._evaluate(ip, *value)
+            if finding is None:
+                self._findings.pop(ip, None)
+            else:
+                self._findings[ip] = finding
+
+        self._table = table
+        self._inv_version = inv_version
+
+        report = {kind: [] for kind in FINDING_KINDS}
+        for ip in sorted(self._findings):
+            kind, detail = self._findings[ip]
+            report[kind].append(detail)
+        report.update(checked=checked, removed=len(removed), total=len(table))
+        return report
+
+    def reconcile_files(self, paths=(PROC_NET_ARP,)) -> dict:
+        entries = []
+        for path in paths:
+            entries.extend(read_neighbor_table(path))
+        return self.reconcile(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confronta tabelas ARP/vizinhos com o inventário.")
+    parser.add_argument("paths", nargs="*", default=[PROC_NET_ARP], help="/proc/net/arp ou saídas de 'ip neigh'")
+    parser.add_argument("--file", default="inventario.json", help="ficheiro JSON do inventário")
+    args = parser.parse_args()
+
+    report = Reconciler(load_from_json(args.file)).reconcile_files(args.paths)
+    print(f"{report['total']} entradas verificadas.")
+    labels = {"unknown_mac": "MAC desconhecido", "ip_conflict": "Conflito de IP",
+              "mismatch": "IP diferente do inventário", "stale": "Vizinho não confirmado"}
+    for kind in FINDING_KINDS:
+        for item in report[kind]:
+            extra = item.get("ip_owner") or item.get("inventory_ipv4") or ", ".join(item.get("macs", []))
+            print(f"[{labels[kind]}] {item['ip']} {item['mac']} {item['state']} "
+                  f"dispositivo={item['device'] or '-'} {extra or ''}".rstrip())
+
+
+if __name__ == "__main__":
+    main()
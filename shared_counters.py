@@ -0,0 +1,168 @@
+# MÓDULO: shared_counters.py
+# PROPÓSITO: Contadores de tráfego dos endpoints em memória partilhada entre processos
+
+# DESCRIÇÃO:
+    # Um só processo Python não consegue absorver todo o tráfego (GIL). Com este
+    # módulo os totais de tráfego dos endpoints vivem num bloco de memória partilhada
+    # (multiprocessing.shared_memory) e vários processos de ingestão podem somar-lhes
+    # tráfego em paralelo, sem locks:
+    #   - Cada endpoint tem um "slot" estável atribuído pelo NetworkInventory
+    #   - O bloco está dividido em faixas (stripes): a faixa 0 é do processo dono
+    #     (o inventário); as faixas 1..workers são uma por processo de ingestão
+    #   - Cada faixa só é escrita por um processo, por isso não há corridas; o total
+    #     de um endpoint é a soma do seu slot em todas as faixas (feita na leitura)
+    # Valores float64 alinhados: em x86-64/ARM64 cada escrita é atómica, um leitor
+    # vê sempre o valor antigo ou o novo de cada célula.
+
+# LAYOUT:
+    # [faixa][slot][up, down] -> índice (faixa * capacity + slot) * 2 + (0 = up, 1 = down)
+
+# EXEMPLO DE USO:
+    # counters = SharedCounters(capacity=10_000, workers=4)   # no processo principal
+    # inv.attach_counters(counters)
+    # spec = counters.spec                                   # enviar para os workers
+    # --- em cada worker ---
+    # stripe = SharedCounters.attach(spec).stripe(worker_id)   # worker_id de 1 a 4
+    # stripe.add(slot, up_mb, down_mb)
+    # --- no processo principal, periodicamente ---
+    # inv.absorb_counters()        # histórico + políticas para o que os workers somaram
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+_CELL = 8    # bytes por float64
+
+
+class CounterStripe:
+    # Faixa de um worker: só este processo escreve nestas posições
+    __slots__ = ("_cells", "_base", "capacity")
+
+    def __init__(self, cells, stripe: int, capacity: int):
+        self._cells = cells
+        self._base = stripe * capacity * 2
+        self.capacity = capacity
+
+    def add(self, slot: int, up_mb: float, down_mb: float):
+        if not 0 <= slot < self.capacity:
+            raise ValueError("Slot fora da capacidade dos contadores.")
+        i = self._base + slot * 2
+        cells = self._cells
+        cells[i] += up_mb
+        cells[i + 1] += down_mb
+
+
+class SharedCounters:
+    def __init__(self, capacity: int, workers: int = 1, name: str = None):
+        if capacity <= 0:
+            raise ValueError("capacity tem de ser > 0.")
+        if workers < 0:
+            raise ValueError("workers não pode ser negativo.")
+        self.capacity = capacity
+        self.workers = workers
+
+        # Sem nome: cria o bloco (processo dono); com nome: liga-se a um bloco existente
+        self._is_owner = name is None
+        size = (workers + 1) * capacity * 2 * _CELL
+        self._shm = shared_memory.SharedMemory(name=name, create=self._is_owner, size=size)
+        self._cells = self._shm.buf.cast("d")
+        # O mesmo bloco visto como matriz [faixa][slot][up/down] (somas de faixas inteiras)
+        self._grid = np.ndarray((workers + 1, capacity, 2), dtype=np.float64, buffer=self._shm.buf)
+
+        # Totais dos workers já absorvidos pelo inventário: [slot][up/down] (só no processo dono)
+        self._seen = np.zeros((capacity, 2)) if self._is_owner else None
+
+    @property
+    def spec(self):
+        # Tudo o que um worker precisa para se ligar (picklable)
+        return self._shm.name, self.capacity, self.workers
+
+    @classmethod
+    def attach(cls, spec):
+        name, capacity, workers = spec
+        return cls(capacity, workers, name=name)
+
+    def stripe(self, worker_id: int) -> CounterStripe:
+        if not 1 <= worker_id <= self.workers:
+            raise ValueError(f"worker_id tem de estar entre 1 e {self.workers}.")
+        return CounterStripe(self._cells, worker_id, self.capacity)
+
+    def add_base(self, slot: int, up_mb: float, down_mb: float):
+        # Tráfego registado pelo próprio processo dono (Endpoint.add_traffic)
+        i = slot * 2
+        self._cells[i] += up_mb
+        self._cells[i + 1] += down_mb
+
+    def _worker_totals(self, slot: int):
+        cells, step = self._cells, self.capacity * 2
+        up = down = 0.0
+        for s in range(1, self.workers + 1):
+            i = s * step + slot * 2
+            up += cells[i]
+            down += cells[i + 1]
+        return up, down
+
+    def totals(self, slot: int):
+        # (up, down) do slot: soma de todas as faixas
+        up, down = self._worker_totals(slot)
+        return self._cells[slot * 2] + up, self._cells[slot * 2 + 1] + down
+
+    def set_totals(self, slot: int, up_mb: float, down_mb: float):
+        # Acerta o total (faixa 0 compensa o que os workers já somaram)
+        w_up, w_down = self._worker_totals(slot)
+        self._cells[slot * 2] = up_mb - w_up
+        self._cells[slot * 2 + 1] = down_mb - w_down
+
+    def bind(self, slot: int, up_mb: float, down_mb: float):
+
+        # MÉTODO: bind()
+
+        # O QUE FAZ:
+        #     - Prepara o slot para um endpoint com os totais indicados
+        #     - O que os workers tinham somado antes (ex: slot reutilizado) fica
+        #       compensado na faixa 0 e marcado como já absorvido
+
+        if not 0 <= slot < self.capacity:
+            raise ValueError("Slot fora da capacidade dos contadores.")
+        self.set_totals(slot, up_mb, down_mb)
+        self._seen[slot] = self._worker_totals(slot)
+
+    def all_totals(self, pending: bool = False) -> list:
+
+        # MÉTODO: all_totals()
+
+        # O QUE FAZ:
+        #     - Devolve [up + down] por slot, somando as faixas inteiras de uma vez
+        #     - Por omissão só conta o tráfego já absorvido pelo inventário (faixa 0 +
+        #       o que poll já devolveu), tal como os totais por utilizador e os
+        #       agregados da topologia, que só mudam em absorb_counters
+        #     - pending=True soma também o que os workers acrescentaram desde o último
+        #       poll (é sempre o caso fora do processo dono, que não sabe o que foi absorvido)
+
+        if pending or self._seen is None:
+            cells = self._grid.sum(axis=0)
+        else:
+            cells = self._grid[0] + self._seen
+        return cells.sum(axis=1).tolist()
+
+    def poll(self):
+
+        # MÉTODO: poll()
+
+        # O QUE FAZ:
+        #     - Devolve [(slot, up, down)] com o que os workers somaram desde o último poll
+        #     - Só olha para as faixas dos workers (o tráfego da faixa 0 já foi registado)
+
+        acc = self._grid[1:].sum(axis=0)
+        delta = acc - self._seen
+        changed = np.flatnonzero((delta > 0).any(axis=1))
+        self._seen[changed] = acc[changed]
+        return [(slot, up, down) for slot, (up, down) in zip(changed.tolist(), delta[changed].tolist())]
+
+    def close(self):
+        # Liberta as vistas antes de fechar; o dono apaga o bloco do sistema
+        self._grid = None
+        self._cells.release()
+        self._shm.close()
+        if self._is_owner:
+            self._shm.unlink()
@@ -1,4 +1,5 @@
 import json
+import sys
 from datetime import datetime
 from inventory import NetworkInventory
 from devices import Router, Switch, AccessPoint, Endpoint
@@ -9,7 +10,7 @@ def save_to_json(inv: NetworkInventory, filename: str):
     e guarda-os num ficheiro JSON formatado.
     """
     data = []
-    for d in inv.list_devices():
+    for d in inv.iter_devices():
         # O método to_dict() em devices.py já foi atualizado para 
         # exportar 'serial_interface' como booleano.
         data.append(d.to_dict())
@@ -17,107 +18,128 @@ def save_to_json(inv: NetworkInventory, filename: str):
     with open(filename, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
 
-def load_from_json(filename: str) -> NetworkInventory:
+def device_from_dict(item: dict):
     """
-    Lê o ficheiro JSON e reconstrói os objetos de rede, restaurando
-    modelos, presença de interface serial, estados e observações.
+    Reconstrói um único dispositivo a partir do seu dicionário (formato to_dict),
+    restaurando modelo, interface serial, estado, ligações e tráfego.
+    Devolve None se o tipo for desconhecido.
     """
-    with open(filename, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    t = item.get("type")
 
-    inv = NetworkInventory()
+    # Extrai campos comuns a todos os equipamentos
+    # ("or": um campo a null no JSON conta como ausente, tal como um campo em falta)
+    obs = item.get("observations") or ""
+    mod = item.get("model") or ""
 
-    for item in data:
-        t = item.get("type")
-        
-        # Extrai campos comuns a todos os equipamentos
-        obs = item.get("observations", "")
-        mod = item.get("model", "")
-        
-        # Recupera o estado da interface serial (booleano)
-        # Se não existir (ficheiros antigos), assume False (Não).
-        ser_int = item.get("serial_interface", False)
-
-        # -------------------------
-        # Caso seja um ROUTER
-        # -------------------------
-        if t == "ROUTER":
-            obj = Router(
-                name=item["name"],
-                ipv4=item.get("ipv4", ""),
-                ipv6=item.get("ipv6") or "",
-                mac_address=item["mac_address"],
-                model=mod,
-                serial_interface=ser_int,
-                observations=obs
-            )
-            obj.status = item.get("status", obj.status)
-            obj.connected_devices = list(item.get("connected_devices", []))
-
-        # -------------------------
-        # Caso seja um SWITCH
-        # -------------------------
-        elif t == "SWITCH":
-            obj = Switch(
-                name=item["name"],
-                ipv4=item.get("ipv4", ""),
-                mac_address=item["mac_address"],
-                ports=int(item["ports"]),
-                eth_ports=item.get("eth_ports", 0),
-                fast_eth_ports=item.get("fast_eth_ports", 0),
-                giga_eth_ports=item.get("giga_eth_ports", 0),
-                model=mod,
-                serial_interface=ser_int,
-                observations=obs
-            )
-            obj.status = item.get("status", obj.status)
-            obj.connected_devices = list(item.get("connected_devices", []))
-
-        # -------------------------
-        # Caso seja um ACCESS POINT
-        # -------------------------
-        elif t == "AP":
-            obj = AccessPoint(
-                name=item["name"],
-                ssid=item["ssid"],
-                model=mod,
-                serial_interface=ser_int,
-                observations=obs
-            )
-            obj.status = item.get("status", obj.status)
-            obj.connected_endpoints = list(item.get("connected_endpoints", []))
-
-        # -------------------------
-        # Caso seja um ENDPOINT
-        # -------------------------
-        elif t == "ENDPOINT":
-            obj = Endpoint(
-                name=item["name"],
-                user_id=item["user_id"],
-                ipv4=item.get("ipv4", ""),
-                ipv6=item.get("ipv6") or "",
-                mac_address=item["mac_address"],
-                model=mod,
-                serial_interface=ser_int,
-                observations=obs
-            )
-            obj.status = item.get("status", obj.status)
-            obj.traffic_up_mb = float(item.get("traffic_up_mb", 0.0))
-            obj.traffic_down_mb = float(item.get("traffic_down_mb", 0.0))
-
-            susp = item.get("suspended_until")
-            if susp:
-                try:
-                    obj.suspended_until = datetime.fromisoformat(susp)
-                except ValueError:
-                    obj.suspended_until = None
-            else:
-                obj.suspended_until = None
+    # Recupera o estado da interface serial (booleano)
+    # Se não existir (ficheiros antigos), assume False (Não).
+    ser_int = item.get("serial_interface") or False
 
+    # -------------------------
+    # Caso seja um ROUTER
+    # -------------------------
+    if t == "ROUTER":
+        obj = Router(
+            name=item["name"],
+            ipv4=item.get("ipv4") or "",
+            ipv6=item.get("ipv6") or "",
+            mac_address=item["mac_address"],
+            model=mod,
+            serial_interface=ser_int,
+            observations=obs
+        )
+        obj.connected_devices = list(item.get("connected_devices") or [])
+
+    # -------------------------
+    # Caso seja um SWITCH
+    # -------------------------
+    elif t == "SWITCH":
+        obj = Switch(
+            name=item["name"],
+            ipv4=item.get("ipv4") or "",
+            mac_address=item["mac_address"],
+            ports=int(item["ports"]),
+            eth_ports=item.get("eth_ports") or 0,
+            fast_eth_ports=item.get("fast_eth_ports") or 0,
+            giga_eth_ports=item.get("giga_eth_ports") or 0,
+            model=mod,
+            serial_interface=ser_int,
+            observations=obs
+        )
+        # Ficheiros novos guardam também a classe de porta de cada ligação
+        obj.connected_devices = item.get("connected_ports") or list(item.get("connected_devices") or [])
+
+    # -------------------------
+    # Caso seja um ACCESS POINT
+    # -------------------------
+    elif t == "AP":
+        obj = AccessPoint(
+            name=item["name"],
+            ssid=item["ssid"],
+            model=mod,
+            serial_interface=ser_int,
+            observations=obs
+        )
+        obj.connected_endpoints = list(item.get("connected_endpoints") or [])
+
+    # -------------------------
+    # Caso seja um ENDPOINT
+    # -------------------------
+    elif t == "ENDPOINT":
+        obj = Endpoint(
+            name=item["name"],
+            user_id=item["user_id"],
+            ipv4=item.get("ipv4") or "",
+            ipv6=item.get("ipv6") or "",
+            mac_address=item["mac_address"],
+            model=mod,
+            serial_interface=ser_int,
+            observations=obs
+        )
+        obj.traffic_up_mb = float(item.get("traffic_up_mb") or 0.0)
+        obj.traffic_down_mb = float(item.get("traffic_down_mb") or 0.0)
+
+        susp = item.get("suspended_until")
+        if susp:
+            try:
+                obj.suspended_until = datetime.fromisoformat(susp)
+            except ValueError:
+                obj.suspended_until = None
         else:
+            obj.suspended_until = None
+
+    else:
+        return None
+
+    # Estado comum a todos os tipos ("interned": só existem dois valores possíveis);
+    # null ou vazio mantém o estado por omissão do construtor
+    obj.status = sys.intern(item.get("status") or obj.status)
+
+    return obj
+
+def inventory_from_dicts(data: list) -> NetworkInventory:
+    """
+    Constrói um NetworkInventory novo a partir de uma lista de dicionários
+    (conteúdo de um backup JSON). Itens de tipo desconhecido são ignorados.
+    """
+    inv = NetworkInventory()
+
+    for item in data:
+        obj = device_from_dict(item)
+        if obj is None:
             continue
 
         # Adiciona o objeto reconstruído ao inventário
         inv.add_device(obj)
 
     return inv
+
+def load_from_json(filename: str) -> NetworkInventory:
+    """
+    Lê o ficheiro JSON e reconstrói os objetos de rede, restaurando
+    modelos, presença de interface serial, estados e observações.
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    return inventory_from_dicts(data)
